@@ -1,7 +1,8 @@
-import torchaudio
 import torch
 import random
 
+from audio.audio_effects import DEFAULT_BACKEND, apply_batch, pitch_shift, sox_effects
+
 
 class AudioAugmenter:
     def __init__(self):
@@ -14,13 +15,18 @@ class AudioAugmenter:
         shifted = torch.roll(waveform, shifts=shift_amount, dims=1)
         return shifted
 
-    def pitch_shift(self, waveform, pitch_factor=4):
-        """Shift the pitch of the audio"""
-        effects = [
-            ["pitch", str(pitch_factor * 100)],  # multiply by 100 as pitch is in cents
-            ["rate", str(self.sample_rate)]
-        ]
-        augmented, _ = torchaudio.sox_effects.apply_effects_tensor(
-            waveform, self.sample_rate, effects
-        )
-        return augmented
+    def pitch_shift(self, waveform, pitch_factor=4, sample_rate=None, backend=None):
+        """Shift the pitch of the audio by pitch_factor semitones"""
+        if (backend or DEFAULT_BACKEND) == "sox":
+            sample_rate = sample_rate or self.sample_rate
+            effects = [
+                ["pitch", str(pitch_factor * 100)],  # multiply by 100 as pitch is in cents
+                ["rate", str(sample_rate)]
+            ]
+            return sox_effects(waveform, sample_rate, effects)
+        # The native path works in samples, so it is independent of the sample rate
+        return pitch_shift(waveform, pitch_factor)
+
+    def pitch_shift_batch(self, waveforms, pitch_factor=4, sample_rate=None, backend=None):
+        """pitch_shift for many waveforms, on a thread pool"""
+        return apply_batch(lambda waveform: self.pitch_shift(waveform, pitch_factor, sample_rate, backend), waveforms)
@@ -0,0 +1,100 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+import torch
+import torchaudio
+
+# "native" (resampling + phase vocoder in torch) or "sox"; sox is only used when asked for
+DEFAULT_BACKEND = os.environ.get("AUDIO_EFFECTS_BACKEND", "native")
+
+N_FFT = 1024
+HOP_LENGTH = 256
+
+
+@lru_cache(maxsize=32)
+def get_resampler(orig_freq, new_freq, dtype=torch.float32):
+    """Resample transforms are expensive to build; share one per (source, target, dtype)"""
+    return torchaudio.transforms.Resample(orig_freq, new_freq, dtype=dtype)
+
+
+@lru_cache(maxsize=4)
+def _stft_setup(n_fft: int, hop_length: int):
+    window = torch.hann_window(n_fft)
+    # Expected phase advance per hop for each frequency bin
+    phase_advance = torch.linspace(0, math.pi * hop_length, n_fft // 2 + 1)[..., None]
+    return window, phase_advance
+
+
+def _ratio(factor: float, max_denominator: int = 100) -> Fraction:
+    """Small rational approximation of a rate factor, so the resampling kernel stays small"""
+    ratio = Fraction(factor).limit_denominator(max_denominator)
+    if ratio <= 0:
+        raise ValueError(f"Rate factor must be positive, got {factor}")
+    return ratio
+
+
+def resample_by(waveform: torch.Tensor, factor: float) -> torch.Tensor:
+    """Play back ``factor`` times faster: length / factor, frequencies * factor"""
+    ratio = _ratio(factor)
+    if ratio == 1:
+        return waveform
+    return get_resampler(ratio.numerator, ratio.denominator)(waveform)
+
+
+def time_stretch(waveform: torch.Tensor, rate: float, n_fft: int = N_FFT,
+                 hop_length: int = HOP_LENGTH) -> torch.Tensor:
+    """Phase-vocoder tempo change: length / rate with the pitch unchanged"""
+    if rate == 1:
+        return waveform
+    window, phase_advance = _stft_setup(n_fft, hop_length)
+    shape = waveform.shape
+    flat = waveform.reshape(-1, shape[-1])
+    spec = torch.stft(flat, n_fft, hop_length, window=window, return_complex=True)
+    stretched = torchaudio.functional.phase_vocoder(spec, rate, phase_advance)
+    length = int(round(shape[-1] / rate))
+    output = torch.istft(stretched, n_fft, hop_length, window=window, length=length)
+    return output.reshape(shape[:-1] + (length,))
+
+
+def change_speed(waveform: torch.Tensor, factor: float) -> torch.Tensor:
+    """Like sox "speed": tempo and pitch both change by ``factor``"""
+    return resample_by(waveform, factor)
+
+
+def pitch_shift(waveform: torch.Tensor, semitones: float) -> torch.Tensor:
+    """Shift pitch by ``semitones`` keeping the duration: stretch, then resample back"""
+    if semitones == 0:
+        return waveform
+    ratio = float(_ratio(2.0 ** (semitones / 12.0)))
+    shifted = resample_by(time_stretch(waveform, 1.0 / ratio), ratio)
+    # Rounding in the stretch can leave a sample or two either way
+    length = waveform.shape[-1]
+    if shifted.shape[-1] >= length:
+        return shifted[..., :length]
+    return torch.nn.functional.pad(shifted, (0, length - shifted.shape[-1]))
+
+
+def sox_effects(waveform: torch.Tensor, sample_rate: int, effects: List[List[str]]) -> torch.Tensor:
+    """Run a sox effect chain; only used when the sox backend is requested"""
+    augmented, _ = torchaudio.sox_effects.apply_effects_tensor(waveform, sample_rate, effects)
+    return augmented
+
+
+def apply_batch(fn: Callable[[torch.Tensor], torch.Tensor], waveforms: List[torch.Tensor],
+                max_workers: Optional[int] = None) -> List[torch.Tensor]:
+    """
+    Apply an effect to many waveforms on a thread pool; torch releases the
+    GIL inside the heavy kernels. The pool defaults to torch's intra-op
+    thread count, so pooled workers stay within the configured thread budget.
+    Equal-length inputs are best stacked and passed to the effect directly
+    instead.
+    """
+    max_workers = max_workers or torch.get_num_threads()
+    if len(waveforms) <= 1 or max_workers == 1:
+        return [fn(w) for w in waveforms]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(fn, waveforms))
@@ -0,0 +1,152 @@
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import torch
+from scipy import signal
+
+# Default filter orders: FIR taps - 1, or Butterworth order for IIR
+DEFAULT_ORDER = {"fir": 256, "iir": 8}
+
+# Input samples convolved per FFT block (rounded up to fill a power-of-two FFT)
+DEFAULT_BLOCK_SIZE = 1 << 15
+
+
+def lowpass_fir(cutoff: float, sample_rate: int, order: int = 256) -> torch.Tensor:
+    """Linear-phase windowed-sinc low-pass (Blackman window) with order + 1 taps, unit DC gain"""
+    order += order % 2  # even order -> odd tap count -> whole-sample delay
+    fc = cutoff / sample_rate
+    n = torch.arange(order + 1, dtype=torch.float64) - order / 2
+    taps = 2 * fc * torch.sinc(2 * fc * n) * torch.blackman_window(order + 1, periodic=False, dtype=torch.float64)
+    return (taps / taps.sum()).float()
+
+
+def lowpass_iir(cutoff: float, sample_rate: int, order: int = 8) -> np.ndarray:
+    """Butterworth low-pass as second-order sections"""
+    return signal.butter(order, cutoff, btype="low", fs=sample_rate, output="sos")
+
+
+def _next_pow2(n: int) -> int:
+    return 1 << (n - 1).bit_length()
+
+
+class LowPassFilter:
+    """
+    Low-pass filter for (..., time) waveforms; leading dimensions (channels,
+    files) are filtered together.
+
+    FIR filters run as rfft block convolution (overlap-save) and are
+    delay-compensated, so the output lines up with the input. IIR filters
+    run scipy's sosfilt block by block with carried state. Either way only
+    one block plus the filter history is transformed at a time.
+    """
+
+    def __init__(self, cutoff: float, sample_rate: int, order: Optional[int] = None, kind: str = "fir",
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+        if kind not in DEFAULT_ORDER:
+            raise ValueError(f"Unknown filter kind: {kind}")
+        if not 0 < cutoff < sample_rate / 2:
+            raise ValueError(f"Cutoff must be between 0 and {sample_rate / 2} Hz")
+        self.kind = kind
+        self.order = DEFAULT_ORDER[kind] if order is None else order
+        self.block_size = block_size
+        if kind == "fir":
+            self.taps = lowpass_fir(cutoff, sample_rate, self.order)
+            self.delay = (len(self.taps) - 1) // 2
+            self.fft_size = _next_pow2(block_size + len(self.taps) - 1)
+            self.block_size = self.fft_size - (len(self.taps) - 1)
+            self._taps_spectrum = torch.fft.rfft(self.taps, self.fft_size)
+        else:
+            self.sos = lowpass_iir(cutoff, sample_rate, self.order)
+            self.delay = 0
+
+    def __call__(self, waveform: torch.Tensor) -> torch.Tensor:
+        """Filter a whole waveform, block by block, into one preallocated output"""
+        length = waveform.shape[-1]
+        output = torch.empty(waveform.shape, dtype=torch.float32)
+        if self.kind == "iir":
+            position = 0
+            chunks = (waveform[..., i:i + self.block_size] for i in range(0, length, self.block_size))
+            for filtered in self.stream(chunks):
+                output[..., position:position + filtered.shape[-1]] = filtered
+                position += filtered.shape[-1]
+            return output
+
+        overlap = len(self.taps) - 1
+        # Causal output k depends on inputs k - overlap .. k and lands at k - delay
+        for start in range(0, length + self.delay, self.block_size):
+            segment = waveform[..., max(start - overlap, 0):start + self.block_size].float()
+            if start < overlap:
+                segment = torch.nn.functional.pad(segment, (overlap - start, 0))
+            # rfft zero-pads the last segment up to the FFT size
+            causal = torch.fft.irfft(torch.fft.rfft(segment, self.fft_size) * self._taps_spectrum, self.fft_size)
+            lo = max(start - self.delay, 0)
+            hi = min(start + self.block_size - self.delay, length)
+            offset = overlap + self.delay - start
+            if hi > lo:
+                output[..., lo:hi] = causal[..., lo + offset:hi + offset]
+        return output
+
+    def filter_batch(self, waveforms: List[torch.Tensor]) -> List[torch.Tensor]:
+        """Filter waveforms of different lengths together by zero-padding them to a common length"""
+        length = max(w.shape[-1] for w in waveforms)
+        padded = torch.stack([torch.nn.functional.pad(w, (0, length - w.shape[-1])) for w in waveforms])
+        filtered = self(padded)
+        return [f[..., :w.shape[-1]] for f, w in zip(filtered, waveforms)]
+
+    def stream(self, chunks: Iterable[torch.Tensor]) -> Iterator[torch.Tensor]:
+        """
+        Filter an iterator of (..., time) chunks of any size. Output chunks
+        have the same total length as the input; FIR output lags by
+        ``delay`` samples within the stream and is flushed at the end.
+        """
+        if self.kind == "iir":
+            yield from self._stream_iir(chunks)
+        else:
+            yield from self._stream_fir(chunks)
+
+    def _stream_fir(self, chunks):
+        history = None
+        to_skip = self.delay
+        shape = None
+        for chunk in chunks:
+            for start in range(0, chunk.shape[-1], self.block_size):
+                block = chunk[..., start:start + self.block_size].float()
+                if history is None:
+                    shape = block.shape[:-1]
+                    history = block.new_zeros(shape + (len(self.taps) - 1,))
+                output, history = self._convolve(block, history)
+                if to_skip:
+                    skipped = min(to_skip, output.shape[-1])
+                    output = output[..., skipped:]
+                    to_skip -= skipped
+                if output.shape[-1]:
+                    yield output
+        if history is not None:
+            # Push the last ``delay`` outputs out of the filter with zeros
+            tail, _ = self._convolve(history.new_zeros(shape + (self.delay,)), history)
+            yield tail[..., to_skip:]
+
+    def _convolve(self, block, history):
+        """Overlap-save: causal FIR output for ``block`` given the previous len(taps) - 1 inputs"""
+        n = block.shape[-1]
+        extended = torch.cat([history, block], dim=-1)
+        spectrum = torch.fft.rfft(extended, self.fft_size)
+        output = torch.fft.irfft(spectrum * self._taps_spectrum, self.fft_size)
+        history = extended[..., extended.shape[-1] - history.shape[-1]:]
+        return output[..., len(self.taps) - 1:len(self.taps) - 1 + n], history
+
+    def _stream_iir(self, chunks):
+        state = None
+        for chunk in chunks:
+            data = chunk.float().numpy()
+            if state is None:
+                state = np.zeros((self.sos.shape[0],) + data.shape[:-1] + (2,))
+            filtered, state = signal.sosfilt(self.sos, data, axis=-1, zi=state)
+            yield torch.from_numpy(filtered.astype(np.float32))
+
+
+@lru_cache(maxsize=32)
+def get_lowpass(cutoff: float, sample_rate: int, order: Optional[int] = None, kind: str = "fir") -> LowPassFilter:
+    """Designed filters are reused across requests"""
+    return LowPassFilter(cutoff, sample_rate, order, kind)
@@ -4,8 +4,66 @@ import torch.nn.functional as F
 import soundfile as sf
 import base64
 import io
+import logging
+import math
 import numpy as np
 
+from audio.audio_effects import DEFAULT_BACKEND, apply_batch, change_speed, get_resampler, sox_effects
+from audio.audio_filters import get_lowpass
+
+logger = logging.getLogger(__name__)
+
+# Frames decoded per block when resampling; bounds memory for long recordings
+DECODE_BLOCK_FRAMES = 1 << 20
+
+# MPEG audio frame length; reads that end mid-frame decode slightly differently
+MPEG_FRAME = 1152
+
+# Frames handed to the encoder per write
+ENCODE_BLOCK_FRAMES = 1 << 16
+
+# Response encodings: name -> (soundfile format, subtype, media type)
+AUDIO_FORMATS = {
+    "wav": ("WAV", "PCM_16", "audio/wav"),
+    "flac": ("FLAC", "PCM_16", "audio/flac"),
+    "ogg": ("OGG", "VORBIS", "audio/ogg"),
+    "opus": ("OGG", "OPUS", "audio/ogg; codecs=opus")
+}
+
+
+def resample_blocks(blocks, resampler):
+    """
+    Resample an iterator of (channels, frames) blocks, each a multiple of
+    resampler.orig_freq // resampler.gcd frames except the last. Every block
+    is resampled with enough neighbouring input on both sides that the
+    output matches resampling the whole signal at once.
+    """
+    step = resampler.orig_freq // resampler.gcd
+    out_step = resampler.new_freq // resampler.gcd
+    # Input samples the sinc kernel reaches beyond a block, rounded up to whole steps
+    context = step * (resampler.width // step + 2)
+
+    output = []
+    left = None
+    current = next(blocks, None)
+    while current is not None:
+        following = next(blocks, None)
+        parts = [current] if left is None else [left, current]
+        if following is not None:
+            parts.append(following[:, :context])
+        resampled = resampler(torch.cat(parts, dim=1) if len(parts) > 1 else current)
+
+        start = 0 if left is None else left.shape[1] // step * out_step
+        if following is None:
+            output.append(resampled[:, start:])
+        else:
+            output.append(resampled[:, start:start + current.shape[1] // step * out_step])
+        left = current[:, -context:]
+        current = following
+    if not output:
+        return torch.empty(0, 0)
+    return torch.cat(output, dim=1)
+
 
 class AudioPreprocessor:
     def __init__(self):
@@ -16,89 +74,133 @@ class AudioPreprocessor:
     def load_audio(self, audio_bytes):
         """Load audio from bytes"""
         try:
-            # Create a BytesIO object from the audio bytes
-            buffer = io.BytesIO(audio_bytes)
-
-            # Read audio data using soundfile
-            data, samplerate = sf.read(buffer)
-
-            # Convert to tensor and reshape if needed
-            if len(data.shape) == 1:
-                waveform = torch.FloatTensor(data).unsqueeze(0)
-            else:
-                waveform = torch.FloatTensor(data.T)
-
-            # Resample if necessary
-            if samplerate != self.sample_rate:
-                resampler = torchaudio.transforms.Resample(samplerate, self.sample_rate)
-                waveform = resampler(waveform)
-
+            with sf.SoundFile(io.BytesIO(audio_bytes)) as audio_file:
+                samplerate = audio_file.samplerate
+                if samplerate == self.sample_rate:
+                    data = audio_file.read(dtype='float32', always_2d=True)
+                    waveform = torch.from_numpy(np.ascontiguousarray(data.T))
+                else:
+                    # Decode straight to float32 in blocks and resample each one,
+                    # so the full-rate signal is never held in memory at once
+                    resampler = get_resampler(samplerate, self.sample_rate)
+                    step = math.lcm(resampler.orig_freq // resampler.gcd, MPEG_FRAME)
+                    block_frames = max(1, DECODE_BLOCK_FRAMES // step) * step
+                    waveform = resample_blocks(self._read_blocks(audio_file, block_frames), resampler)
+
+            if waveform.shape[1] == 0:
+                raise ValueError("No audio frames found")
             return waveform, self.sample_rate
 
         except Exception as e:
             raise RuntimeError(f"Error loading audio: {str(e)}")
 
-    def add_noise(self, waveform, noise_level=0.005):
-        """Add Gaussian noise to the audio"""
-        noise = torch.randn_like(waveform) * noise_level
+    @staticmethod
+    def _read_blocks(audio_file, block_frames):
+        """
+        Read until the decoder runs dry. SoundFile.blocks() trusts the frame
+        count, which is only an estimate for MP3 and pads the end with
+        uninitialized memory.
+        """
+        while True:
+            block = audio_file.read(block_frames, dtype='float32', always_2d=True)
+            if not len(block):
+                return
+            yield torch.from_numpy(block.T)
+
+    def add_noise(self, waveform, noise_level=0.005, rng=None):
+        """Add Gaussian noise to the audio; ``rng`` is an optional torch.Generator"""
+        noise = torch.randn(waveform.shape, generator=rng, dtype=waveform.dtype) * noise_level
         return waveform + noise
 
-    def change_speed(self, waveform, speed_factor=1.6):
+    def change_speed(self, waveform, speed_factor=1.6, backend=None):
         """Change the speed of the audio"""
         try:
-            effects = [
-                ["speed", str(speed_factor)],
-                ["rate", str(self.sample_rate)]
-            ]
-            augmented, new_rate = torchaudio.sox_effects.apply_effects_tensor(
-                waveform, self.sample_rate, effects
-            )
-            return augmented
+            if (backend or DEFAULT_BACKEND) == "sox":
+                effects = [
+                    ["speed", str(speed_factor)],
+                    ["rate", str(self.sample_rate)]
+                ]
+                return sox_effects(waveform, self.sample_rate, effects)
+            return change_speed(waveform, speed_factor)
         except Exception as e:
-            print(f"Warning: Speed change failed, returning original. Error: {str(e)}")
+            logger.warning("Speed change failed, returning original: %s", e)
             return waveform
 
-    def apply_low_pass_filter(self, waveform, cutoff_freq=4000):
-        """Apply a low-pass filter"""
+    def change_speed_batch(self, waveforms, speed_factor=1.6, backend=None):
+        """change_speed for many waveforms, on a thread pool"""
+        return apply_batch(lambda waveform: self.change_speed(waveform, speed_factor, backend), waveforms)
+
+    def apply_low_pass_filter(self, waveform, cutoff_freq=4000, order=None, kind="fir"):
+        """Apply a low-pass filter (windowed-sinc FIR or Butterworth IIR), block by block"""
         try:
             # Ensure waveform is in proper shape (channels, samples)
             if waveform.dim() == 1:
                 waveform = waveform.unsqueeze(0)
 
-            # Design basic low-pass filter
-            freq_bins = torch.fft.fftfreq(waveform.shape[-1])
-            mask = torch.abs(freq_bins) < cutoff_freq / self.sample_rate
-            mask = mask.float()
-
-            # Apply filter in frequency domain
-            fft = torch.fft.fft(waveform)
-            filtered_fft = fft * mask
-            filtered = torch.fft.ifft(filtered_fft).real
+            return get_lowpass(cutoff_freq, self.sample_rate, order, kind)(waveform)
+        except Exception as e:
+            logger.warning("Low-pass filter failed, returning original: %s", e)
+            return waveform
 
+    def low_pass_batch(self, waveforms, cutoff_freq=4000, order=None, kind="fir"):
+        """
+        apply_low_pass_filter for many waveforms. Those with the same channel
+        count and a similar length (within 2x) are zero-padded and filtered
+        as one stack.
+        """
+        try:
+            lowpass = get_lowpass(cutoff_freq, self.sample_rate, order, kind)
+            waveforms = [w.unsqueeze(0) if w.dim() == 1 else w for w in waveforms]
+            groups = {}
+            for i, waveform in enumerate(waveforms):
+                groups.setdefault((waveform.shape[:-1], waveform.shape[-1].bit_length()), []).append(i)
+            filtered = list(waveforms)
+            for indices in groups.values():
+                for i, output in zip(indices, lowpass.filter_batch([waveforms[i] for i in indices])):
+                    filtered[i] = output
             return filtered
         except Exception as e:
-            print(f"Warning: Low-pass filter failed, returning original. Error: {str(e)}")
-            return waveform
+            logger.warning("Low-pass filter failed, returning originals: %s", e)
+            return waveforms
+
+    def to_wav(self, waveform, sample_rate):
+        """Encode an audio tensor as WAV bytes"""
+        # Convert to numpy array
+        audio_numpy = waveform.numpy()
+
+        # Create a BytesIO buffer
+        buffer = io.BytesIO()
+
+        # Save as WAV using soundfile
+        if audio_numpy.ndim == 1:
+            audio_numpy = audio_numpy.reshape(1, -1)
+        sf.write(buffer, audio_numpy.T, sample_rate, format='WAV')
+        return buffer.getvalue()
+
+    def encode(self, waveform, sample_rate, audio_format="wav"):
+        """Encode an audio tensor as wav/flac (16-bit PCM) or ogg/opus; returns (bytes, media type)"""
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unsupported audio format: {audio_format}")
+        container, subtype, media_type = AUDIO_FORMATS[audio_format]
+
+        audio_numpy = waveform.numpy()
+        if audio_numpy.ndim == 1:
+            audio_numpy = audio_numpy.reshape(1, -1)
+        # Lossy codecs and 16-bit PCM both expect samples in [-1, 1]
+        audio_numpy = np.clip(audio_numpy.T, -1.0, 1.0)
+
+        buffer = io.BytesIO()
+        with sf.SoundFile(buffer, 'w', samplerate=sample_rate, channels=audio_numpy.shape[1],
+                          format=container, subtype=subtype) as out:
+            # libsndfile's Ogg encoders crash on very large single writes
+            for start in range(0, len(audio_numpy), ENCODE_BLOCK_FRAMES):
+                out.write(audio_numpy[start:start + ENCODE_BLOCK_FRAMES])
+        return buffer.getvalue(), media_type
 
     def to_base64(self, waveform, sample_rate):
         """Convert audio tensor to base64 string"""
         try:
-            # Convert to numpy array
-            audio_numpy = waveform.numpy()
-
-            # Create a BytesIO buffer
-            buffer = io.BytesIO()
-
-            # Save as WAV using soundfile
-            if audio_numpy.ndim == 1:
-                audio_numpy = audio_numpy.reshape(1, -1)
-            sf.write(buffer, audio_numpy.T, sample_rate, format='WAV')
-
-            # Get base64 string
-            buffer.seek(0)
-            audio_b64 = base64.b64encode(buffer.read()).decode()
-
-            return audio_b64
+            return base64.b64encode(self.to_wav(waveform, sample_rate)).decode()
 
         except Exception as e:
             raise RuntimeError(f"Error converting to base64: {str(e)}")
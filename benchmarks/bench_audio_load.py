@@ -0,0 +1,79 @@
+"""Decode + resample to 16 kHz: old load_audio vs cached resampler with block decode.
+
+Generates stereo PCM16 WAV files at 44.1 kHz and 48 kHz for each duration
+(in seconds) and loads each one in a fresh interpreter so ru_maxrss
+reflects that loader only. "legacy" is sf.read to float64 + FloatTensor +
+a new Resample per call; "block" is AudioPreprocessor.load_audio. The
+second "block" call in each process shows the cached resampler.
+Run from the repository root:
+    python -m benchmarks.bench_audio_load [seconds ...]      e.g. 10 600 3600
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+LOADER = r"""
+import io, json, resource, sys, time
+import soundfile as sf, torch, torchaudio
+path, mode = sys.argv[1], sys.argv[2]
+with open(path, "rb") as f:
+    content = f.read()
+
+def legacy(audio_bytes):
+    data, samplerate = sf.read(io.BytesIO(audio_bytes))
+    waveform = torch.FloatTensor(data.T)
+    return torchaudio.transforms.Resample(samplerate, 16000)(waveform)
+
+if mode == "block":
+    if not hasattr(torchaudio, "set_audio_backend"):
+        torchaudio.set_audio_backend = lambda backend: None
+    from audio.audio_preprocessing import AudioPreprocessor
+    processor = AudioPreprocessor()
+    load = lambda b: processor.load_audio(b)[0]
+else:
+    load = legacy
+
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+times = []
+for _ in range(2):
+    start = time.perf_counter()
+    waveform = load(content)
+    times.append(time.perf_counter() - start)
+print(json.dumps({"first": times[0], "second": times[1], "samples": waveform.shape[1],
+                  "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - baseline}))
+"""
+
+
+def write_wav(path, seconds, rate):
+    with sf.SoundFile(path, "w", samplerate=rate, channels=2, subtype="PCM_16") as f:
+        rng = np.random.default_rng(0)
+        for start in range(0, int(seconds * rate), rate * 10):
+            n = min(rate * 10, int(seconds * rate) - start)
+            t = (start + np.arange(n)) / rate
+            tone = 0.3 * np.sin(2 * np.pi * 440 * t)
+            f.write(np.stack([tone, tone], axis=1) + 0.01 * rng.standard_normal((n, 2)))
+
+
+def main():
+    durations = [float(s) for s in sys.argv[1:]] or [10, 60, 600]
+    with tempfile.TemporaryDirectory() as tmp:
+        for seconds in durations:
+            for rate in (44100, 48000):
+                path = os.path.join(tmp, f"{seconds}_{rate}.wav")
+                write_wav(path, seconds, rate)
+                for mode in ("legacy", "block"):
+                    out = subprocess.run([sys.executable, "-c", LOADER, path, mode], capture_output=True,
+                                         text=True, check=True, cwd=os.getcwd())
+                    r = json.loads(out.stdout.strip().splitlines()[-1])
+                    print(f"{seconds:>7.0f} s {rate / 1000:4.1f} kHz {mode:<7} first {r['first']:7.2f} s  "
+                          f"second {r['second']:7.2f} s  peak RSS +{r['peak_rss'] / 1e6:8.1f} MB")
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Payload size and estimated time-to-first-play: base64 WAV in JSON vs encoded files behind URLs.
+
+Time-to-first-play is modelled as server encode time + transfer of the bytes
+the browser needs before it can start playing + client-side decoding of the
+JSON. For the JSON response that is the whole body (both clips); for URLs it
+is the small JSON plus the first FIRST_RANGE bytes of the processed file,
+fetched with a Range request. Run from the repository root:
+    python -m benchmarks.bench_audio_transport [seconds ...] [--mbps N]
+"""
+import base64
+import json
+import math
+import sys
+import time
+
+import torch
+import torchaudio
+
+if not hasattr(torchaudio, "set_audio_backend"):
+    torchaudio.set_audio_backend = lambda backend: None
+
+from audio.audio_preprocessing import AUDIO_FORMATS, AudioPreprocessor
+
+SAMPLE_RATE = 16000
+FIRST_RANGE = 64 * 1024
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    args = sys.argv[1:]
+    mbps = 20.0
+    if "--mbps" in args:
+        i = args.index("--mbps")
+        mbps = float(args[i + 1])
+        del args[i:i + 2]
+    durations = [float(s) for s in args] or [60, 600]
+    bytes_per_second = mbps * 1e6 / 8
+    processor = AudioPreprocessor()
+
+    for seconds in durations:
+        t = torch.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        waveform = (0.4 * torch.sin(2 * math.pi * 440 * t) + 0.02 * torch.randn(t.shape)).unsqueeze(0)
+        print(f"{seconds:.0f} s mono {SAMPLE_RATE} Hz, {mbps:g} Mbit/s link")
+
+        def json_response():
+            return json.dumps({"original_audio": processor.to_base64(waveform, SAMPLE_RATE),
+                               "processed_audio": processor.to_base64(waveform, SAMPLE_RATE)})
+
+        body, encode = timed(json_response)
+        _, parse = timed(lambda: base64.b64decode(json.loads(body)["processed_audio"]))
+        first_play = encode + len(body) / bytes_per_second + parse
+        print(f"  json+base64 wav  payload {len(body) / 1e6:8.2f} MB  first play {first_play:7.2f} s")
+
+        for audio_format in AUDIO_FORMATS:
+            (data, _), encode = timed(processor.encode, waveform, SAMPLE_RATE, audio_format)
+            # Both clips are encoded before the response goes out
+            metadata = json.dumps({"processed_audio_url": "/artifacts/" + "0" * 64,
+                                   "original_audio_url": "/artifacts/" + "0" * 64})
+            first_play = 2 * encode + (len(metadata) + min(FIRST_RANGE, len(data))) / bytes_per_second
+            print(f"  url {audio_format:<12} payload {len(data) / 1e6:8.2f} MB  first play {first_play:7.2f} s")
+
+
+if __name__ == "__main__":
+    main()
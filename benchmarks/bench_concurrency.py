@@ -0,0 +1,79 @@
+"""Concurrent load against a running server: p50/p99 latency per endpoint.
+
+Start the server once with EXECUTOR_KIND=inline (everything on the event
+loop, the old behaviour) and once with the default thread pool, then run:
+    python -m benchmarks.bench_concurrency [base_url] [requests] [concurrency]
+
+Heavy model/audio requests are mixed with light text requests so blocking of
+the event loop shows up in the text latencies.
+"""
+import sys
+import time
+import uuid
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CASES = [
+    ("/process_text", "examples/sample.txt", "text/plain", ["lowercase", "punctuation"]),
+    ("/process_model", "examples/circle.obj", "text/plain", ["normalize", "center"]),
+    ("/process_audio", "examples/audio.mp3", "audio/mpeg", ["lowpass"]),
+    ("/process_image", "examples/cat.jpg", "image/jpeg", ["resize"]),
+]
+
+
+def multipart(path, content_type, preprocessing):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for step in preprocessing:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="preprocessing"\r\n\r\n{step}\r\n'.encode())
+    with open(path, "rb") as f:
+        data = f.read()
+    name = path.rsplit("/", 1)[-1]
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+                 f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def request(base_url, case):
+    endpoint, path, content_type, steps = case
+    body, header = multipart(path, content_type, steps)
+    req = urllib.request.Request(base_url + endpoint, data=body, headers={"Content-Type": header})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return endpoint, status, time.perf_counter() - start
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000"
+    n_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    jobs = [CASES[i % len(CASES)] for i in range(n_requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        outcomes = list(pool.map(lambda case: request(base_url, case), jobs))
+    elapsed = time.perf_counter() - start
+
+    print(f"{n_requests} requests, concurrency {concurrency}, {n_requests / elapsed:.1f} req/s")
+    for endpoint, *_ in CASES:
+        latencies = [t for e, s, t in outcomes if e == endpoint and s == 200]
+        rejected = sum(1 for e, s, _ in outcomes if e == endpoint and s != 200)
+        if latencies:
+            print(f"{endpoint:16} p50 {percentile(latencies, 0.5) * 1000:8.1f} ms  "
+                  f"p99 {percentile(latencies, 0.99) * 1000:8.1f} ms  non-200: {rejected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Samples/sec of ImageDataset through a DataLoader, across num_workers, with and without the disk cache.
+
+The spec resizes and normalizes (deterministic, cached with --cache) and
+then rotates and color-jitters (redrawn every epoch). Inputs are copies of
+examples/cat.jpg at 1024x768 in a temporary directory. Each setting runs
+two epochs: the first fills the cache, the second reads from it.
+Run from the repository root:
+    python -m benchmarks.bench_dataloader [images] [max_workers]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import PIL.Image as Image
+
+from core.datasets import ImageDataset, pipeline_loader
+
+SPEC = {
+    "modality": "image",
+    "steps": [{"name": "resize", "params": {"size": [224, 224]}}, "normalize", "augment:rotate", "augment:color"]
+}
+BATCH_SIZE = 32
+
+
+def epoch(dataset, num_workers):
+    start = time.perf_counter()
+    for _ in pipeline_loader(dataset, batch_size=BATCH_SIZE, num_workers=num_workers):
+        pass
+    return len(dataset) / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    workers = sorted({0, 1, 2, 4, max_workers} & set(range(max_workers + 1)))
+
+    with tempfile.TemporaryDirectory() as root:
+        source = Image.open("examples/cat.jpg").convert("RGB").resize((1024, 768))
+        paths = []
+        for i in range(count):
+            path = os.path.join(root, f"{i:05d}.jpg")
+            source.save(path, quality=90)
+            paths.append(path)
+
+        print(f"{count} images 1024x768, batch {BATCH_SIZE}, {os.cpu_count()} cores")
+        for num_workers in workers:
+            row = []
+            for cache in (False, True):
+                cache_dir = os.path.join(root, f"cache{num_workers}") if cache else None
+                dataset = ImageDataset(SPEC, paths, seed=0, cache_dir=cache_dir)
+                rates = []
+                for e in range(2):
+                    dataset.set_epoch(e)
+                    rates.append(epoch(dataset, num_workers))
+                row.append(rates)
+            (plain, _), (filling, cached) = row
+            print(f"  workers {num_workers}: {plain:7.1f}/s   cache: first epoch {filling:7.1f}/s, "
+                  f"then {cached:7.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Cold-start time and RSS of torchtext GloVe vs the memory-mapped store.
+
+Each loader runs in a fresh interpreter so the numbers reflect a new worker.
+Run from the repository root:
+    python -m benchmarks.bench_embedding_store [store_dir]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+LOADER = r"""
+import json, time
+from core.resource_registry import current_rss_bytes
+start = time.perf_counter()
+{load}
+word = augmenter.find_similar_words("king")
+print(json.dumps({{"seconds": time.perf_counter() - start, "rss": current_rss_bytes(), "word": word}}))
+"""
+
+
+def run(load):
+    out = subprocess.check_output([sys.executable, "-c", LOADER.format(load=load)], text=True)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    base = sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp()
+    from text.embedding_store import EmbeddingStore
+    for dtype in ("float32", "float16", "int8"):
+        path = os.path.join(base, dtype)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            EmbeddingStore.from_torchtext(path, dtype=dtype)
+
+    cases = [("torchtext GloVe", "from text.text_augmentation import TextAugmenter\naugmenter = TextAugmenter()")]
+    for dtype in ("float32", "float16", "int8"):
+        path = os.path.join(base, dtype)
+        cases.append((f"store {dtype}",
+                      f"from text.text_augmentation import TextAugmenter\n"
+                      f"augmenter = TextAugmenter(store_path={path!r})"))
+
+    for label, load in cases:
+        result = run(load)
+        print(f"{label:18} {result['seconds']:7.2f} s  {result['rss'] / 2 ** 20:8.1f} MiB RSS  {result['word']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Encode time and size per response format, and JPEG decode time with and without Image.draft.
+
+Encodes the 800px preview of examples/cat.jpg (and of its grayscale
+version, as a typical processed image) the way /process_image does.
+Run from the repository root:
+    python -m benchmarks.bench_image_encode [image]
+"""
+import sys
+import time
+from io import BytesIO
+
+import PIL.Image as Image
+
+from image.image_preprocessing import PREVIEW_SIZE, ImagePreprocessor
+
+SETTINGS = [
+    ("png", 85, 6),  # previous behaviour: default PNG
+    ("png", 85, 1),
+    ("jpeg", 85, 6),
+    ("jpeg", 70, 6),
+    ("webp", 85, 9),
+    ("webp", 85, 6),
+    ("webp", 85, 2),
+    ("webp", 80, 0),
+]
+REPEATS = 5
+
+
+def timed(fn, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats
+
+
+def loaded(image):
+    image.load()
+    return image
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "examples/cat.jpg"
+    content = open(path, "rb").read()
+
+    processor = ImagePreprocessor()
+    full, full_time = timed(lambda: loaded(processor.decode(content)))
+    drafted, draft_time = timed(lambda: loaded(processor.decode(content, PREVIEW_SIZE)))
+    print(f"decode {path}: full {full.size} {full_time * 1000:.1f} ms, "
+          f"draft {drafted.size} {draft_time * 1000:.1f} ms")
+
+    _, legacy_time = timed(lambda: full.resize((800, int(800 * full.size[1] / full.size[0])), Image.LANCZOS))
+    _, preview_time = timed(lambda: processor.preview(drafted))
+    print(f"preview: LANCZOS from full {legacy_time * 1000:.1f} ms, "
+          f"reducing_gap from draft {preview_time * 1000:.1f} ms")
+
+    for name, image in (("photo", processor.preview(drafted)), ("grayscale", processor.preview(drafted.convert("L").convert("RGB")))):
+        print(f"{name} {image.size}:")
+        for image_format, quality, level in SETTINGS:
+            (data, _), seconds = timed(lambda: processor.encode(image, image_format, quality, level))
+            Image.open(BytesIO(data)).load()
+            print(f"  {image_format:>4} q={quality:<3} level={level}: {seconds * 1000:6.1f} ms  {len(data) / 1024:7.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
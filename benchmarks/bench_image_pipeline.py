@@ -0,0 +1,78 @@
+"""Images/sec: per-call torchvision Compose on PIL images vs the uint8 tensor pipeline.
+
+"pil" mirrors the ImagePreprocessor/ImageAugmenter methods before
+image_pipeline existed (a new Compose per call, PIL in and out of every
+step). "tensor" runs the compiled plan per image; "batch" stacks the images
+and runs it once. All paths start from PIL images and end with PIL images.
+Run from the repository root:
+    python -m benchmarks.bench_image_pipeline [threads]
+"""
+import sys
+import time
+
+import PIL.Image as Image
+import torch
+import torchvision.transforms as transforms
+
+import core.pipelines  # noqa: F401 (registers the steps)
+from core.pipeline_spec import plan_spec
+from image.image_pipeline import set_num_threads, to_pil, to_tensor
+
+CHAINS = [["resize", "grayscale", "augment:flip"], ["resize", "normalize"]]
+BATCH_SIZES = [1, 4, 16, 64, 256]
+
+
+def pil_step(step, image):
+    if step == "resize":
+        return transforms.Compose([transforms.Resize((224, 224))])(image)
+    if step == "grayscale":
+        return transforms.Compose([transforms.Grayscale(3)])(image)
+    if step == "normalize":
+        return transforms.Compose([
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+            transforms.ToPILImage()
+        ])(image)
+    if step == "augment:flip":
+        return transforms.RandomHorizontalFlip(p=1.0)(image)
+    return image
+
+
+def run_pil(images, steps):
+    results = []
+    for image in images:
+        for step in steps:
+            image = pil_step(step, image)
+        results.append(image)
+    return results
+
+
+def run_tensor(images, pipeline):
+    return [to_pil(pipeline(to_tensor(image))) for image in images]
+
+
+def run_batch(images, pipeline):
+    batch = pipeline(torch.stack([to_tensor(image) for image in images]))
+    return [to_pil(tensor) for tensor in batch]
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    set_num_threads(threads)
+    source = Image.open("examples/cat.jpg").convert("RGB").resize((640, 480))
+    for steps in CHAINS:
+        pipeline = plan_spec({"modality": "image", "steps": steps})
+        print(f"{' -> '.join(steps)} on 640x480, torch threads: {torch.get_num_threads()}")
+        for n in BATCH_SIZES:
+            images = [source.copy() for _ in range(n)]
+            row = []
+            for fn in (lambda: run_pil(images, steps), lambda: run_tensor(images, pipeline),
+                       lambda: run_batch(images, pipeline)):
+                start = time.perf_counter()
+                fn()
+                row.append(n / (time.perf_counter() - start))
+            print(f"  batch {n:>4}: pil {row[0]:7.1f}/s  tensor {row[1]:7.1f}/s  batch {row[2]:7.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Lemmatization throughput (tokens/sec) for the full pipeline vs nlp.pipe.
+
+Run from the repository root:
+    python -m benchmarks.bench_lemmatize [n_docs]
+"""
+import os
+import sys
+import time
+
+from text.text_preprocessing import TextPreprocessor
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with open(os.path.join("examples", "sample.txt")) as f:
+        sample = f.read()
+    docs = [sample * 20] * n_docs
+    processor = TextPreprocessor()
+    n_tokens = sum(len(processor.nlp.tokenizer(d)) for d in docs)
+
+    start = time.perf_counter()
+    for doc in docs[:max(1, n_docs // 10)]:
+        ' '.join(token.lemma_ for token in processor.nlp(doc))
+    full = (time.perf_counter() - start) / max(1, n_docs // 10) * n_docs
+    print(f"full pipeline, per doc : {n_tokens / full:10.0f} tokens/sec")
+
+    for n_process in (1, 2, os.cpu_count() or 1):
+        start = time.perf_counter()
+        processor.lemmatize_batch(docs, batch_size=64, n_process=n_process)
+        elapsed = time.perf_counter() - start
+        print(f"nlp.pipe n_process={n_process:<3}: {n_tokens / elapsed:10.0f} tokens/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Low-pass filtering: whole-signal FFT brick-wall vs FIR/IIR block filtering.
+
+Each filter runs on a mono 16 kHz noise signal in a fresh interpreter so
+ru_maxrss reflects that filter only (reported above the baseline after the
+signal is allocated). "fft" is the implementation apply_low_pass_filter
+used before audio.audio_filters existed. Run from the repository root:
+    python -m benchmarks.bench_lowpass [seconds ...]      (default: 60 3600)
+"""
+import json
+import subprocess
+import sys
+
+RUNNER = r"""
+import json, resource, sys, time
+import torch
+seconds, kind = float(sys.argv[1]), sys.argv[2]
+waveform = torch.randn(1, int(seconds * 16000))
+
+def fft_lowpass(waveform, cutoff_freq=4000, sample_rate=16000):
+    freq_bins = torch.fft.fftfreq(waveform.shape[-1])
+    mask = (torch.abs(freq_bins) < cutoff_freq / sample_rate).float()
+    return torch.fft.ifft(torch.fft.fft(waveform) * mask).real
+
+if kind == "fft":
+    run = fft_lowpass
+else:
+    from audio.audio_filters import LowPassFilter
+    run = LowPassFilter(4000, 16000, kind=kind)
+
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+start = time.perf_counter()
+run(waveform)
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed,
+                  "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - baseline}))
+"""
+
+
+def main():
+    durations = [float(s) for s in sys.argv[1:]] or [60, 3600]
+    for seconds in durations:
+        for kind in ("fft", "fir", "iir"):
+            out = subprocess.run([sys.executable, "-c", RUNNER, str(seconds), kind], capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"{seconds:>7.0f} s {kind}: failed ({out.stderr.strip().splitlines()[-1]})")
+                continue
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{seconds:>7.0f} s {kind}: {r['seconds']:7.2f} s  peak RSS +{r['peak_rss'] / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Meshes/sec for augmenting N variants of one mesh: per-mesh loop vs batched einsum.
+
+"loop" copies the mesh and calls rotate + scale_random once per variant,
+"arrays" is ModelAugmenter.sample_transforms + transform_batch returning one
+(N, v, 3) array and "meshes" additionally wraps every variant in a Trimesh.
+Run from the repository root:
+    python -m benchmarks.bench_mesh_augment [subdivisions]
+"""
+import sys
+import time
+
+import numpy as np
+import trimesh
+
+from model.model_augmentation import ModelAugmenter
+
+SIZES = [1, 10, 100, 1000, 10000]
+
+
+def loop(augmenter, mesh, n):
+    np.random.seed(0)
+    variants = []
+    for _ in range(n):
+        variant = mesh.copy()
+        augmenter.rotate(variant, np.random.uniform(0, 360))
+        augmenter.scale_random(variant)
+        variants.append(variant)
+    return variants
+
+
+def arrays(augmenter, mesh, n):
+    return augmenter.transform_batch(np.asarray(mesh.vertices), augmenter.sample_transforms(n, seed=0))
+
+
+def meshes(augmenter, mesh, n):
+    return augmenter.augment_batch(mesh, copies=n, seed=0)
+
+
+def main():
+    subdivisions = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    mesh = trimesh.creation.icosphere(subdivisions)
+    augmenter = ModelAugmenter()
+    print(f"{len(mesh.vertices)} vertices per mesh")
+    for n in SIZES:
+        row = []
+        for fn in (loop, arrays, meshes):
+            start = time.perf_counter()
+            fn(augmenter, mesh, n)
+            row.append(n / (time.perf_counter() - start))
+        print(f"  N={n:>6}  loop {row[0]:>10.0f}/s  arrays {row[1]:>10.0f}/s  meshes {row[2]:>10.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Decimation time and preview payload size per LOD level vs the full mesh.
+
+Run from the repository root:
+    python -m benchmarks.bench_mesh_lod [subdivisions]
+"""
+import gzip
+import sys
+import time
+
+import trimesh
+
+from model.model_preprocessing import ModelPreprocessor
+
+BUDGETS = [2000, 10000, 50000]
+
+
+def main():
+    subdivisions = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    mesh = trimesh.creation.icosphere(subdivisions)
+    processor = ModelPreprocessor()
+
+    full = gzip.compress(processor.to_binary(mesh), compresslevel=1)
+    print(f"full mesh: {len(mesh.faces):>8} faces  {len(full) / 1e6:7.2f} MB gzip")
+    for budget in BUDGETS:
+        start = time.perf_counter()
+        level = processor.decimate(mesh, budget)
+        elapsed = time.perf_counter() - start
+        payload = gzip.compress(processor.to_binary(level), compresslevel=1)
+        print(f"lod {budget:>6}: {len(level.faces):>8} faces  {len(payload) / 1e6:7.2f} MB gzip  "
+              f"decimate {elapsed * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Wall time and memory per step chain: per-step mesh copies vs the composed transform.
+
+"copies" is the tracemalloc peak divided by the size of the vertex buffer,
+i.e. how many vertex-buffer equivalents a chain allocates at once. The
+legacy path mirrors the step implementations before MeshPipeline existed.
+Run from the repository root:
+    python -m benchmarks.bench_mesh_pipeline [subdivisions]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import trimesh
+from scipy.spatial.transform import Rotation
+
+from model.model_augmentation import ModelAugmenter
+from model.model_pipeline import MeshPipeline
+
+CHAINS = [
+    ["center"],
+    ["normalize"],
+    ["center", "normalize"],
+    ["center", "normalize", "augment:rotate"],
+    ["normalize", "center", "augment:scale"]
+]
+
+
+def legacy(mesh, steps):
+    mesh = mesh.copy()
+    for step in steps:
+        if step == "center":
+            centered = mesh.copy()
+            centered.vertices -= mesh.centroid
+            mesh = centered
+        elif step == "normalize":
+            normalized = mesh.copy()
+            vertices = normalized.vertices
+            centroid = vertices.mean(axis=0)
+            radius = np.max(np.linalg.norm(vertices - centroid, axis=1))
+            normalized.vertices = centroid + (vertices - centroid) * (50.0 / radius)
+            mesh = normalized
+        elif step == "augment:rotate":
+            mesh.vertices = Rotation.from_euler('y', 45.0, degrees=True).apply(mesh.vertices)
+        elif step == "augment:scale":
+            mesh.vertices *= np.random.uniform(0.8, 1.2, size=3)
+    return mesh
+
+
+def measure(fn, mesh, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(mesh)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(mesh)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / mesh.vertices.nbytes
+
+
+def main():
+    subdivisions = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    mesh = trimesh.creation.icosphere(subdivisions)
+    augmenter = ModelAugmenter()
+    print(f"{len(mesh.vertices)} vertices, {len(mesh.faces)} faces")
+    for steps in CHAINS:
+        pipeline = MeshPipeline(steps, augmenter)
+        for name, fn in (("legacy", lambda m: legacy(m, steps)), ("composed", pipeline)):
+            seconds, copies = measure(fn, mesh)
+            print(f"  {'+'.join(steps):<36} {name:<9} {seconds * 1000:8.1f} ms  {copies:5.1f} copies")
+
+
+if __name__ == "__main__":
+    main()
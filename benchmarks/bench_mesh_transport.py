@@ -0,0 +1,63 @@
+"""Payload size and encode/decode latency: base64 JSON vs binary mesh transport.
+
+Decode times emulate what the browser does (JSON.parse(atob(...)) + flat()
+vs wrapping typed arrays). Run from the repository root:
+    python -m benchmarks.bench_mesh_transport [max_subdivisions]
+"""
+import base64
+import gzip
+import json
+import sys
+import time
+
+import numpy as np
+import trimesh
+
+from model.model_preprocessing import MESH_HEADER, ModelPreprocessor
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def decode_json(payload):
+    data = json.loads(base64.b64decode(payload))
+    return (np.asarray(data["vertices"], dtype=np.float32).ravel(),
+            np.asarray(data["faces"], dtype=np.uint32).ravel())
+
+
+def decode_binary(payload):
+    _, flags, n_vertices, n_indices, *_ = MESH_HEADER.unpack_from(payload)
+    offset = MESH_HEADER.size
+    dtype = np.uint16 if flags & 1 else np.float32
+    vertices = np.frombuffer(payload, dtype=dtype, count=n_vertices * 3, offset=offset)
+    offset += (vertices.nbytes + 3) & ~3
+    return vertices, np.frombuffer(payload, dtype=np.uint32, count=n_indices, offset=offset)
+
+
+def main():
+    max_subdivisions = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    processor = ModelPreprocessor()
+    print(f"{'faces':>10} {'format':22} {'bytes':>12} {'encode ms':>10} {'decode ms':>10}")
+
+    for subdivisions in range(5, max_subdivisions + 1):
+        mesh = trimesh.creation.icosphere(subdivisions=subdivisions)
+        cases = [
+            ("json+base64", lambda: processor.to_json(mesh).encode(), decode_json),
+            ("binary float32", lambda: processor.to_binary(mesh), decode_binary),
+            ("binary float32+gzip", lambda: gzip.compress(processor.to_binary(mesh), 1),
+             lambda p: decode_binary(gzip.decompress(p))),
+            ("binary uint16+gzip", lambda: gzip.compress(processor.to_binary(mesh, quantize=True), 1),
+             lambda p: decode_binary(gzip.decompress(p))),
+        ]
+        for label, encode, decode in cases:
+            payload, encode_time = timed(encode)
+            _, decode_time = timed(lambda: decode(payload))
+            print(f"{len(mesh.faces):>10} {label:22} {len(payload):>12} "
+                  f"{encode_time * 1000:>10.1f} {decode_time * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
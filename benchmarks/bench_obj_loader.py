@@ -0,0 +1,62 @@
+"""Parse throughput and peak RSS: trimesh.load vs the streaming OBJ loader.
+
+Generates grid meshes of the requested face counts (in millions) and loads
+each one in a fresh interpreter so ru_maxrss reflects that loader only.
+Run from the repository root:
+    python -m benchmarks.bench_obj_loader [faces_millions ...]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+LOADER = r"""
+import json, resource, sys, time
+from model.model_preprocessing import ModelPreprocessor
+path, fast = sys.argv[1], sys.argv[2] == "fast"
+start = time.perf_counter()
+with open(path, "rb") as f:
+    if fast:
+        from model.obj_loader import load_obj_fast
+        mesh = load_obj_fast(f, size_hint=__import__("os").path.getsize(path))
+    else:
+        mesh = ModelPreprocessor().load_obj(f.read(), fast=False)
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "faces": len(mesh.faces),
+                  "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}))
+"""
+
+
+def write_grid_obj(path, n_faces):
+    """Square grid of quads split into triangles: about n_faces triangles"""
+    side = int(np.sqrt(n_faces / 2)) + 1
+    with open(path, "w") as f:
+        xs, ys = np.meshgrid(np.arange(side), np.arange(side))
+        vertices = np.column_stack([xs.ravel(), ys.ravel(), np.zeros(side * side)])
+        np.savetxt(f, vertices, fmt="v %.6f %.6f %.6f")
+        idx = np.arange(side * side).reshape(side, side) + 1
+        a, b = idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel()
+        c, d = idx[1:, 1:].ravel(), idx[1:, :-1].ravel()
+        faces = np.concatenate([np.column_stack([a, b, c]), np.column_stack([a, c, d])])
+        np.savetxt(f, faces, fmt="f %d %d %d")
+
+
+def main():
+    sizes = [float(a) for a in sys.argv[1:]] or [1, 5, 10]
+    with tempfile.TemporaryDirectory() as tmp:
+        for millions in sizes:
+            path = os.path.join(tmp, f"grid_{millions}m.obj")
+            write_grid_obj(path, int(millions * 1e6))
+            size_mb = os.path.getsize(path) / 2 ** 20
+            for mode in ("trimesh", "fast"):
+                out = subprocess.check_output([sys.executable, "-c", LOADER, path, mode], text=True)
+                result = json.loads(out.strip().splitlines()[-1])
+                print(f"{millions:5.1f}M faces ({size_mb:7.1f} MB) {mode:8}: {result['seconds']:7.2f} s  "
+                      f"{size_mb / result['seconds']:7.1f} MB/s  peak RSS {result['peak_rss'] / 2 ** 20:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
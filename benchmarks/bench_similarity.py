@@ -0,0 +1,61 @@
+"""Compare the per-word cosine loop with SimilarityIndex.
+
+Run from the repository root:
+    python -m benchmarks.bench_similarity
+"""
+import random
+import time
+
+import torch
+from torchtext.vocab import GloVe
+
+from text.text_similarity import SimilarityIndex
+
+
+def loop_similar_words(glove, word, n=5):
+    """The original find_similar_words implementation"""
+    word_vector = glove[word]
+    cos = torch.nn.CosineSimilarity(dim=0)
+    distances = []
+    for similar_word in glove.itos[:50000]:
+        if similar_word == word:
+            continue
+        distances.append((similar_word, cos(word_vector, glove[similar_word])))
+    return [w for w, _ in sorted(distances, key=lambda x: x[1], reverse=True)[:n]]
+
+
+def main():
+    glove = GloVe(name='6B', dim=100)
+    random.seed(0)
+    words = random.sample(glove.itos[:20000], 20)
+
+    start = time.perf_counter()
+    for word in words[:3]:
+        loop_similar_words(glove, word)
+    loop_time = (time.perf_counter() - start) / 3
+    print(f"loop:               {loop_time * 1000:10.2f} ms/word")
+
+    for label, max_vocab in [("index (50k)", 50000), ("index (full vocab)", None)]:
+        start = time.perf_counter()
+        index = SimilarityIndex.from_vectors(glove.vectors, glove.itos, stoi=glove.stoi, max_vocab=max_vocab)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for word in words:
+            index.most_similar(word)
+        single_time = (time.perf_counter() - start) / len(words)
+
+        start = time.perf_counter()
+        index.most_similar_batch(words)
+        batch_time = (time.perf_counter() - start) / len(words)
+
+        print(f"{label + ':':20}{single_time * 1000:10.2f} ms/word single, "
+              f"{batch_time * 1000:.2f} ms/word batched, build {build_time:.2f} s")
+
+    word = words[0]
+    print(f"loop  -> {loop_similar_words(glove, word)}")
+    print(f"index -> {SimilarityIndex.from_vectors(glove.vectors, glove.itos, stoi=glove.stoi).most_similar(word)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Step-by-step lowercase/punctuation passes vs the fused text plan.
+
+Run from the repository root:
+    python -m benchmarks.bench_text_normalize
+"""
+import string
+import time
+
+import core.pipelines  # noqa: F401 (registers the steps)
+from core.pipeline_spec import plan_spec
+
+
+def legacy(text, steps):
+    for step in steps:
+        if step == "lowercase":
+            text = text.lower()
+        elif step == "punctuation":
+            text = ''.join(char for char in text if char not in string.punctuation)
+    return text
+
+
+def bench(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    with open("examples/sample.txt") as f:
+        sample = f.read()
+    steps = ["lowercase", "punctuation"]
+    pipeline = plan_spec({"modality": "text", "steps": steps})
+
+    for size_mb in (1, 4, 16):
+        text = (sample * (size_mb * 2 ** 20 // len(sample) + 1))[:size_mb * 2 ** 20]
+        for label, data in [("ascii", text), ("unicode", text + "É")]:
+            old = bench(lambda: legacy(data, steps))
+            new = bench(lambda: pipeline(data))
+            assert legacy(data, steps) == pipeline(data)
+            print(f"{size_mb:3d} MB {label:8}: legacy {old * 1000:9.1f} ms  "
+                  f"fused {new * 1000:8.1f} ms  ({old / new:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
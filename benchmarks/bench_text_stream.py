@@ -0,0 +1,65 @@
+"""Memory ceiling check for the /process_text/stream endpoint on a generated large file.
+
+Calls the endpoint handler with the generated file (default 200 MB) as the
+upload, so the check covers what a request runs: the spooled copy, the
+incremental decoder and chunker, and the text plan on the executor. Fails if
+the traced Python heap peak exceeds the ceiling.
+Run from the repository root:
+    python -m benchmarks.bench_text_stream [size_mb] [ceiling_mb]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fastapi import UploadFile
+
+import main as app_main
+
+
+def generate_file(path, size_mb):
+    line = "The Quick, brown fox jumps over the lazy dog! It's 42 degrees.\n"
+    block = line * (2 ** 20 // len(line))
+    with open(path, "w") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+async def stream(path):
+    """Bytes written by the endpoint for the file at ``path``"""
+    written = 0
+    with open(path, "rb") as f:
+        upload = UploadFile(f, filename=os.path.basename(path))
+        response = await app_main.process_text_stream(
+            preprocessing=["lowercase", "punctuation"], augmentation=None, spec=None, file=upload)
+        assert response.status_code == 200, bytes(response.body).decode()
+        async for processed in response.body_iterator:
+            written += len(processed)
+    return written
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    ceiling_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "large.txt")
+        generate_file(src, size_mb)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        written = asyncio.run(stream(src))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    peak_mb = peak / 2 ** 20
+    print(f"{size_mb} MB in {elapsed:.2f}s ({size_mb / elapsed:.1f} MB/s), "
+          f"{written / 2 ** 20:.1f} MB out, peak heap {peak_mb:.1f} MB")
+    assert peak_mb < ceiling_mb, f"peak heap {peak_mb:.1f} MB exceeds ceiling {ceiling_mb} MB"
+
+
+if __name__ == "__main__":
+    main()
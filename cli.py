@@ -0,0 +1,103 @@
+"""
+Run pipeline specs without the web app.
+
+    python cli.py steps                                  # available steps and parameters
+    python cli.py plan spec.json                         # validate a spec and show its plan
+    python cli.py run spec.json input.jpg -o out.png     # process one file
+    python cli.py process spec.json photos/ -o out/      # a directory tree (or a manifest of paths)
+
+A spec argument is a path to a JSON file or the JSON itself. ``process``
+runs on a process pool, writes each output as soon as it is done and
+records it in out/run_log.jsonl; rerunning the same command skips the
+finished items.
+"""
+import argparse
+import json
+import os
+import sys
+
+from core.pipeline_spec import load_spec, plan_spec, steps
+
+
+def read_spec(value: str) -> dict:
+    if os.path.exists(value):
+        with open(value) as f:
+            value = f.read()
+    return load_spec(None, value)
+
+
+def cmd_steps(args):
+    print(json.dumps(steps.describe(), indent=2))
+
+
+def cmd_plan(args):
+    print(json.dumps(plan_spec(read_spec(args.spec)).describe(), indent=2))
+
+
+def cmd_run(args):
+    from core.batch import process_item
+
+    spec = read_spec(args.spec)
+    modality = plan_spec(spec).modality
+    with open(args.input, "rb") as f:
+        content = f.read()
+
+    output, ext = process_item(modality, content, spec, args.seed)
+
+    path = args.output or os.path.splitext(args.input)[0] + ".processed" + ext
+    with open(path, "wb") as f:
+        f.write(output)
+    print(f"Wrote {path} ({len(output)} bytes)")
+
+
+def cmd_process(args):
+    from core.runner import run_directory
+
+    summary = run_directory(read_spec(args.spec), args.source, args.output, workers=args.workers,
+                            seed=args.seed, resume=not args.no_resume, chunk_size=args.chunk_size)
+    print(json.dumps(summary, indent=2))
+    if summary["failed"]:
+        print(f"{summary['failed']} item(s) failed; see {os.path.join(args.output, 'run_log.jsonl')}",
+              file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preprocess and augment files with a pipeline spec")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("steps", help="list the available steps").set_defaults(fn=cmd_steps)
+
+    plan = commands.add_parser("plan", help="validate a spec and print its plan")
+    plan.add_argument("spec", help="spec JSON, or a path to a JSON file")
+    plan.set_defaults(fn=cmd_plan)
+
+    run = commands.add_parser("run", help="process one file")
+    run.add_argument("spec", help="spec JSON, or a path to a JSON file")
+    run.add_argument("input")
+    run.add_argument("-o", "--output", help="output path (default: <input>.processed.<ext>)")
+    run.add_argument("--seed", type=int, default=None)
+    run.set_defaults(fn=cmd_run)
+
+    process = commands.add_parser("process", help="process a directory tree or manifest with a process pool")
+    process.add_argument("spec", help="spec JSON, or a path to a JSON file")
+    process.add_argument("source", help="input directory, or a manifest file with one path per line")
+    process.add_argument("-o", "--output", required=True, help="output directory")
+    process.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    process.add_argument("--seed", type=int, default=None, help="base seed; each item is seeded from it and its relative path")
+    process.add_argument("--chunk-size", type=int, default=None, help="items per worker task")
+    process.add_argument("--no-resume", action="store_true", help="reprocess items finished by an earlier run")
+    process.set_defaults(fn=cmd_process)
+
+    args = parser.parse_args(argv)
+    # Registers the steps (and the resources behind them)
+    import core.pipelines  # noqa: F401
+    try:
+        args.fn(args)
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
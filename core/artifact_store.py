@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+
+class Artifact(NamedTuple):
+    data: bytes
+    media_type: str
+    # Content-Encoding the data is already compressed with, if any
+    encoding: Optional[str] = None
+
+
+_ID_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def content_id(data: bytes) -> str:
+    """Content hash used as the artifact ID"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_artifact_id(value: str) -> bool:
+    """True for strings content_id can return (64 lowercase hex digits)"""
+    return isinstance(value, str) and _ID_PATTERN.fullmatch(value) is not None
+
+
+class ArtifactStore:
+    """
+    Server-side storage for uploaded and processed artifacts keyed by content
+    hash, so the session only needs to carry IDs. Every backend expires an
+    artifact ttl seconds after it was last stored or read.
+    """
+
+    def put(self, data: bytes, media_type: str = "application/octet-stream",
+            encoding: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        raise NotImplementedError
+
+    def delete(self, artifact_id: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemoryArtifactStore(ArtifactStore):
+    """In-process LRU store with a byte budget and TTL"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = 3600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def put(self, data: bytes, media_type: str = "application/octet-stream",
+            encoding: Optional[str] = None) -> str:
+        artifact_id = content_id(data)
+        with self._lock:
+            if artifact_id in self._items:
+                # Same content: refresh TTL and recency
+                self._items[artifact_id] = (data, media_type, encoding, time.time())
+                self._items.move_to_end(artifact_id)
+                return artifact_id
+            self._items[artifact_id] = (data, media_type, encoding, time.time())
+            self._bytes += len(data)
+            self._evict()
+        return artifact_id
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        with self._lock:
+            item = self._items.get(artifact_id)
+            if item is None:
+                return None
+            data, media_type, encoding, used = item
+            now = time.time()
+            if now - used > self.ttl:
+                self._remove(artifact_id)
+                return None
+            self._items[artifact_id] = (data, media_type, encoding, now)
+            self._items.move_to_end(artifact_id)
+            return Artifact(data, media_type, encoding)
+
+    def delete(self, artifact_id: str):
+        with self._lock:
+            if artifact_id in self._items:
+                self._remove(artifact_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "items": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions
+            }
+
+    def _remove(self, artifact_id: str):
+        data = self._items.pop(artifact_id)[0]
+        self._bytes -= len(data)
+
+    def _evict(self):
+        # Items are in order of last use, so the expired ones come first
+        now = time.time()
+        while self._items:
+            artifact_id, (_, _, _, used) = next(iter(self._items.items()))
+            if now - used <= self.ttl:
+                break
+            self._remove(artifact_id)
+            self.evictions += 1
+        # Least recently used first; always keep the newest item
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            self._remove(next(iter(self._items)))
+            self.evictions += 1
+
+
+class DiskArtifactStore(ArtifactStore):
+    """Local-disk store; files are sharded by hash prefix and expire by mtime"""
+
+    def __init__(self, root: str, max_bytes: int = 2 * 1024 * 1024 * 1024, ttl: float = 24 * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self._last_sweep = 0.0
+        os.makedirs(root, exist_ok=True)
+        self._bytes = sum(os.path.getsize(p) for p in self._data_files())
+
+    def _path(self, artifact_id: str) -> str:
+        if not is_artifact_id(artifact_id):
+            raise ValueError(f"Invalid artifact ID: {artifact_id!r}")
+        return os.path.join(self.root, artifact_id[:2], artifact_id)
+
+    def _data_files(self):
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith((".json", ".tmp")):
+                    yield os.path.join(shard_dir, name)
+
+    def put(self, data: bytes, media_type: str = "application/octet-stream",
+            encoding: Optional[str] = None) -> str:
+        artifact_id = content_id(data)
+        path = self._path(artifact_id)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path)
+                return artifact_id
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp name first so readers never see partial files
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            with open(path + ".json", "w") as f:
+                json.dump({"media_type": media_type, "encoding": encoding}, f)
+            self._bytes += len(data)
+            self._evict()
+        return artifact_id
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        if not is_artifact_id(artifact_id):
+            return None
+        path = self._path(artifact_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                self.delete(artifact_id)
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            with open(path + ".json") as f:
+                meta = json.load(f)
+            # Touch so LRU eviction and the TTL see the access
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return Artifact(data, meta["media_type"], meta.get("encoding"))
+
+    def delete(self, artifact_id: str):
+        if not is_artifact_id(artifact_id):
+            return
+        path = self._path(artifact_id)
+        with self._lock:
+            self._unlink(path)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "disk",
+            "root": self.root,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
+
+    def _unlink(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._bytes -= size
+        except OSError:
+            pass
+        try:
+            os.remove(path + ".json")
+        except OSError:
+            pass
+
+    def _evict(self):
+        now = time.time()
+        # Scanning the tree is O(files); only do it when over budget or
+        # once per minute for TTL expiry
+        if self._bytes <= self.max_bytes and now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        # Other processes sharing the directory may delete files while we scan
+        files = []
+        for path in self._data_files():
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        files.sort()
+        for mtime, path in files[:-1]:
+            if now - mtime > self.ttl or self._bytes > self.max_bytes:
+                self._unlink(path)
+                self.evictions += 1
+
+
+def create_store() -> ArtifactStore:
+    """Build the store selected by the ARTIFACT_STORE environment variable"""
+    backend = os.environ.get("ARTIFACT_STORE", "memory")
+    ttl = float(os.environ.get("ARTIFACT_TTL", 3600))
+    if backend == "disk":
+        return DiskArtifactStore(
+            os.environ.get("ARTIFACT_DIR", "artifacts"),
+            max_bytes=int(os.environ.get("ARTIFACT_MAX_BYTES", 2 * 1024 * 1024 * 1024)),
+            ttl=ttl
+        )
+    return MemoryArtifactStore(
+        max_bytes=int(os.environ.get("ARTIFACT_MAX_BYTES", 256 * 1024 * 1024)),
+        ttl=ttl
+    )
@@ -0,0 +1,353 @@
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from core.pipelines import decode_image, plan_spec
+from core.resource_registry import registry
+from core.result_cache import step_seed
+from image.image_pipeline import to_pil, to_tensor
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+# Accepted input extensions per modality
+EXTENSIONS = {
+    "text": (".txt",),
+    "image": (".jpg", ".jpeg", ".png", ".bmp", ".webp"),
+    "audio": (".mp3", ".wav"),
+    "model": (".obj",)
+}
+
+
+class LimitExceeded(ValueError):
+    """Raised when a batch upload is larger, uncompressed, than the configured limits"""
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def open_archive(source: BinaryIO, filename: str, max_member_bytes: Optional[int] = None,
+                 max_total_bytes: Optional[int] = None) -> Tuple[int, Iterator[Tuple[str, bytes]]]:
+    """
+    Check the uncompressed sizes of a zip or tar archive's regular files
+    against the limits (LimitExceeded if one is exceeded) before extracting
+    anything. Returns the total size and an iterator that extracts
+    (name, bytes) one member at a time. source must be seekable.
+    """
+    is_zip = filename.lower().endswith(".zip")
+    if is_zip:
+        with zipfile.ZipFile(source) as archive:
+            members = [(info.filename, info.file_size) for info in archive.infolist()
+                       if not info.is_dir() and not _hidden(info.filename)]
+    else:
+        # Tar headers carry the sizes; listing them decompresses but keeps nothing
+        with tarfile.open(fileobj=source, mode="r:*") as archive:
+            members = [(member.name, member.size) for member in archive
+                       if member.isfile() and not _hidden(member.name)]
+
+    total = 0
+    for name, size in members:
+        if max_member_bytes is not None and size > max_member_bytes:
+            raise LimitExceeded(f"{name} is {size} bytes uncompressed, the limit is {max_member_bytes}")
+        total += size
+    if max_total_bytes is not None and total > max_total_bytes:
+        raise LimitExceeded(f"The archive is {total} bytes uncompressed, the limit is {max_total_bytes}")
+
+    def extract():
+        source.seek(0)
+        if is_zip:
+            with zipfile.ZipFile(source) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and not _hidden(info.filename):
+                        yield info.filename, archive.read(info)
+        else:
+            with tarfile.open(fileobj=source, mode="r:*") as archive:
+                for member in archive:
+                    if member.isfile() and not _hidden(member.name):
+                        yield member.name, archive.extractfile(member).read()
+
+    return total, extract()
+
+
+def _hidden(name: str) -> bool:
+    return any(part.startswith(".") or part == "__MACOSX" for part in name.split("/"))
+
+
+def item_seed(seed: Optional[int], index: int) -> Optional[int]:
+    """Different but reproducible seed per item"""
+    return None if seed is None else seed + index
+
+
+def decode_item(modality: str, content: bytes):
+    """The value a modality's plan starts from"""
+    if modality == "text":
+        try:
+            return content.decode()
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Failed to decode text: {str(e)}")
+    if modality == "image":
+        return to_tensor(decode_image(content))
+    if modality == "audio":
+        waveform, _ = registry.get("audio_preprocessor").load_audio(content)
+        return waveform
+    if modality == "model":
+        mesh = registry.get("model_preprocessor").load_obj(content)
+        if len(mesh.vertices) == 0:
+            raise ValueError("No vertices found in OBJ file")
+        return mesh
+    raise ValueError(f"Unsupported modality: {modality}")
+
+
+def encode_item(modality: str, value) -> Tuple[bytes, str]:
+    """Encode a processed value; returns (bytes, extension)"""
+    if modality == "text":
+        return value.encode(), ".txt"
+    if modality == "image":
+        buffer = io.BytesIO()
+        to_pil(value).save(buffer, format="PNG")
+        return buffer.getvalue(), ".png"
+    if modality == "audio":
+        processor = registry.get("audio_preprocessor")
+        return processor.to_wav(value, processor.sample_rate), ".wav"
+    if modality == "model":
+        return value.export(file_type="obj").encode(), ".obj"
+    raise ValueError(f"Unsupported modality: {modality}")
+
+
+def process_items(modality: str, contents: List[bytes], spec: dict, seed: Optional[int] = None,
+                  seeds: Optional[List[Optional[int]]] = None) -> List[Tuple[Optional[bytes], Optional[str], Optional[str]]]:
+    """
+    Run the plan over a group of items, stage by stage. Stages with a batch
+    implementation get the whole group at once: lemmatize goes through
+    nlp.pipe, deterministic image steps run on stacks of same-size images,
+    the audio low-pass filters padded stacks of waveforms and the speed and
+    pitch effects run on a thread pool. Other stages
+    (random steps, fused or reordered runs, model steps) run item by item. ``seeds`` are the items' own seeds (default: item_seed(seed, i)
+    for the i-th item). Returns (output, extension, error) per item.
+    """
+    plan = plan_spec(spec)
+    seed = plan.seed if seed is None else seed
+    errors = {}
+    values = {}
+    for i, content in enumerate(contents):
+        try:
+            values[i] = decode_item(modality, content)
+        except Exception as e:
+            errors[i] = str(e)
+
+    for position, stage in enumerate(plan.stages):
+        ids = [i for i in values if i not in errors]
+        if stage.batch_fn is not None:
+            try:
+                values.update(zip(ids, stage.batch_fn([values[i] for i in ids])))
+            except Exception as e:
+                if plan.on_error == "raise":
+                    # The whole group went through this stage together
+                    errors.update({i: str(e) for i in ids})
+                    break
+                logger.warning("Failed to apply %s: %s", stage.key, e)
+            continue
+        for i in ids:
+            try:
+                own_seed = seeds[i] if seeds is not None else item_seed(seed, i)
+                values[i] = plan.apply(stage.key, values[i], step_seed(own_seed, position))
+            except Exception as e:
+                errors[i] = str(e)
+
+    outputs = []
+    for i in range(len(contents)):
+        if i not in errors:
+            try:
+                output, ext = encode_item(modality, values[i])
+                outputs.append((output, ext, None))
+                continue
+            except Exception as e:
+                errors[i] = str(e)
+        outputs.append((None, None, errors[i]))
+    return outputs
+
+
+def process_item(modality: str, content: bytes, spec: dict, seed: Optional[int] = None) -> Tuple[bytes, str]:
+    """Process one item; returns (encoded output, extension) or raises ValueError"""
+    (output, ext, error), = process_items(modality, [content], spec, seed)
+    if error is not None:
+        raise ValueError(error)
+    return output, ext
+
+
+def batch_items(modality: str, contents: List[bytes], spec: dict,
+                seeds: List[Optional[int]]) -> List[Tuple[Optional[bytes], Optional[str], Optional[str], float]]:
+    """
+    Process a group of batch items; returns (output, extension, error,
+    seconds) per item, the group's time split evenly. Picklable for process pools
+    """
+    start = time.perf_counter()
+    outputs = process_items(modality, contents, spec, seeds=seeds)
+    seconds = (time.perf_counter() - start) / max(1, len(contents))
+    return [(output, ext, error, seconds) for output, ext, error in outputs]
+
+
+def output_name(name: str, ext: str, used: Set[str]) -> str:
+    """
+    name with its extension replaced by ext; a numeric suffix keeps it from
+    overwriting an earlier output (a.jpg and a.png both give a.png)
+    """
+    stem = os.path.splitext(name)[0]
+    candidate = stem + ext
+    n = 1
+    while candidate.lower() in used:
+        candidate = f"{stem}_{n}{ext}"
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+class _Group:
+    """Supported items submitted together; the future is set once the group is full"""
+
+    def __init__(self):
+        self.future: Optional[Future] = None
+        self.size = 0
+
+
+def run_batch(modality: str, items: Iterable[Tuple[str, bytes]], spec: dict, seed: Optional[int] = None,
+              max_parallel: int = 4, group_size: int = 8,
+              submit: Optional[Callable[..., Future]] = None) -> Iterator[Tuple[str, Optional[bytes], dict]]:
+    """
+    Process a batch of (name, bytes) items and yield (output name, output
+    bytes or None, manifest entry) in input order. Per-item failures, and
+    files with an extension the modality does not accept, are recorded in
+    the manifest entry instead of aborting the batch.
+
+    Supported items are processed in groups of group_size (see
+    process_items for which stages run batched); text items form a single
+    group, since nlp.pipe gains most from large batches. Items are read
+    from the iterable as slots free up.
+
+    submit(fn, *args) runs the work and returns a concurrent Future (the
+    server passes one backed by its shared executor); by default a thread
+    pool of max_parallel is used. At most max_parallel groups are in flight.
+    """
+    extensions = EXTENSIONS.get(modality, ())
+    plan = plan_spec(spec)
+    steps = plan.stage_keys
+    seed = plan.seed if seed is None else seed
+    used = {"manifest.json"}
+    if modality == "text":
+        items = list(items)
+        group_size = len(items)
+    group_size = max(1, group_size)
+
+    def unsupported(name):
+        error = f"Unsupported file type for {modality}, expected one of {', '.join(extensions)}"
+        return _result(name, None, None, error, 0.0, steps)
+
+    pool = None
+    if submit is None:
+        pool = ThreadPoolExecutor(max_workers=max(1, max_parallel))
+        submit = pool.submit
+    try:
+        # A window keeps input order and bounds the groups in flight; entries
+        # are (name, group, position in the group), or (name, None, 0) for
+        # unsupported files
+        window = deque()
+        group, contents, seeds = _Group(), [], []
+        in_flight = index = 0
+
+        def send():
+            group.future = submit(batch_items, modality, contents, spec, seeds)
+            group.size = len(contents)
+
+        for name, content in items:
+            if not name.lower().endswith(extensions):
+                window.append((name, None, 0))
+                continue
+            window.append((name, group, len(contents)))
+            contents.append(content)
+            seeds.append(item_seed(seed, index))
+            index += 1
+            if len(contents) < group_size:
+                continue
+            send()
+            group, contents, seeds = _Group(), [], []
+            in_flight += 1
+            while in_flight >= max(1, max_parallel):
+                name, done, position = window.popleft()
+                in_flight -= done is not None and position == done.size - 1
+                yield _finished(name, done, position, steps, used, unsupported)
+        if contents:
+            send()
+        while window:
+            yield _finished(*window.popleft(), steps, used, unsupported)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _finished(name: str, group: Optional[_Group], position: int, steps, used: Set[str], unsupported):
+    if group is None:
+        return unsupported(name)
+    try:
+        output, ext, error, elapsed = group.future.result()[position]
+    except Exception as e:
+        # The work never ran or was cut short (executor saturated, timed out)
+        output, ext, error, elapsed = None, None, str(e) or type(e).__name__, 0.0
+    return _result(name, output_name(name, ext, used) if error is None else None, output, error, elapsed, steps)
+
+
+def _result(name, output_name, output, error, elapsed, steps):
+    entry = {
+        "input": name,
+        "output": output_name if error is None else None,
+        "status": "ok" if error is None else "error",
+        "error": error,
+        "seconds": round(elapsed, 4),
+        "steps": steps
+    }
+    return output_name, output if error is None else None, entry
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, unseekable sink so zipfile can emit an archive incrementally"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(results: Iterable[Tuple[str, Optional[bytes], dict]]) -> Iterator[bytes]:
+    """Write results into a zip as they arrive, finishing with manifest.json"""
+    buffer = _StreamBuffer()
+    manifest = []
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for output_name, output, entry in results:
+            manifest.append(entry)
+            if output is not None:
+                archive.writestr(output_name, output)
+            yield buffer.drain()
+        archive.writestr("manifest.json", json.dumps({
+            "items": manifest,
+            "succeeded": sum(1 for e in manifest if e["status"] == "ok"),
+            "failed": sum(1 for e in manifest if e["status"] == "error")
+        }, indent=2))
+    yield buffer.drain()
@@ -0,0 +1,256 @@
+import hashlib
+import io
+import json
+import logging
+import os
+from typing import Any, List, Optional, Sequence, Union
+
+import numpy as np
+import torch
+import trimesh
+from torch.utils.data import DataLoader, Dataset, default_collate, get_worker_info
+
+from core.pipelines import plan_resources, plan_spec, results
+from core.resource_registry import registry
+from core.result_cache import step_seed
+from core.runner import find_inputs, write_atomic
+
+logger = logging.getLogger(__name__)
+
+# Training-time counterparts of the offline runner: a Dataset decodes one file
+# and applies a pipeline spec to it when the sample is requested, so
+# augmentations are drawn fresh every epoch instead of being materialized.
+# Only the spec (a plain dict) is pickled into DataLoader workers; each worker
+# compiles its own plan and loads its own resources.
+
+
+class PipelineDataset(Dataset):
+    """
+    Apply a pipeline spec lazily, one sample at a time.
+
+    inputs     a directory or manifest (see core.runner.find_inputs) or a list of paths
+    labels     optional targets, one per input; samples become (value, label)
+    seed       with a seed, sample i of epoch e is seeded with
+               seed + e * len(dataset) + i, so results do not depend on the
+               number of workers or the order samples are drawn in. Random
+               steps always draw from private generators (see
+               core.result_cache.make_generator), seeded from that or, without
+               a seed, from fresh entropy, never from the global RNGs.
+    cache_dir  store the decoded input after the leading deterministic steps
+               (the part that is the same every epoch) as a .pt file per input
+    """
+
+    modality: str = None
+
+    def __init__(self, spec: dict, inputs: Union[str, Sequence[str]], labels: Optional[Sequence[Any]] = None,
+                 seed: Optional[int] = None, cache_dir: Optional[str] = None):
+        plan = plan_spec(spec)
+        if plan.modality != self.modality:
+            raise ValueError(f"Pipeline spec is for {plan.modality}, not {self.modality}")
+        if isinstance(inputs, str):
+            inputs = [path for path, _ in find_inputs(inputs, self.modality)]
+        if labels is not None and len(labels) != len(inputs):
+            raise ValueError(f"Got {len(labels)} labels for {len(inputs)} inputs")
+        self.spec = spec
+        self.paths = list(inputs)
+        self.labels = labels
+        self.seed = plan.seed if seed is None else seed
+        self.cache_dir = cache_dir
+        self.epoch = 0
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def set_epoch(self, epoch: int):
+        """
+        Draw new augmentations for a new epoch (seeded datasets only). Call it
+        before iterating; workers started with persistent_workers=True keep the
+        epoch they were created with.
+        """
+        self.epoch = epoch
+
+    @property
+    def plan(self):
+        # plan_spec caches per process, so this compiles once in each worker
+        return plan_spec(self.spec)
+
+    @property
+    def prefix(self) -> int:
+        """Number of leading stages that are the same every epoch"""
+        plan = self.plan
+        return results.cacheable_prefix(plan.stage_keys, plan.deterministic)
+
+    def decode(self, content: bytes) -> Any:
+        raise NotImplementedError
+
+    def to_cache(self, value: Any) -> Any:
+        """Value -> something torch.save can store and torch.load(weights_only=True) can read"""
+        return value
+
+    def from_cache(self, value: Any) -> Any:
+        return value
+
+    def _cache_path(self, path: str) -> str:
+        stat = os.stat(path)
+        plan = self.plan
+        chain = json.dumps([plan.modality, plan.stage_keys[:self.prefix]])
+        source = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        return os.path.join(self.cache_dir, hashlib.sha1(chain.encode()).hexdigest()[:16],
+                            hashlib.sha1(source.encode()).hexdigest() + ".pt")
+
+    def _load_prefix(self, path: str) -> Any:
+        """Decoded input with the deterministic prefix applied, from the disk cache when possible"""
+        cache_path = self._cache_path(path) if self.cache_dir else None
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                return self.from_cache(torch.load(cache_path, weights_only=True))
+            except Exception as e:
+                logger.warning("Ignoring unreadable cache file %s: %s", cache_path, e)
+
+        with open(path, "rb") as f:
+            value = self.decode(f.read())
+        plan = self.plan
+        for stage in plan.stages[:self.prefix]:
+            value = plan.apply(stage.key, value)
+
+        if cache_path is not None:
+            buffer = io.BytesIO()
+            torch.save(self.to_cache(value), buffer)
+            write_atomic(cache_path, buffer.getvalue())
+        return value
+
+    def __getitem__(self, index: int) -> Any:
+        value = self._load_prefix(self.paths[index])
+        plan = self.plan
+        seed = None if self.seed is None else self.seed + self.epoch * len(self) + index
+        for position in range(self.prefix, len(plan.stages)):
+            value = plan.apply(plan.stages[position].key, value, step_seed(seed, position))
+        if self.labels is not None:
+            return value, self.labels[index]
+        return value
+
+
+class TextDataset(PipelineDataset):
+    """Samples are processed strings"""
+
+    modality = "text"
+
+    def decode(self, content: bytes) -> str:
+        return content.decode()
+
+
+class ImageDataset(PipelineDataset):
+    """Samples are (3, H, W) tensors: uint8, or float after normalize"""
+
+    modality = "image"
+
+    def decode(self, content: bytes) -> torch.Tensor:
+        from image.image_pipeline import to_tensor
+
+        return to_tensor(registry.get("image_preprocessor").decode(content))
+
+
+class AudioDataset(PipelineDataset):
+    """Samples are (channels, samples) float tensors at the preprocessor's sample rate; batch with pad_audio"""
+
+    modality = "audio"
+
+    def decode(self, content: bytes) -> torch.Tensor:
+        waveform, _ = registry.get("audio_preprocessor").load_audio(content)
+        return waveform
+
+
+class ModelDataset(PipelineDataset):
+    """Samples are Trimesh objects; batch with collate_meshes"""
+
+    modality = "model"
+
+    def decode(self, content: bytes) -> trimesh.Trimesh:
+        mesh = registry.get("model_preprocessor").load_obj(content)
+        if len(mesh.vertices) == 0:
+            raise ValueError("No vertices found in OBJ file")
+        return mesh
+
+    def to_cache(self, mesh: trimesh.Trimesh) -> dict:
+        return {"vertices": torch.from_numpy(np.asarray(mesh.vertices)),
+                "faces": torch.from_numpy(np.asarray(mesh.faces))}
+
+    def from_cache(self, value: dict) -> trimesh.Trimesh:
+        return trimesh.Trimesh(vertices=value["vertices"].numpy(), faces=value["faces"].numpy(), process=False)
+
+
+DATASETS = {cls.modality: cls for cls in (TextDataset, ImageDataset, AudioDataset, ModelDataset)}
+
+
+def pipeline_dataset(spec: dict, inputs: Union[str, Sequence[str]], **options) -> PipelineDataset:
+    """The Dataset class for the spec's modality"""
+    return DATASETS[plan_spec(spec).modality](spec, inputs, **options)
+
+
+def worker_init_fn(worker_id: int):
+    """
+    Load the plan's resources before the worker's first sample. The global
+    RNGs are left alone: random steps get their own generators per sample,
+    so workers never share augmentation streams.
+    """
+    info = get_worker_info()
+    if info is not None and isinstance(info.dataset, PipelineDataset):
+        registry.warmup(plan_resources(info.dataset.plan))
+
+
+def _split_labels(batch: List[Any]):
+    if batch and isinstance(batch[0], tuple):
+        values, labels = zip(*batch)
+        return list(values), default_collate(list(labels))
+    return batch, None
+
+
+def pad_audio(batch: List[Any]):
+    """
+    Zero-pad waveforms to the longest one: returns a (N, channels, samples)
+    tensor and the original lengths, plus the collated labels if any.
+    """
+    waveforms, labels = _split_labels(batch)
+    channels = {w.shape[0] for w in waveforms}
+    if len(channels) > 1:
+        raise ValueError(f"Cannot batch waveforms with different channel counts: {sorted(channels)}")
+    lengths = torch.tensor([w.shape[-1] for w in waveforms])
+    padded = waveforms[0].new_zeros((len(waveforms), channels.pop(), int(lengths.max())))
+    for i, waveform in enumerate(waveforms):
+        padded[i, :, :waveform.shape[-1]] = waveform
+    return (padded, lengths) if labels is None else (padded, lengths, labels)
+
+
+def collate_meshes(batch: List[Any]):
+    """
+    Pack meshes into one vertex and one face tensor (face indices offset into
+    the packed vertices), with per-mesh counts to split them again. Returns a
+    dict, plus the collated labels if any.
+    """
+    meshes, labels = _split_labels(batch)
+    vertex_counts = torch.tensor([len(m.vertices) for m in meshes])
+    offsets = torch.cumsum(vertex_counts, 0) - vertex_counts
+    packed = {
+        "vertices": torch.cat([torch.from_numpy(np.asarray(m.vertices, dtype=np.float32)) for m in meshes]),
+        "faces": torch.cat([torch.from_numpy(np.asarray(m.faces, dtype=np.int64)) + int(offset)
+                            for m, offset in zip(meshes, offsets)]),
+        "vertex_counts": vertex_counts,
+        "face_counts": torch.tensor([len(m.faces) for m in meshes])
+    }
+    return packed if labels is None else (packed, labels)
+
+
+COLLATE_FNS = {"audio": pad_audio, "model": collate_meshes}
+
+
+def pipeline_loader(dataset: PipelineDataset, batch_size: int = 32, num_workers: int = 0, **options) -> DataLoader:
+    """
+    DataLoader with the modality's collate function and worker_init_fn filled
+    in. Unseeded datasets keep their workers (and loaded resources) between
+    epochs; seeded ones restart them so set_epoch() reaches the workers.
+    """
+    options.setdefault("collate_fn", COLLATE_FNS.get(dataset.modality, default_collate))
+    options.setdefault("worker_init_fn", worker_init_fn)
+    if num_workers > 0:
+        options.setdefault("persistent_workers", dataset.seed is None)
+    return DataLoader(dataset, batch_size=batch_size, num_workers=num_workers, **options)
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class Saturated(Exception):
+    """Raised when a modality already has too many requests running and queued"""
+
+
+class ModalityExecutor:
+    """
+    Run CPU-bound pipelines off the event loop.
+
+    Each modality has its own concurrency limit and queue depth; requests
+    beyond ``concurrency + max_queue`` are rejected with Saturated instead of
+    piling up. ``kind`` is "thread", "process" or "inline" (run on the event
+    loop, as before this layer existed).
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: Optional[int] = None,
+                 concurrency: Optional[Dict[str, int]] = None, max_queue: Optional[Dict[str, int]] = None,
+                 timeout: Optional[float] = None):
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.concurrency = concurrency or {}
+        self.max_queue = max_queue or {}
+        self.timeout = timeout
+        self._pool: Optional[Executor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._pending: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline")
+        return self._pool
+
+    def _limit(self, modality: str) -> int:
+        return self.concurrency.get(modality, self.max_workers)
+
+    def _semaphore(self, modality: str) -> asyncio.Semaphore:
+        if modality not in self._semaphores:
+            self._semaphores[modality] = asyncio.Semaphore(self._limit(modality))
+        return self._semaphores[modality]
+
+    async def run(self, modality: str, fn: Callable, *args) -> Any:
+        """Run fn(*args) for a modality; raises Saturated or asyncio.TimeoutError"""
+        with self._lock:
+            pending = self._pending.get(modality, 0)
+            if pending >= self._limit(modality) + self.max_queue.get(modality, 16):
+                raise Saturated(f"Too many {modality} requests in progress, try again later")
+            self._pending[modality] = pending + 1
+
+        semaphore = self._semaphore(modality)
+        acquired = False
+        try:
+            await semaphore.acquire()
+            acquired = True
+            if self.kind == "inline":
+                return fn(*args)
+
+            future = asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+            try:
+                # shield() so a timeout doesn't drop the slot while the worker is still busy
+                return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except asyncio.TimeoutError:
+                acquired = False
+                future.add_done_callback(lambda _: semaphore.release())
+                raise
+        finally:
+            if acquired:
+                semaphore.release()
+            with self._lock:
+                self._pending[modality] -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "pending": dict(self._pending),
+                "concurrency": {m: self._limit(m) for m in self._pending}
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+def create_executor() -> ModalityExecutor:
+    """Build the executor from EXECUTOR_* and <MODALITY>_CONCURRENCY/_QUEUE environment variables"""
+    modalities = ("text", "image", "audio", "model")
+    concurrency = {}
+    max_queue = {}
+    for modality in modalities:
+        if f"{modality.upper()}_CONCURRENCY" in os.environ:
+            concurrency[modality] = int(os.environ[f"{modality.upper()}_CONCURRENCY"])
+        if f"{modality.upper()}_QUEUE" in os.environ:
+            max_queue[modality] = int(os.environ[f"{modality.upper()}_QUEUE"])
+    timeout = os.environ.get("EXECUTOR_TIMEOUT")
+    workers = os.environ.get("EXECUTOR_WORKERS")
+    return ModalityExecutor(
+        kind=os.environ.get("EXECUTOR_KIND", "thread"),
+        max_workers=int(workers) if workers else None,
+        concurrency=concurrency,
+        max_queue=max_queue,
+        timeout=float(timeout) if timeout else 120.0
+    )
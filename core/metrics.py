@@ -0,0 +1,231 @@
+import contextvars
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.result_cache import estimate_size
+
+# METRICS=0 turns instrumentation off: no middleware, no traces, and the
+# per-step check in Plan.apply finds no active trace. SERVER_TIMING=1 adds a
+# Server-Timing header with the request's queue wait, phases and steps.
+ENABLED = os.environ.get("METRICS", "1") != "0"
+SERVER_TIMING = ENABLED and os.environ.get("SERVER_TIMING") == "1"
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 1 KiB to 1 GiB in powers of 4
+BYTES_BUCKETS = tuple(float(1024 * 4 ** i) for i in range(11))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """Prometheus-style histogram with a fixed set of label names"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> per-bucket counts (last one is +Inf), then the sum
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, series in items:
+            count = 0
+            for bound, n in zip(self.buckets + (math.inf,), series):
+                count += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values: str):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in items]
+        return lines
+
+
+def render_gauge(name: str, help: str, labels: Sequence[str], values: Dict[Tuple[str, ...], float]) -> List[str]:
+    """Gauge lines for values read at scrape time (cache size, pending requests)"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    lines += [f"{name}{_labels(labels, k)} {_number(v)}" for k, v in sorted(values.items())]
+    return lines
+
+
+class Metrics:
+    """The process's metrics, rendered in the Prometheus text format by /metrics"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        self._metrics.append(Histogram(*args, **kwargs))
+        return self._metrics[-1]
+
+    def counter(self, *args, **kwargs) -> Counter:
+        self._metrics.append(Counter(*args, **kwargs))
+        return self._metrics[-1]
+
+    def render(self, *extra: List[str]) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for block in extra:
+            lines += block
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+QUEUE_WAIT = metrics.histogram("pipeline_queue_wait_seconds", "Time a request waited for an executor slot",
+                               ["modality"])
+PIPELINE_SECONDS = metrics.histogram("pipeline_seconds", "Time in the worker, decode to encode", ["modality"])
+PHASE_SECONDS = metrics.histogram("pipeline_phase_seconds", "Decode and encode time", ["modality", "phase"])
+STEP_SECONDS = metrics.histogram("pipeline_step_seconds", "Time per pipeline stage (cache hits are not run)",
+                                 ["modality", "step"])
+STEP_BYTES = metrics.histogram("pipeline_step_output_bytes", "Tensor/array bytes produced by a pipeline stage",
+                               ["modality", "step"], BYTES_BUCKETS)
+ERRORS = metrics.counter("pipeline_errors_total", "Requests that failed while processing", ["modality"])
+REQUEST_SECONDS = metrics.histogram("http_request_seconds", "Request handling time until the response starts",
+                                    ["route", "status"])
+REQUEST_BYTES = metrics.histogram("http_request_bytes", "Request body size (Content-Length)", ["route"],
+                                  BYTES_BUCKETS)
+RESPONSE_BYTES = metrics.histogram("http_response_bytes", "Response body size (Content-Length, not streamed)",
+                                   ["route"], BYTES_BUCKETS)
+
+
+class Trace:
+    """
+    Timings and output sizes recorded while one pipeline call runs. It is
+    filled in by whichever worker runs the call and sent back with the
+    result, so it works the same for thread and process executors.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.seconds = 0.0
+        self.queue_wait = 0.0
+        # (kind, name, seconds, output bytes); kind is "phase" or "step"
+        self.spans: List[Tuple[str, str, float, Optional[int]]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append(("phase", name, time.perf_counter() - start, None))
+
+    def step(self, name: str, seconds: float, value: Any):
+        self.spans.append(("step", name, seconds, estimate_size(value)))
+
+    def server_timing(self) -> List[str]:
+        entries = [f"queue;dur={self.queue_wait * 1000:.1f}"]
+        steps = 0
+        for kind, name, seconds, _ in self.spans:
+            if kind == "phase":
+                entries.append(f"{name};dur={seconds * 1000:.1f}")
+            else:
+                entries.append(f'step{steps};desc="{_escape(name)}";dur={seconds * 1000:.1f}')
+                steps += 1
+        entries.append(f"pipeline;dur={self.seconds * 1000:.1f}")
+        return entries
+
+
+_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+# Traces of the request being handled, for the Server-Timing header
+_request_traces: contextvars.ContextVar = contextvars.ContextVar("request_traces", default=None)
+_NO_TRACE = nullcontext()
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def timed(phase: str):
+    """Context manager timing a phase of the current trace; a no-op outside one"""
+    trace = _trace.get()
+    return _NO_TRACE if trace is None else trace.phase(phase)
+
+
+def traced(fn: Callable, *args) -> Tuple[Any, Trace]:
+    """Run fn(*args) under a new Trace and return (result, trace); picklable for process pools"""
+    trace = Trace()
+    token = _trace.set(trace)
+    start = time.perf_counter()
+    try:
+        return fn(*args), trace
+    finally:
+        trace.seconds = time.perf_counter() - start
+        _trace.reset(token)
+
+
+def observe_trace(modality: str, trace: Trace, queued_at: float):
+    """Record a finished trace in the histograms (called in the web process)"""
+    trace.queue_wait = max(0.0, trace.started - queued_at)
+    QUEUE_WAIT.observe(trace.queue_wait, modality)
+    PIPELINE_SECONDS.observe(trace.seconds, modality)
+    for kind, name, seconds, size in trace.spans:
+        if kind == "phase":
+            PHASE_SECONDS.observe(seconds, modality, name)
+        else:
+            STEP_SECONDS.observe(seconds, modality, name)
+            STEP_BYTES.observe(size, modality, name)
+    traces = _request_traces.get()
+    if traces is not None:
+        traces.append(trace)
+
+
+def begin_request() -> List[Trace]:
+    """Collect the traces of the current request (call from the HTTP middleware)"""
+    traces: List[Trace] = []
+    _request_traces.set(traces)
+    return traces
@@ -0,0 +1,399 @@
+import json
+import logging
+import time
+from functools import lru_cache, partial
+from typing import Any, Callable, Collection, Dict, List, Optional, Sequence, Tuple, Union
+
+from core.metrics import current_trace
+from core.result_cache import make_generator
+
+logger = logging.getLogger(__name__)
+
+# A pipeline spec is a JSON object:
+#
+#   {
+#     "modality": "image",
+#     "steps": ["normalize", {"name": "resize", "params": {"size": [256, 256]}},
+#               {"name": "augment:rotate", "params": {"degrees": 15}}],
+#     "reorder": true,      # let the planner move commuting steps (default true)
+#     "on_error": "skip",   # "skip" a failing step with a warning, or "raise"
+#     "seed": 3             # optional; a request's own seed takes precedence
+#   }
+#
+# Steps are looked up in the StepRegistry, validated, optionally reordered and
+# compiled into stages once per distinct spec (see plan_spec).
+SPEC_KEYS = ("modality", "steps", "reorder", "on_error", "seed")
+ON_ERROR = ("skip", "raise")
+
+
+def with_augmentation(steps: List[str], augmentation: Optional[str]) -> List[str]:
+    """Full step chain for the cache key; augmentations are prefixed to keep names distinct"""
+    steps = list(steps)
+    if augmentation and augmentation != "none":
+        steps.append(f"augment:{augmentation}")
+    return steps
+
+
+def _default_type(default: Any) -> Optional[Tuple[type, ...]]:
+    """Parameter types implied by a default value; None when it doesn't say"""
+    if default is None:
+        return None
+    if isinstance(default, bool):
+        return (bool,)
+    if isinstance(default, (int, float)):
+        return (int, float)
+    if isinstance(default, (list, tuple)):
+        return (list, tuple)
+    return (type(default),)
+
+
+def _is_type(value: Any, expected: Tuple[type, ...]) -> bool:
+    # bool is a subclass of int, but true/false is never a valid number
+    if isinstance(value, bool):
+        return bool in expected
+    return isinstance(value, expected)
+
+
+class StepDef:
+    """
+    A registered step: ``fn(value, **params)`` plus what the planner needs to
+    know about it.
+
+    defaults       tunable parameters and their default values
+    types          parameter types where the default doesn't show them (required for
+                   None defaults); numbers accept int or float, bools only bool
+    choices        allowed values for string parameters
+    deterministic  output depends only on the input (cacheable without a seed)
+    rng            random steps: the kind of generator ("torch", "numpy" or "python",
+                   see make_generator) passed to fn as ``rng``; implies not deterministic
+    batch_fn       optional ``fn(values, **params)`` used when a whole batch is processed
+    fuse           steps with the same fuse group are compiled together by the group's builder
+    shrinks        ``shrinks(value, **params)``: whether the output will be smaller than
+                   the value, in which case the step should run before the steps it commutes with
+    commutes       steps a shrinking step may be moved in front of
+    """
+
+    def __init__(self, modality: str, name: str, fn: Callable, defaults: Optional[Dict[str, Any]] = None,
+                 types: Optional[Dict[str, Union[type, Tuple[type, ...]]]] = None,
+                 choices: Optional[Dict[str, Sequence[str]]] = None, deterministic: bool = True,
+                 batch_fn: Optional[Callable] = None, fuse: Optional[str] = None,
+                 shrinks: Optional[Callable[..., bool]] = None, commutes: Collection[str] = (),
+                 rng: Optional[str] = None):
+        self.modality = modality
+        self.name = name
+        self.fn = fn
+        self.defaults = dict(defaults or {})
+        self.types = {key: _default_type(value) for key, value in self.defaults.items()}
+        for key, expected in (types or {}).items():
+            self.types[key] = expected if isinstance(expected, tuple) else (expected,)
+        untyped = [key for key, value in self.types.items() if value is None]
+        if untyped:
+            raise ValueError(f"Step '{name}' needs explicit types for {', '.join(untyped)} (default None)")
+        self.choices = dict(choices or {})
+        self.deterministic = deterministic and rng is None
+        self.rng = rng
+        self.batch_fn = batch_fn
+        self.fuse = fuse
+        self.shrinks = shrinks
+        self.commutes = frozenset(commutes)
+
+    def check_params(self, params: Dict[str, Any]):
+        for key, value in params.items():
+            if key not in self.defaults:
+                expected = ", ".join(self.defaults) or "none"
+                raise ValueError(f"Unknown parameter '{key}' for step '{self.name}' (parameters: {expected})")
+            default = self.defaults[key]
+            if key in self.choices:
+                valid = value in self.choices[key]
+            elif isinstance(default, (list, tuple)):
+                valid = (isinstance(value, (list, tuple)) and len(value) == len(default)
+                         and all(_is_type(v, _default_type(d)) for v, d in zip(value, default)))
+            else:
+                valid = _is_type(value, self.types[key])
+            if not valid:
+                if key in self.choices:
+                    expected = " or ".join(map(str, self.choices[key]))
+                elif default is None:
+                    expected = " or ".join("null" if t is type(None) else t.__name__ for t in self.types[key])
+                else:
+                    expected = json.dumps(default)
+                raise ValueError(f"Invalid value {json.dumps(value)} for '{self.name}.{key}', expected something like {expected}")
+
+    def key(self, params: Dict[str, Any]) -> str:
+        """Cache key of the step: its name, plus any parameters that differ from the defaults"""
+        changed = {k: v for k, v in params.items() if self.defaults.get(k) != v}
+        if not changed:
+            return self.name
+        return f"{self.name}({','.join(f'{k}={json.dumps(v)}' for k, v in sorted(changed.items()))})"
+
+    def describe(self) -> dict:
+        return {
+            "params": self.defaults,
+            "choices": self.choices,
+            "deterministic": self.deterministic
+        }
+
+
+class StepRegistry:
+    """Steps available to pipeline specs, per modality"""
+
+    def __init__(self):
+        self._steps: Dict[str, Dict[str, StepDef]] = {}
+        self._fusions: Dict[Tuple[str, str], Callable[[List[Tuple[str, Dict]]], Callable]] = {}
+
+    def register(self, modality: str, name: str, fn: Callable, **options):
+        self._steps.setdefault(modality, {})[name] = StepDef(modality, name, fn, **options)
+
+    def register_fusion(self, modality: str, group: str, builder: Callable[[List[Tuple[str, Dict]]], Callable]):
+        """builder([(name, params), ...]) -> one callable applying a run of steps of that fuse group"""
+        self._fusions[(modality, group)] = builder
+
+    def modalities(self) -> List[str]:
+        return list(self._steps)
+
+    def get(self, modality: str, name: str) -> StepDef:
+        if modality not in self._steps:
+            raise ValueError(f"Unknown modality '{modality}', expected one of {', '.join(self._steps)}")
+        if name not in self._steps[modality]:
+            raise ValueError(f"Unknown {modality} step '{name}', expected one of {', '.join(self._steps[modality])}")
+        return self._steps[modality][name]
+
+    def fusion(self, modality: str, group: str) -> Callable:
+        return self._fusions[(modality, group)]
+
+    def describe(self) -> Dict[str, Dict[str, dict]]:
+        return {modality: {name: step.describe() for name, step in steps.items()}
+                for modality, steps in self._steps.items()}
+
+
+steps = StepRegistry()
+
+
+class Stage:
+    """
+    One compiled pass of a plan: a single step, or a fused run of steps.
+    ``key`` includes non-default parameters (for caching); ``name`` doesn't
+    (for metrics labels). A stage with ``rng`` gets a private generator of
+    that kind on every call.
+    """
+
+    def __init__(self, key: str, fn: Callable, deterministic: bool, batch_fn: Optional[Callable] = None,
+                 name: Optional[str] = None, rng: Optional[str] = None):
+        self.key = key
+        self.name = name or key
+        self.fn = fn
+        self.deterministic = deterministic
+        self.batch_fn = batch_fn
+        self.rng = rng
+
+
+class Plan:
+    """A validated spec compiled into stages; get one with plan_spec() so equal specs share a plan"""
+
+    def __init__(self, modality: str, steps: List[Tuple[str, Dict]], stages: List[Stage],
+                 on_error: str = "skip", seed: Optional[int] = None):
+        self.modality = modality
+        self.steps = steps
+        self.stages = stages
+        self.on_error = on_error
+        self.seed = seed
+        self._by_key = {stage.key: stage for stage in stages}
+
+    @property
+    def stage_keys(self) -> List[str]:
+        return [stage.key for stage in self.stages]
+
+    @property
+    def deterministic(self) -> set:
+        return {stage.key for stage in self.stages if stage.deterministic}
+
+    def apply(self, key: str, value: Any, seed: Optional[int] = None) -> Any:
+        """
+        Apply one stage; with on_error="skip" a failing stage passes its input
+        through. Random stages draw from a generator built from ``seed`` (the
+        step's own seed, see step_seed), or an unseeded one. Inside a metrics
+        trace the stage's time and output size are recorded.
+        """
+        trace = current_trace()
+        if trace is None:
+            return self._apply(key, value, seed)
+        start = time.perf_counter()
+        value = self._apply(key, value, seed)
+        trace.step(self._by_key[key].name, time.perf_counter() - start, value)
+        return value
+
+    def _apply(self, key: str, value: Any, seed: Optional[int]) -> Any:
+        stage = self._by_key[key]
+        try:
+            if stage.rng is not None:
+                return stage.fn(value, rng=make_generator(stage.rng, seed))
+            return stage.fn(value)
+        except Exception as e:
+            if self.on_error == "raise":
+                raise
+            logger.warning("Failed to apply %s: %s", key, e)
+            return value
+
+    def __call__(self, value: Any) -> Any:
+        """Apply every stage, without caching or seeding (random stages draw from unseeded generators)"""
+        for stage in self.stages:
+            value = self.apply(stage.key, value)
+        return value
+
+    def run(self, value: Any, cache, input_id: Optional[str] = None, seed: Optional[int] = None) -> Any:
+        """Apply the plan through a ResultCache, resuming from cached intermediates of ``input_id``"""
+        seed = self.seed if seed is None else seed
+        return cache.run(self.modality, input_id, self.stage_keys, value, self.apply, self.deterministic, seed)
+
+    def describe(self) -> dict:
+        return {
+            "modality": self.modality,
+            "steps": [{"name": name, "params": params} for name, params in self.steps],
+            "stages": self.stage_keys,
+            "deterministic": [stage.key for stage in self.stages if stage.deterministic],
+            "on_error": self.on_error,
+            "seed": self.seed
+        }
+
+
+def load_spec(modality: Optional[str], spec: Union[None, str, dict] = None, preprocessing: Sequence[str] = (),
+              augmentation: Optional[str] = None) -> dict:
+    """
+    The pipeline spec of a request: a JSON string or dict, or one built from
+    the preprocessing/augmentation form fields when no spec is given. With
+    modality None the spec must name its own.
+    """
+    if spec is None or spec == "":
+        return {"modality": modality, "steps": with_augmentation(preprocessing, augmentation)}
+    if isinstance(spec, str):
+        try:
+            spec = json.loads(spec)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Pipeline spec is not valid JSON: {str(e)}")
+    if not isinstance(spec, dict):
+        raise ValueError("Pipeline spec must be a JSON object")
+    spec = dict(spec)
+    if modality is not None and spec.setdefault("modality", modality) != modality:
+        raise ValueError(f"Pipeline spec is for {spec['modality']}, not {modality}")
+    return spec
+
+
+def parse_steps(modality: str, entries) -> List[Tuple[str, Dict]]:
+    """Validate the "steps" list into (name, params) pairs with defaults filled in"""
+    if not isinstance(entries, list):
+        raise ValueError("Pipeline spec 'steps' must be a list")
+    parsed = []
+    for entry in entries:
+        if isinstance(entry, str):
+            name, params = entry, {}
+        elif isinstance(entry, dict) and isinstance(entry.get("name"), str):
+            unknown = set(entry) - {"name", "params"}
+            if unknown:
+                raise ValueError(f"Unknown keys in step '{entry['name']}': {', '.join(sorted(unknown))}")
+            name, params = entry["name"], entry.get("params") or {}
+            if not isinstance(params, dict):
+                raise ValueError(f"Parameters of step '{name}' must be an object")
+        else:
+            raise ValueError(f"Invalid step {json.dumps(entry)}: expected a name or {{\"name\": ..., \"params\": {{...}}}}")
+        step = steps.get(modality, name)
+        step.check_params(params)
+        parsed.append((name, dict(step.defaults, **params)))
+    return parsed
+
+
+def reorder(modality: str, parsed: List[Tuple[str, Dict]]) -> List[List[Tuple[str, Dict]]]:
+    """
+    Group a shrinking step (resize) with the steps right before it that it
+    commutes with, so it can run in front of them, on less data, when it
+    does shrink the input (only known at run time; see _reordered_stage).
+    Returns the steps in order as runs: single steps, or such groups.
+    """
+    runs: List[List[Tuple[str, Dict]]] = []
+    for name, params in parsed:
+        step = steps.get(modality, name)
+        jumped = []
+        if step.shrinks is not None:
+            while runs and len(runs[-1]) == 1 and runs[-1][0][0] in step.commutes:
+                jumped.insert(0, runs.pop()[0])
+        runs.append(jumped + [(name, params)])
+    return runs
+
+
+def _reordered_stage(modality: str, run: List[Tuple[str, Dict]]) -> Callable:
+    """Apply a run whose last step shrinks: first when it shrinks this value, in spec order otherwise"""
+    defs = [steps.get(modality, name) for name, _ in run]
+    fns = [(d.rng is not None, partial(d.fn, **params)) for d, (_, params) in zip(defs, run)]
+    shrinking, (_, shrink_params) = defs[-1], run[-1]
+
+    def stage(value, rng=None):
+        order = fns[-1:] + fns[:-1] if shrinking.shrinks(value, **shrink_params) else fns
+        for random, fn in order:
+            value = fn(value, rng=rng) if random else fn(value)
+        return value
+    return stage
+
+
+def compile_stages(modality: str, runs: List[List[Tuple[str, Dict]]]) -> List[Stage]:
+    """
+    Bind parameters once, fuse consecutive steps that share a fuse group and
+    compile groups from reorder into one stage each
+    """
+    stages = []
+    i = 0
+    while i < len(runs):
+        if len(runs[i]) > 1:
+            run = runs[i]
+            defs = [steps.get(modality, n) for n, _ in run]
+            stages.append(Stage("+".join(d.key(p) for d, (_, p) in zip(defs, run)), _reordered_stage(modality, run),
+                                all(d.deterministic for d in defs), name="+".join(n for n, _ in run),
+                                rng=next((d.rng for d in defs if d.rng is not None), None)))
+            i += 1
+            continue
+
+        name, params = runs[i][0]
+        step = steps.get(modality, name)
+        if step.fuse is None:
+            batch_fn = partial(step.batch_fn, **params) if step.batch_fn is not None else None
+            stages.append(Stage(step.key(params), partial(step.fn, **params), step.deterministic, batch_fn, name,
+                                step.rng))
+            i += 1
+            continue
+
+        run = [runs[i][0]]
+        i += 1
+        while i < len(runs) and len(runs[i]) == 1 and steps.get(modality, runs[i][0][0]).fuse == step.fuse:
+            run.append(runs[i][0])
+            i += 1
+        defs = [steps.get(modality, n) for n, _ in run]
+        key = "+".join(d.key(p) for d, (_, p) in zip(defs, run))
+        # A fused stage takes a generator if any of its steps is random; one fuse group shares one kind
+        rng = next((d.rng for d in defs if d.rng is not None), None)
+        stages.append(Stage(key, steps.fusion(modality, step.fuse)(run), all(d.deterministic for d in defs),
+                            name="+".join(n for n, _ in run), rng=rng))
+    return stages
+
+
+def plan_spec(spec: dict) -> Plan:
+    """Validate and compile a spec; plans are cached per distinct spec in each process"""
+    return _plan(json.dumps(spec, sort_keys=True))
+
+
+@lru_cache(maxsize=256)
+def _plan(canonical: str) -> Plan:
+    spec = json.loads(canonical)
+    unknown = set(spec) - set(SPEC_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown pipeline spec keys: {', '.join(sorted(unknown))}")
+    if "modality" not in spec:
+        raise ValueError("Pipeline spec needs a 'modality'")
+    on_error = spec.get("on_error", "skip")
+    if on_error not in ON_ERROR:
+        raise ValueError(f"'on_error' must be one of {', '.join(ON_ERROR)}")
+    seed = spec.get("seed")
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        raise ValueError("'seed' must be an integer")
+
+    modality = spec["modality"]
+    parsed = parse_steps(modality, spec.get("steps", []))
+    runs = reorder(modality, parsed) if spec.get("reorder", True) else [[step] for step in parsed]
+    return Plan(modality, parsed, compile_stages(modality, runs), on_error, seed)
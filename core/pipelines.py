@@ -0,0 +1,358 @@
+import base64
+import logging
+import os
+from typing import List, Optional
+
+from audio.audio_augmentation import AudioAugmenter
+from audio.audio_preprocessing import AudioPreprocessor
+from image import image_pipeline
+from image.image_augmentation import ImageAugmenter
+from image.image_pipeline import set_num_threads, to_pil, to_tensor
+from image.image_preprocessing import PREVIEW_SIZE, ImagePreprocessor
+from text.text_augmentation import TextAugmenter
+from text.text_preprocessing import TextPreprocessor
+from text.text_pipeline import fuse_character_steps
+from text.text_stream import process_chunks
+from model.model_augmentation import ModelAugmenter
+from model.model_pipeline import NORMALIZED_RADIUS, MeshPipeline
+from model.model_preprocessing import ModelPreprocessor
+from core.metrics import timed
+from core.pipeline_spec import Plan, plan_spec, steps
+from core.resource_registry import registry
+from core.result_cache import ResultCache
+from core.transport import encode_payload
+
+# The run_*_pipeline functions are plain module-level callables so they can be
+# sent to a thread or process pool; each worker process gets its own registry
+# and result cache. They take a pipeline spec (a plain dict, see
+# core.pipeline_spec) and compile it to a Plan once per process.
+
+logger = logging.getLogger(__name__)
+
+# Heavy objects are built once per worker and shared across requests
+registry.register("text_preprocessor", TextPreprocessor)
+registry.register("text_augmenter", lambda: TextAugmenter(store_path=os.environ.get("GLOVE_STORE")))
+registry.register("image_preprocessor", ImagePreprocessor)
+registry.register("image_augmenter", ImageAugmenter)
+registry.register("audio_preprocessor", AudioPreprocessor)
+registry.register("audio_augmenter", AudioAugmenter)
+registry.register("model_preprocessor", lambda: ModelPreprocessor(debug=os.environ.get("MODEL_DEBUG") == "1"))
+registry.register("model_augmenter", ModelAugmenter)
+
+# Intra-op threads for tensor work; keep workers x threads within the core count
+set_num_threads(int(os.environ.get("TORCH_NUM_THREADS", 0)))
+
+# Intermediate results of deterministic steps, keyed by input hash + step chain
+results = ResultCache(max_bytes=int(os.environ.get("RESULT_CACHE_BYTES", 512 * 1024 * 1024)))
+
+# Face budgets of the preview levels sent to the viewer, coarse to fine
+MODEL_LOD_FACES = [int(f) for f in os.environ.get("MODEL_LOD_FACES", "2000,10000,50000").split(",")]
+
+
+def _method(resource: str, method: str):
+    """Step calling a method of a registry resource, looked up when the step runs"""
+    def fn(value, **params):
+        return getattr(registry.get(resource), method)(value, **params)
+    fn.resource = resource
+    return fn
+
+
+# Steps available to pipeline specs. Random steps (noise, random
+# augmentations) name the generator they take as ``rng``; they get a private
+# one per call, seeded from the request seed when there is one, and are
+# cached only when the request passes a seed.
+steps.register("text", "lowercase", TextPreprocessor.to_lowercase, fuse="character")
+steps.register("text", "punctuation", TextPreprocessor.remove_punctuation, fuse="character")
+steps.register("text", "lemmatize", _method("text_preprocessor", "lemmatize_text"),
+               batch_fn=_method("text_preprocessor", "lemmatize_batch"))
+steps.register("text", "augment:word_swap", _method("text_augmenter", "word_swap"),
+               defaults={"swap_percent": 0.1}, rng="python")
+steps.register("text", "augment:synonym", _method("text_augmenter", "synonym_replacement"),
+               defaults={"replace_percent": 0.1}, rng="python")
+# lowercase and punctuation commute, so any run of them is one translate pass
+steps.register_fusion("text", "character", lambda run: fuse_character_steps([name for name, _ in run]))
+
+# Image steps work on uint8 tensors. resize commutes (up to rounding) with
+# per-pixel steps and flips, so the planner runs it in front of them when it
+# makes the image smaller. Deterministic steps run on stacks of same-size
+# images when a whole batch is processed.
+steps.register("image", "resize", image_pipeline.resize, defaults={"size": [224, 224]},
+               batch_fn=image_pipeline.stacked(image_pipeline.resize), shrinks=image_pipeline.resize_shrinks,
+               commutes=("normalize", "grayscale", "augment:flip", "augment:color"))
+steps.register("image", "grayscale", image_pipeline.grayscale, batch_fn=image_pipeline.stacked(image_pipeline.grayscale))
+steps.register("image", "normalize", image_pipeline.normalize,
+               defaults={"mean": image_pipeline.IMAGENET_MEAN, "std": image_pipeline.IMAGENET_STD},
+               batch_fn=image_pipeline.stacked(image_pipeline.normalize))
+steps.register("image", "augment:flip", image_pipeline.hflip, batch_fn=image_pipeline.stacked(image_pipeline.hflip))
+steps.register("image", "augment:rotate", image_pipeline.rotate, defaults={"degrees": 60.0}, rng="torch")
+steps.register("image", "augment:color", image_pipeline.color_jitter,
+               defaults={"brightness": 0.5, "contrast": 0.2, "saturation": 0.8}, rng="torch")
+
+steps.register("audio", "noise", _method("audio_preprocessor", "add_noise"),
+               defaults={"noise_level": 0.005}, rng="torch")
+steps.register("audio", "lowpass", _method("audio_preprocessor", "apply_low_pass_filter"),
+               batch_fn=_method("audio_preprocessor", "low_pass_batch"),
+               defaults={"cutoff_freq": 4000, "order": None, "kind": "fir"}, types={"order": (int, type(None))},
+               choices={"kind": ("fir", "iir")})
+steps.register("audio", "speed", _method("audio_preprocessor", "change_speed"),
+               batch_fn=_method("audio_preprocessor", "change_speed_batch"), defaults={"speed_factor": 1.6})
+steps.register("audio", "augment:timeshift", _method("audio_augmenter", "time_shift"),
+               defaults={"shift_factor": -0.4})
+# A fixed shift, so its result can be cached
+steps.register("audio", "augment:pitch", _method("audio_augmenter", "pitch_shift"),
+               batch_fn=_method("audio_augmenter", "pitch_shift_batch"), defaults={"pitch_factor": 4})
+
+
+def _mesh_stage(run):
+    """All mesh steps are affine; a run of them becomes one composed transform"""
+    def stage(mesh, rng=None):
+        processor = registry.get("model_preprocessor")
+        return MeshPipeline(run, registry.get("model_augmenter"), debug=processor.debug, rng=rng)(mesh)
+    return stage
+
+
+steps.register("model", "center", None, fuse="affine")
+steps.register("model", "normalize", None, defaults={"radius": NORMALIZED_RADIUS}, fuse="affine")
+steps.register("model", "augment:rotate", None, defaults={"angle": 45.0}, fuse="affine")
+steps.register("model", "augment:scale", None, defaults={"min_scale": 0.8, "max_scale": 1.2},
+               rng="numpy", fuse="affine")
+steps.register_fusion("model", "affine", _mesh_stage)
+
+# Resources needed to decode an input of each modality
+DECODE_RESOURCES = {"image": ["image_preprocessor"], "audio": ["audio_preprocessor"], "model": ["model_preprocessor"]}
+
+
+def plan_resources(plan: Plan) -> List[str]:
+    """Registry resources a plan will use, so worker processes can load them up front"""
+    names = list(DECODE_RESOURCES.get(plan.modality, []))
+    if plan.modality == "model" and plan.steps:
+        names += ["model_preprocessor", "model_augmenter"]
+    for name, _ in plan.steps:
+        resource = getattr(steps.get(plan.modality, name).fn, "resource", None)
+        if resource is not None:
+            names.append(resource)
+    return list(dict.fromkeys(names))
+
+
+def run_text_pipeline(text: str, input_id: str, spec: dict, seed: Optional[int] = None) -> str:
+    """Apply the text steps, resuming from cached intermediates"""
+    return plan_spec(spec).run(text, results, input_id, seed)
+
+
+def run_text_chunks(chunks: List[str], spec: dict) -> List[str]:
+    """Apply the text steps to a batch of streamed chunks (nothing is cached)"""
+    return list(process_chunks(chunks, plan_spec(spec)))
+
+
+def decode_image(content: bytes, max_size: Optional[int] = None):
+    return registry.get("image_preprocessor").decode(content, max_size)
+
+
+def process_image(image, input_id: Optional[str], spec: dict, seed: Optional[int] = None):
+    """
+    Apply the image steps to a PIL image, resuming from cached intermediates.
+    Steps run on a uint8 tensor; it is converted back to PIL once at the end.
+    """
+    return to_pil(plan_spec(spec).run(to_tensor(image), results, input_id, seed))
+
+
+def run_image_pipeline(content: bytes, input_id: str, spec: dict, seed: Optional[int] = None,
+                       transport: str = "json", image_format: str = "png", quality: int = 85,
+                       compress_level: int = 6) -> dict:
+    processor = registry.get("image_preprocessor")
+
+    # Results are only displayed as previews, so decode (and process) at
+    # preview resolution; keep those intermediates apart from full-size ones
+    with timed("decode"):
+        image = decode_image(content, PREVIEW_SIZE)
+    preview_id = f"{input_id}@{PREVIEW_SIZE}" if input_id else None
+    processed_image = process_image(image, preview_id, spec, seed)
+
+    with timed("preview"):
+        image = processor.preview(image)
+        processed_image = processor.preview(processed_image)
+
+    try:
+        with timed("encode"):
+            original_data, media_type = processor.encode(image, image_format, quality, compress_level)
+            processed_data, _ = processor.encode(processed_image, image_format, quality, compress_level)
+    except Exception as e:
+        return {
+            "error": f"Failed to encode image: {str(e)}"
+        }
+
+    if transport == "binary":
+        # Encoded files; the caller stores them and hands out URLs
+        return {
+            "format": image_format,
+            "media_type": media_type,
+            "original_image": original_data,
+            "processed_image": processed_data
+        }
+
+    return {
+        "media_type": media_type,
+        "original_image": base64.b64encode(original_data).decode(),
+        "processed_image": base64.b64encode(processed_data).decode()
+    }
+
+
+def process_audio(waveform, input_id: Optional[str], spec: dict, seed: Optional[int] = None):
+    """Apply the audio steps to a waveform, resuming from cached intermediates"""
+    return plan_spec(spec).run(waveform.clone(), results, input_id, seed)
+
+
+def run_audio_pipeline(content: bytes, input_id: str, spec: dict, seed: Optional[int] = None,
+                       transport: str = "json", audio_format: str = "wav") -> dict:
+    processor = registry.get("audio_preprocessor")
+
+    try:
+        with timed("decode"):
+            waveform, sample_rate = processor.load_audio(content)
+    except Exception as e:
+        return {
+            "error": f"Failed to load audio file: {str(e)}"
+        }
+
+    processed_waveform = process_audio(waveform, input_id, spec, seed)
+
+    if transport == "binary":
+        # Encoded files; the caller stores them and hands out URLs
+        try:
+            with timed("encode"):
+                original_audio, media_type = processor.encode(waveform, sample_rate, audio_format)
+                processed_audio, _ = processor.encode(processed_waveform, sample_rate, audio_format)
+        except Exception as e:
+            return {
+                "error": f"Failed to encode audio: {str(e)}"
+            }
+        return {
+            "format": audio_format,
+            "media_type": media_type,
+            "sample_rate": sample_rate,
+            "channels": processed_waveform.shape[0],
+            "original_duration": waveform.shape[-1] / sample_rate,
+            "processed_duration": processed_waveform.shape[-1] / sample_rate,
+            "original_audio": original_audio,
+            "processed_audio": processed_audio
+        }
+
+    # Convert to base64 for web playback
+    try:
+        with timed("encode"):
+            original_audio_b64 = processor.to_base64(waveform, sample_rate)
+            processed_audio_b64 = processor.to_base64(processed_waveform, sample_rate)
+    except Exception as e:
+        return {
+            "error": f"Failed to convert audio for playback: {str(e)}"
+        }
+
+    return {
+        "original_audio": original_audio_b64,
+        "processed_audio": processed_audio_b64
+    }
+
+
+def process_model(mesh, input_id: Optional[str], spec: dict, seed: Optional[int] = None):
+    """
+    Apply the mesh steps to a Trimesh, resuming from cached intermediates.
+    Affine steps are composed into one transform; the result gets a new vertex
+    buffer and shares faces with the original, which stays intact for display.
+    """
+    return plan_spec(spec).run(mesh, results, input_id, seed)
+
+
+def model_lods(mesh, input_id: Optional[str], plan: Optional[Plan] = None, seed: Optional[int] = None) -> list:
+    """
+    Preview levels of a mesh, coarse to fine. Levels are cached per upload
+    when the plan that produced the mesh (none for the original) is itself
+    cacheable.
+    """
+    processor = registry.get("model_preprocessor")
+    chain = plan.stage_keys if plan is not None else []
+    if plan is not None and seed is None:
+        seed = plan.seed
+    deterministic = plan.deterministic if plan is not None else set()
+    cacheable = input_id is not None and results.cacheable_prefix(chain, deterministic, seed) == len(chain)
+    levels = []
+    for budget in sorted(MODEL_LOD_FACES):
+        if budget >= len(mesh.faces):
+            break
+        key = results.key("model", input_id, list(chain) + [f"lod:{budget}"], seed)
+        level = results.get(key) if cacheable else None
+        if level is None:
+            level = processor.decimate(mesh, budget)
+            if cacheable:
+                results.put(key, level)
+        levels.append(level)
+    return levels
+
+
+def run_model_pipeline(content: bytes, input_id: str, spec: dict, seed: Optional[int] = None,
+                       transport: str = "json", quantize: bool = False, encoding: Optional[str] = None,
+                       lod: bool = False, download: bool = False) -> dict:
+    """
+    ``lod`` adds decimated preview levels (original_lods/processed_lods) to
+    the result; ``download`` adds the full processed mesh as an OBJ file
+    (processed_obj, binary transport only) for users to save.
+    """
+    processor = registry.get("model_preprocessor")
+
+    try:
+        with timed("decode"):
+            mesh = processor.load_obj(content)
+    except Exception as e:
+        logger.warning("Failed to load mesh: %s", e)
+        return {
+            "error": f"Failed to load mesh: {str(e)}"
+        }
+
+    processed_mesh = process_model(mesh, input_id, spec, seed)
+
+    lods = {}
+    if lod:
+        with timed("lod"):
+            lods = {
+                "original_lods": model_lods(mesh, input_id),
+                "processed_lods": model_lods(processed_mesh, input_id, plan_spec(spec), seed)
+            }
+
+    if transport == "binary":
+        # Packed typed-array buffers; the caller stores them and hands out URLs
+        with timed("encode"):
+            original_model, encoding = encode_payload(processor.to_binary(mesh, quantize), encoding)
+            processed_model, _ = encode_payload(processor.to_binary(processed_mesh, quantize), encoding)
+            lods = {key: [encode_payload(processor.to_binary(level, quantize), encoding)[0] for level in levels]
+                    for key, levels in lods.items()}
+            if download:
+                # The packed buffers are only readable by the viewer
+                lods["processed_obj"] = encode_payload(processed_mesh.export(file_type="obj").encode(), encoding)[0]
+        result = {
+            "format": "binary",
+            "encoding": encoding,
+            "original_model": original_model,
+            "processed_model": processed_model,
+            "original_faces": len(mesh.faces),
+            "processed_faces": len(processed_mesh.faces)
+        }
+        result.update(lods)
+        return result
+
+    # Convert to JSON format for three.js
+    try:
+        with timed("encode"):
+            original_model = processor.to_json(mesh)
+            processed_model = processor.to_json(processed_mesh)
+            lods = {key: [processor.to_json(level) for level in levels] for key, levels in lods.items()}
+    except Exception as e:
+        logger.warning("Failed to convert model for display: %s", e)
+        return {
+            "error": f"Failed to convert model for display: {str(e)}"
+        }
+
+    result = {
+        "original_model": original_model,
+        "processed_model": processed_model
+    }
+    result.update(lods)
+    return result
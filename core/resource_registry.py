@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+import resource
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the peak (in KiB on Linux), good enough as a fallback
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ResourceRegistry:
+    """Process-wide registry of heavy objects (spaCy, GloVe, transforms).
+
+    Each resource is built by its factory the first time it is requested and
+    then shared by every request handled in this worker process.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._resources: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Register a factory; nothing is loaded until get() or warmup()"""
+        self._factories[name] = factory
+        self._locks.setdefault(name, threading.Lock())
+        self._stats.setdefault(name, {"loaded": False, "load_time": None, "memory_bytes": None, "loads": 0})
+
+    def get(self, name: str) -> Any:
+        if name in self._resources:
+            return self._resources[name]
+        if name not in self._factories:
+            raise KeyError(f"Unknown resource: {name}")
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            if name not in self._resources:
+                self._load(name)
+        return self._resources[name]
+
+    def _load(self, name: str):
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        self._resources[name] = self._factories[name]()
+        stats = self._stats[name]
+        stats["loaded"] = True
+        stats["load_time"] = time.perf_counter() - start
+        stats["memory_bytes"] = max(0, current_rss_bytes() - rss_before)
+        stats["loads"] += 1
+        logger.info("Loaded resource '%s' in %.2fs", name, stats["load_time"])
+
+    def warmup(self, names: Optional[Iterable[str]] = None):
+        """Load the given resources (all registered ones by default)"""
+        for name in (names if names is not None else list(self._factories)):
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning("Failed to warm up %s: %s", name, e)
+
+    def reload(self, name: Optional[str] = None):
+        """Drop and rebuild one resource, or every loaded one"""
+        names = [name] if name is not None else list(self._resources)
+        for n in names:
+            if n not in self._factories:
+                raise KeyError(f"Unknown resource: {n}")
+            with self._locks[n]:
+                self._resources.pop(n, None)
+                self._load(n)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+registry = ResourceRegistry()
@@ -0,0 +1,176 @@
+import random
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Collection, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate number of bytes held by a cached value"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, torch.Tensor):
+        return value.element_size() * value.nelement()
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "vertices") and hasattr(value, "faces"):
+        return value.vertices.nbytes + value.faces.nbytes
+    if hasattr(value, "size") and hasattr(value, "getbands"):
+        # PIL image
+        return value.size[0] * value.size[1] * len(value.getbands())
+    if isinstance(value, tuple):
+        return sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def copy_value(value: Any) -> Any:
+    """Copy mutable values so callers can't modify what is cached"""
+    if isinstance(value, torch.Tensor):
+        return value.clone()
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(copy_value(v) for v in value)
+    if hasattr(value, "copy") and not isinstance(value, (str, bytes)):
+        return value.copy()
+    return value
+
+
+def step_seed(seed: Optional[int], position: int) -> Optional[int]:
+    """Seed of one step of a seeded chain, so a resumed chain matches a full run"""
+    if seed is None:
+        return None
+    return (seed * 1000003 + position) % (2 ** 32)
+
+
+def make_generator(kind: str, seed: Optional[int] = None):
+    """
+    A private random generator for one step call: "torch" (torch.Generator),
+    "numpy" (np.random.Generator) or "python" (random.Random). None seeds it
+    from OS entropy. The process-global RNGs are never touched, so concurrent
+    requests can't disturb each other.
+    """
+    if kind == "python":
+        return random.Random(seed)
+    if kind == "numpy":
+        return np.random.default_rng(seed)
+    if kind == "torch":
+        generator = torch.Generator()
+        if seed is None:
+            generator.seed()
+        else:
+            generator.manual_seed(seed)
+        return generator
+    raise ValueError(f"Unknown generator kind: {kind}")
+
+
+class ResultCache:
+    """
+    LRU cache of intermediate pipeline results keyed by
+    (modality, input hash, step chain prefix, seed).
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[tuple, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(modality: str, input_id: str, chain: Sequence[str], seed: Optional[int] = None) -> tuple:
+        return modality, input_id, tuple(chain), seed
+
+    def get(self, key: tuple) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return copy_value(item[0])
+
+    def put(self, key: tuple, value: Any):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        value = copy_value(value)
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def cacheable_prefix(self, steps: Sequence[str], deterministic: Collection[str],
+                         seed: Optional[int] = None) -> int:
+        """Length of the leading run of steps whose output can be cached"""
+        if seed is not None:
+            return len(steps)
+        n = 0
+        for step in steps:
+            if step not in deterministic and not all(part in deterministic for part in step.split("+")):
+                break
+            n += 1
+        return n
+
+    def resume(self, modality: str, input_id: str, steps: Sequence[str],
+               seed: Optional[int] = None) -> Tuple[int, Any]:
+        """Return (n, value) for the longest cached prefix steps[:n], or (0, None)"""
+        for n in range(len(steps), 0, -1):
+            value = self.get(self.key(modality, input_id, steps[:n], seed))
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                return n, value
+        if steps:
+            with self._lock:
+                self.misses += 1
+        return 0, None
+
+    def run(self, modality: str, input_id: Optional[str], steps: Sequence[str], value: Any,
+            apply: Callable[[str, Any, Optional[int]], Any], deterministic: Collection[str],
+            seed: Optional[int] = None) -> Any:
+        """
+        Apply ``steps`` to ``value`` one by one, starting from the longest
+        cached intermediate and caching each deterministic (or seeded) result.
+        ``apply(step, value, step_seed)`` gets the step's own seed (None when
+        unseeded) to build its random generators from.
+        """
+        steps = list(steps)
+        if input_id is None:
+            # Nothing to key on (e.g. one-pass batch jobs); just apply the steps
+            for position, step in enumerate(steps):
+                value = apply(step, value, step_seed(seed, position))
+            return value
+
+        cacheable = self.cacheable_prefix(steps, deterministic, seed)
+        start, cached = self.resume(modality, input_id, steps[:cacheable], seed)
+        if cached is not None:
+            value = cached
+
+        for position in range(start, len(steps)):
+            value = apply(steps[position], value, step_seed(seed, position))
+            if position < cacheable:
+                self.put(self.key(modality, input_id, steps[:position + 1], seed), value)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.batch import EXTENSIONS, batch_items
+from core.pipeline_spec import plan_spec
+
+# Written to the output directory: one JSON line per finished item, and the
+# spec the outputs were produced with (checked on resume)
+RUN_LOG = "run_log.jsonl"
+RUN_SPEC = "run_spec.json"
+
+# Items per task sent to a worker; a task runs its items through the batched
+# stages together (see core.batch.process_items). Model steps don't batch.
+DEFAULT_CHUNK_SIZE = {"text": 32, "image": 8, "audio": 4}
+
+
+def find_inputs(source: str, modality: str, exclude: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    (path, name) of every input, sorted by name. ``source`` is a directory,
+    searched recursively for the modality's extensions (hidden entries and
+    the ``exclude`` directory are skipped), or a manifest file listing one
+    path per line, relative to the manifest's directory. ``name`` is the
+    path relative to the source and names the output.
+    """
+    if os.path.isdir(source):
+        exclude = os.path.abspath(exclude) if exclude else None
+        inputs = []
+        for root, dirs, files in os.walk(source):
+            dirs[:] = [d for d in dirs
+                       if not d.startswith(".") and os.path.abspath(os.path.join(root, d)) != exclude]
+            for filename in files:
+                if filename.startswith(".") or not filename.lower().endswith(EXTENSIONS[modality]):
+                    continue
+                path = os.path.join(root, filename)
+                inputs.append((path, os.path.relpath(path, source)))
+        return sorted(inputs, key=lambda item: item[1])
+
+    base = os.path.dirname(os.path.abspath(source))
+    inputs = []
+    with open(source) as f:
+        for line in f:
+            entry = line.strip()
+            if not entry or entry.startswith("#"):
+                continue
+            path = entry if os.path.isabs(entry) else os.path.join(base, entry)
+            inputs.append((path, os.path.normpath(entry).lstrip(os.sep)))
+    return sorted(dict.fromkeys(inputs), key=lambda item: item[1])
+
+
+def path_seed(seed: Optional[int], name: str) -> Optional[int]:
+    """Seed of the input with relative path ``name``; adding or removing other inputs doesn't change it"""
+    if seed is None:
+        return None
+    digest = hashlib.sha1(f"{seed}:{name.replace(os.sep, '/')}".encode()).digest()
+    return int.from_bytes(digest[:4], "little")
+
+
+def output_stems(names: List[str]) -> Dict[str, str]:
+    """
+    Output path without extension per input name: the name without its
+    extension, or with it when inputs share a stem (a.jpg and a.png give
+    a.jpg.png and a.png.png instead of both writing a.png). Depends only
+    on the names, so a resumed run picks the same outputs.
+    """
+    shared = Counter(os.path.splitext(name)[0].lower() for name in names)
+    stems = {}
+    used = set()
+    for name in names:
+        stem = os.path.splitext(name)[0]
+        candidate = base = stem if shared[stem.lower()] == 1 else name
+        n = 1
+        while candidate.lower() in used:
+            candidate = f"{base}_{n}"
+            n += 1
+        used.add(candidate.lower())
+        stems[name] = candidate
+    return stems
+
+
+def output_path(output_dir: str, relative: str) -> str:
+    """output_dir/relative; ValueError if it resolves outside output_dir (e.g. ../ in a manifest entry)"""
+    root = os.path.realpath(output_dir)
+    path = os.path.realpath(os.path.join(root, relative))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Output path {relative} is outside the output directory")
+    return path
+
+
+def finished_items(output_dir: str) -> set:
+    """Inputs recorded as done in the run log whose output file is still there"""
+    done = set()
+    path = os.path.join(output_dir, RUN_LOG)
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interruption
+                continue
+            if entry.get("status") != "ok":
+                continue
+            try:
+                if os.path.exists(output_path(output_dir, entry["output"])):
+                    done.add(entry["input"])
+            except ValueError:
+                continue
+    return done
+
+
+def write_atomic(path: str, data: bytes):
+    """Write to a temporary name and rename, so an interrupted run never leaves a partial output"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    partial = path + ".part"
+    with open(partial, "wb") as f:
+        f.write(data)
+    os.replace(partial, path)
+
+
+def _init_worker(resources: List[str]):
+    """Each worker process loads its own copies of the heavy resources once"""
+    from core.resource_registry import registry
+    from image.image_pipeline import set_num_threads
+    import core.pipelines  # noqa: F401 (registers resources and steps)
+
+    # One intra-op thread per worker unless configured; the pool provides the parallelism
+    set_num_threads(int(os.environ.get("TORCH_NUM_THREADS") or 1))
+    registry.warmup(resources)
+
+
+def process_chunk(modality: str, spec: dict, output_dir: str,
+                  chunk: List[Tuple[str, str, str, Optional[int]]]) -> List[dict]:
+    """
+    Process (path, name, output stem, seed) items and write their outputs;
+    returns a run log entry per item
+    """
+    contents = {}
+    entries = {}
+    for index, (path, name, _, _) in enumerate(chunk):
+        try:
+            with open(path, "rb") as f:
+                contents[index] = f.read()
+        except OSError as e:
+            entries[index] = {"input": name, "output": None, "status": "error", "error": str(e), "bytes_in": 0}
+
+    def finish(index, output, ext, error, seconds):
+        _, name, stem, _ = chunk[index]
+        entry = {"input": name, "output": None, "status": "error", "error": error,
+                 "bytes_in": len(contents[index]), "seconds": round(seconds, 4)}
+        if error is None:
+            try:
+                write_atomic(output_path(output_dir, stem + ext), output)
+                entry.update(output=stem + ext, status="ok", bytes_out=len(output))
+            except (OSError, ValueError) as e:
+                entry["error"] = str(e)
+        entries[index] = entry
+
+    readable = [index for index in range(len(chunk)) if index in contents]
+    outputs = batch_items(modality, [contents[i] for i in readable], spec, [chunk[i][3] for i in readable])
+    for index, (output, ext, error, seconds) in zip(readable, outputs):
+        finish(index, output, ext, error, seconds)
+    return [entries[index] for index in range(len(chunk))]
+
+
+class Progress:
+    """Throughput and ETA on stderr, at most once per ``interval`` seconds"""
+
+    def __init__(self, total: int, interval: float = 1.0, stream=None):
+        self.total = total
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.done = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def update(self, entries: List[dict]):
+        self.done += len(entries)
+        self.failed += sum(1 for e in entries if e["status"] == "error")
+        self.bytes_in += sum(e.get("bytes_in", 0) for e in entries)
+        now = time.perf_counter()
+        if now - self._last >= self.interval or self.done == self.total:
+            self._last = now
+            self.stream.write(self.line() + "\n")
+            self.stream.flush()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def line(self) -> str:
+        rate = self.done / self.elapsed if self.elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float("inf")
+        return (f"[{self.done}/{self.total}] {rate:.1f} items/s, "
+                f"{self.bytes_in / max(self.elapsed, 1e-9) / 1e6:.1f} MB/s in, "
+                f"{self.failed} failed, ETA {eta:.0f}s")
+
+
+def _chunks(items: List[tuple], size: int) -> Iterator[List[tuple]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def run_directory(spec: dict, source: str, output_dir: str, workers: Optional[int] = None,
+                  seed: Optional[int] = None, resume: bool = True, chunk_size: Optional[int] = None,
+                  on_progress: Optional[Callable[[List[dict]], None]] = None) -> dict:
+    """
+    Apply a pipeline spec to every input under ``source`` (a directory or
+    manifest) and write the outputs under ``output_dir`` with the same
+    relative paths (inputs sharing a stem keep their extension in the output
+    name, see output_stems). Items run on a process pool (``workers``
+    processes, all cores by default); each finished item is appended to the
+    run log, so an interrupted run resumes where it stopped. Item seeds
+    depend only on the seed and the item's relative path, so resumed runs,
+    and runs over a directory that gained or lost files, reproduce the same
+    augmentations. Returns a summary.
+    """
+    from core.pipelines import plan_resources
+    from core.resource_registry import registry
+
+    plan = plan_spec(spec)
+    modality = plan.modality
+    seed = plan.seed if seed is None else seed
+    if os.path.abspath(source) == os.path.abspath(output_dir):
+        raise ValueError("The output directory must differ from the input directory")
+
+    os.makedirs(output_dir, exist_ok=True)
+    spec_path = os.path.join(output_dir, RUN_SPEC)
+    log_path = os.path.join(output_dir, RUN_LOG)
+    recorded = {"spec": spec, "seed": seed}
+    if not resume:
+        if os.path.exists(log_path):
+            os.remove(log_path)
+    elif os.path.exists(spec_path):
+        with open(spec_path) as f:
+            if json.load(f) != recorded:
+                raise ValueError(f"{output_dir} was produced with a different spec or seed; "
+                                 f"disable resuming to reprocess it")
+    with open(spec_path, "w") as f:
+        json.dump(recorded, f, indent=2)
+
+    inputs = find_inputs(source, modality, exclude=output_dir)
+    done = finished_items(output_dir) if resume else set()
+    stems = output_stems([name for _, name in inputs])
+    todo = [(path, name, stems[name], path_seed(seed, name)) for path, name in inputs if name not in done]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE.get(modality, 1)
+    progress = Progress(len(todo))
+    print(f"{len(inputs)} {modality} inputs, {len(inputs) - len(todo)} already done, "
+          f"{len(todo)} to process on {workers} worker(s)", file=sys.stderr)
+
+    with open(log_path, "a") as log:
+        def record(entries):
+            for entry in entries:
+                log.write(json.dumps(entry) + "\n")
+            log.flush()
+            progress.update(entries)
+            if on_progress is not None:
+                on_progress(entries)
+
+        if workers == 1:
+            registry.warmup(plan_resources(plan))
+            for chunk in _chunks(todo, chunk_size):
+                record(process_chunk(modality, spec, output_dir, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(plan_resources(plan),)) as pool:
+                futures = [pool.submit(process_chunk, modality, spec, output_dir, chunk)
+                           for chunk in _chunks(todo, chunk_size)]
+                for future in as_completed(futures):
+                    record(future.result())
+
+    return {
+        "inputs": len(inputs),
+        "skipped": len(inputs) - len(todo),
+        "processed": progress.done - progress.failed,
+        "failed": progress.failed,
+        "seconds": round(progress.elapsed, 3),
+        "items_per_second": round(progress.done / progress.elapsed, 2) if progress.elapsed > 0 else None
+    }
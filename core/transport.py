@@ -0,0 +1,40 @@
+import gzip
+from typing import Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """
+    Pick a Content-Encoding for a binary payload. An explicit ``requested``
+    value ("br", "gzip" or "none") wins; otherwise the best encoding listed in
+    the client's Accept-Encoding header is used.
+    """
+    if requested is not None:
+        if requested == "none":
+            return None
+        if requested not in supported_encodings():
+            raise ValueError(f"Unsupported compression: {requested}")
+        return requested
+    accepted = {part.split(";")[0].strip() for part in (accept_encoding or "").split(",")}
+    for encoding in supported_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def encode_payload(data: bytes, encoding: Optional[str], level: int = 1) -> Tuple[bytes, Optional[str]]:
+    """Compress data for the given Content-Encoding; returns (payload, encoding)"""
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and its content id) stable across requests
+        return gzip.compress(data, compresslevel=level, mtime=0), encoding
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=min(level, 11)), encoding
+    return data, None
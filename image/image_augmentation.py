@@ -1,27 +1,18 @@
-import torchvision.transforms as transforms
-import torch
-import random
+from image import image_pipeline
 
 
 class ImageAugmenter:
     @staticmethod
     def horizontal_flip(image):
         """Flip image horizontally"""
-        transform = transforms.RandomHorizontalFlip(p=1.0)
-        return transform(image)
+        return image_pipeline.to_pil(image_pipeline.hflip(image_pipeline.to_tensor(image)))
 
     @staticmethod
     def rotate(image):
-        """Rotate image randomly between -30 and 30 degrees"""
-        transform = transforms.RandomRotation(60)
-        return transform(image)
+        """Rotate image randomly between -60 and 60 degrees"""
+        return image_pipeline.to_pil(image_pipeline.rotate(image_pipeline.to_tensor(image)))
 
     @staticmethod
     def color_jitter(image):
         """Randomly change brightness, contrast, and saturation"""
-        transform = transforms.ColorJitter(
-            brightness=0.5,
-            contrast=0.2,
-            saturation=0.8
-        )
-        return transform(image)
+        return image_pipeline.to_pil(image_pipeline.color_jitter(image_pipeline.to_tensor(image)))
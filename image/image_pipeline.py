@@ -0,0 +1,164 @@
+import math
+from typing import Callable, Dict, List, Optional
+
+import PIL.Image as Image
+import torch
+import torch.nn.functional as nn_functional
+import torchvision.transforms.functional as F
+
+# Images stay uint8 (C, H, W) or (N, C, H, W) tensors between steps; only
+# normalize switches to float, because its output is no longer in [0, 255].
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+
+def set_num_threads(threads: Optional[int]):
+    """Intra-op threads for the tensor ops (process-wide); None keeps torch's default"""
+    if threads:
+        torch.set_num_threads(threads)
+
+
+def to_tensor(image: Image.Image) -> torch.Tensor:
+    """PIL image -> uint8 (3, H, W) tensor without a float copy"""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return F.pil_to_tensor(image)
+
+
+def to_pil(tensor: torch.Tensor) -> Image.Image:
+    """Convert back at the end of the pipeline; float input is treated like ToPILImage does"""
+    return F.to_pil_image(tensor)
+
+
+def _batch_view(tensor: torch.Tensor) -> torch.Tensor:
+    return tensor if tensor.dim() == 4 else tensor.unsqueeze(0)
+
+
+def _per_image(low: float, high: float, n: int, rng: Optional[torch.Generator] = None) -> torch.Tensor:
+    """One random factor per image, from ``rng`` (torch's global generator when None)"""
+    return torch.empty(n).uniform_(low, high, generator=rng).view(n, 1, 1, 1)
+
+
+def _blend(image: torch.Tensor, other: torch.Tensor, factor: torch.Tensor) -> torch.Tensor:
+    """
+    factor * image + (1 - factor) * other. uint8 results are clamped to
+    [0, 255]; float tensors come from normalize and have no fixed range.
+    """
+    blended = factor * image.float() + (1 - factor) * other
+    if image.dtype == torch.uint8:
+        return blended.clamp_(0, 255).to(torch.uint8)
+    return blended.to(image.dtype)
+
+
+def _has_uint8_antialias() -> bool:
+    """Whether interpolate has a native uint8 antialiased bilinear kernel (torch >= 2.1)"""
+    try:
+        nn_functional.interpolate(torch.zeros(1, 3, 4, 4, dtype=torch.uint8), size=(2, 2), mode="bilinear",
+                                  antialias=True, align_corners=False)
+        return True
+    except RuntimeError:
+        return False
+
+
+_UINT8_ANTIALIAS = _has_uint8_antialias()
+
+
+def resize(tensor: torch.Tensor, size=(224, 224)) -> torch.Tensor:
+    """
+    Antialiased bilinear resize. uint8 input uses torch's native uint8
+    kernel where there is one, instead of a float round-trip.
+    """
+    if tensor.dtype != torch.uint8:
+        return F.resize(tensor, list(size), antialias=True)
+    batch = _batch_view(tensor)
+    if _UINT8_ANTIALIAS:
+        resized = nn_functional.interpolate(batch, size=tuple(size), mode="bilinear", antialias=True,
+                                            align_corners=False)
+    else:
+        resized = nn_functional.interpolate(batch.float(), size=tuple(size), mode="bilinear", antialias=True,
+                                            align_corners=False)
+        resized = resized.round_().clamp_(0, 255).to(torch.uint8)
+    return resized if tensor.dim() == 4 else resized[0]
+
+
+def stacked(fn: Callable[..., torch.Tensor]) -> Callable[..., List[torch.Tensor]]:
+    """
+    Batch version of a deterministic tensor step: images of the same shape
+    and dtype go through ``fn`` as one (N, C, H, W) stack, others one by one
+    """
+    def batch_fn(tensors: List[torch.Tensor], **params) -> List[torch.Tensor]:
+        groups: Dict[tuple, List[int]] = {}
+        for i, tensor in enumerate(tensors):
+            groups.setdefault((tuple(tensor.shape), tensor.dtype), []).append(i)
+        outputs: List[Optional[torch.Tensor]] = [None] * len(tensors)
+        for indices in groups.values():
+            if len(indices) == 1:
+                outputs[indices[0]] = fn(tensors[indices[0]], **params)
+                continue
+            for i, output in zip(indices, fn(torch.stack([tensors[i] for i in indices]), **params)):
+                outputs[i] = output
+        return outputs
+    return batch_fn
+
+
+def resize_shrinks(tensor: torch.Tensor, size=(224, 224)) -> bool:
+    """Whether resize to ``size`` leaves fewer pixels than the input has"""
+    return size[0] * size[1] < tensor.shape[-2] * tensor.shape[-1]
+
+
+def grayscale(tensor: torch.Tensor) -> torch.Tensor:
+    return F.rgb_to_grayscale(tensor, num_output_channels=3)
+
+
+def normalize(tensor: torch.Tensor, mean=IMAGENET_MEAN, std=IMAGENET_STD) -> torch.Tensor:
+    """Per-channel normalization (ImageNet statistics by default); the one step that produces a float tensor"""
+    if tensor.dtype == torch.uint8:
+        tensor = tensor.float().div_(255)
+    return F.normalize(tensor, list(mean), list(std))
+
+
+def hflip(tensor: torch.Tensor) -> torch.Tensor:
+    return F.hflip(tensor)
+
+
+def rotate(tensor: torch.Tensor, degrees: float = 60.0, rng: Optional[torch.Generator] = None) -> torch.Tensor:
+    """
+    Rotate each image by its own random angle in [-degrees, degrees] around
+    its center (nearest neighbour, zero fill), all in one grid_sample call.
+    """
+    batch = _batch_view(tensor)
+    n, _, h, w = batch.shape
+    angles = torch.empty(n).uniform_(-degrees, degrees, generator=rng) * math.pi / 180
+    cos, sin = torch.cos(angles), torch.sin(angles)
+    # grid_sample works in normalized coordinates; correct for the aspect ratio
+    theta = torch.zeros(n, 2, 3)
+    theta[:, 0, 0] = cos
+    theta[:, 0, 1] = -sin * h / w
+    theta[:, 1, 0] = sin * w / h
+    theta[:, 1, 1] = cos
+    grid = nn_functional.affine_grid(theta, [n, 1, h, w], align_corners=False)
+    rotated = nn_functional.grid_sample(batch.float(), grid, mode="nearest", align_corners=False)
+    rotated = rotated.to(tensor.dtype)
+    return rotated if tensor.dim() == 4 else rotated[0]
+
+
+def color_jitter(tensor: torch.Tensor, brightness: float = 0.5, contrast: float = 0.2,
+                 saturation: float = 0.8, rng: Optional[torch.Generator] = None) -> torch.Tensor:
+    """
+    ColorJitter with independent random factors per image, in a random order
+    per call. After normalize the values are not clamped, and brightness
+    scales towards the normalization mean rather than black.
+    """
+    batch = _batch_view(tensor)
+    n = batch.shape[0]
+    for op in torch.randperm(3, generator=rng).tolist():
+        if op == 0:
+            batch = _blend(batch, torch.zeros(()), _per_image(1 - brightness, 1 + brightness, n, rng))
+        elif op == 1:
+            mean = F.rgb_to_grayscale(batch).float().mean(dim=(-3, -2, -1), keepdim=True)
+            batch = _blend(batch, mean, _per_image(1 - contrast, 1 + contrast, n, rng))
+        else:
+            batch = _blend(batch, F.rgb_to_grayscale(batch).float(),
+                           _per_image(1 - saturation, 1 + saturation, n, rng))
+    return batch if tensor.dim() == 4 else batch[0]
+
@@ -1,41 +1,84 @@
-import torch
-import torchvision.transforms as transforms
 import PIL.Image as Image
 from io import BytesIO
 import base64
+import math
+
+from image import image_pipeline
+
+# Response formats: name -> (PIL format, media type)
+IMAGE_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png")
+}
+
+# Longest side of the images sent back for display
+PREVIEW_SIZE = 800
 
 
 class ImagePreprocessor:
+    @staticmethod
+    def decode(content, max_size=None):
+        """
+        Decode an upload to RGB. With max_size, large JPEGs are decoded at a
+        reduced DCT scale (1/2, 1/4 or 1/8) that still covers max_size on the
+        longest side, which skips most of the decoding work.
+        """
+        image = Image.open(BytesIO(content))
+        if max_size and image.format == "JPEG" and max(image.size) > max_size:
+            scale = max_size / max(image.size)
+            image.draft("RGB", (math.ceil(image.size[0] * scale), math.ceil(image.size[1] * scale)))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image
+
     @staticmethod
     def normalize_standard(image):
         """Standard normalization using ImageNet statistics"""
-        transform = transforms.Compose([
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225]
-            ),
-            transforms.ToPILImage()
-        ])
-        return transform(image)
+        return image_pipeline.to_pil(image_pipeline.normalize(image_pipeline.to_tensor(image)))
 
     @staticmethod
     def resize_224(image):
         """Resize to 224x224"""
-        transform = transforms.Compose([
-            transforms.Resize((224, 224))
-        ])
-        return transform(image)
+        return image_pipeline.to_pil(image_pipeline.resize(image_pipeline.to_tensor(image)))
 
     @staticmethod
     def grayscale(image):
-        transform = transforms.Compose([
-            transforms.Grayscale(3)  # 3 channels for compatibility
-        ])
-        return transform(image)
+        # 3 channels for compatibility
+        return image_pipeline.to_pil(image_pipeline.grayscale(image_pipeline.to_tensor(image)))
 
     @staticmethod
-    def to_base64(image):
+    def preview(image, size=PREVIEW_SIZE):
+        """Downscale to fit in size x size, keeping the aspect ratio; smaller images are returned as is"""
+        if max(image.size) <= size:
+            return image
+        scale = size / max(image.size)
+        target = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale)))
+        # reducing_gap first shrinks by an integer factor with a box filter, then resamples
+        return image.resize(target, Image.LANCZOS, reducing_gap=3.0)
+
+    @staticmethod
+    def encode(image, image_format="png", quality=85, compress_level=6):
+        """
+        Encode as webp/jpeg/png; returns (bytes, media type). quality applies
+        to WebP and JPEG. compress_level (0-9) is the zlib level for PNG and is
+        scaled to the WebP encoder effort (0-6, so the default 6 maps to
+        libwebp's default 4); higher is smaller but slower.
+        """
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        pil_format, media_type = IMAGE_FORMATS[image_format]
+
         buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode()
+        if pil_format == "PNG":
+            image.save(buffered, format=pil_format, compress_level=compress_level)
+        elif pil_format == "WEBP":
+            image.save(buffered, format=pil_format, quality=quality, method=round(compress_level * 6 / 9))
+        else:
+            image.save(buffered, format=pil_format, quality=quality)
+        return buffered.getvalue(), media_type
+
+    @staticmethod
+    def to_base64(image, image_format="png", quality=85, compress_level=6):
+        data, _ = ImagePreprocessor.encode(image, image_format, quality, compress_level)
+        return base64.b64encode(data).decode()
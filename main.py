@@ -1,21 +1,32 @@
 from fastapi import FastAPI, UploadFile, File, Form, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from typing import List, Optional
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
 import uvicorn
 
-from audio.audio_augmentation import AudioAugmenter
-from audio.audio_preprocessing import AudioPreprocessor
-from image.image_augmentation import ImageAugmenter
-from image.image_preprocessing import ImagePreprocessor
-from text.text_augmentation import TextAugmenter
-from text.text_preprocessing import TextPreprocessor
-from model.model_augmentation import ModelAugmenter
-from model.model_preprocessing import ModelPreprocessor
+from text.text_stream import TextChunker
+from core.resource_registry import registry
+from core.artifact_store import create_store, is_artifact_id
+from core.executor import Saturated, create_executor
+from core import metrics
+from core.transport import negotiate_encoding
+from core.batch import EXTENSIONS, LimitExceeded, is_archive, open_archive, run_batch, stream_zip
+from audio.audio_preprocessing import AUDIO_FORMATS
+from image.image_preprocessing import IMAGE_FORMATS
+from core.pipeline_spec import load_spec, plan_spec, steps
+from core.pipelines import results, run_audio_pipeline, run_image_pipeline, run_model_pipeline, run_text_chunks, run_text_pipeline
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
-import PIL.Image as Image
-from io import BytesIO
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -34,6 +45,280 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Setup templates
 templates = Jinja2Templates(directory="templates")
 
+# Bytes read from the upload per iteration of /process_text/stream
+STREAM_READ_SIZE = 1024 * 1024
+
+# Upper bound on the groups /process_batch runs in parallel, and the items
+# per group (processed together by the batched stages)
+BATCH_MAX_PARALLEL = int(os.environ.get("BATCH_MAX_PARALLEL", os.cpu_count() or 1))
+BATCH_GROUP_SIZE = int(os.environ.get("BATCH_GROUP_SIZE", 8))
+# Limits on the uncompressed size of each file (archive members included)
+# and of all files in one /process_batch request
+BATCH_MAX_FILE_BYTES = int(os.environ.get("BATCH_MAX_FILE_BYTES", 256 * 1024 * 1024))
+BATCH_MAX_TOTAL_BYTES = int(os.environ.get("BATCH_MAX_TOTAL_BYTES", 1024 * 1024 * 1024))
+
+# Uploaded and processed artifacts live server-side; the session keeps only IDs
+artifacts = create_store()
+
+# CPU-bound pipelines run on a worker pool with per-modality limits
+executor = create_executor()
+
+
+async def run_pipeline(modality: str, fn, *args):
+    """Run a pipeline on the executor; returns (result, error response or None)"""
+    try:
+        if not metrics.ENABLED:
+            return await executor.run(modality, fn, *args), None
+        queued_at = time.time()
+        result, trace = await executor.run(modality, metrics.traced, fn, *args)
+        metrics.observe_trace(modality, trace, queued_at)
+        if isinstance(result, dict) and "error" in result:
+            metrics.ERRORS.inc(1, modality)
+        return result, None
+    except Saturated as e:
+        return None, JSONResponse({"error": str(e)}, status_code=503)
+    except asyncio.TimeoutError:
+        return None, JSONResponse({"error": f"Processing the {modality} file timed out"}, status_code=504)
+
+
+def request_spec(modality: str, spec: Optional[str], preprocessing: List[str], augmentation: Optional[str]):
+    """
+    The request's pipeline spec (the ``spec`` JSON field, or one built from
+    the preprocessing/augmentation fields), validated up front; returns
+    (spec, error response or None)
+    """
+    try:
+        spec = load_spec(modality, spec, preprocessing, augmentation)
+        plan_spec(spec)
+    except ValueError as e:
+        return None, JSONResponse({"error": f"Invalid pipeline spec: {str(e)}"}, status_code=400)
+    return spec, None
+
+
+async def read_chunk_batches(upload) -> AsyncIterator[List[str]]:
+    """Yield the line-aligned chunks decoded from each read of a spooled upload"""
+    chunker = TextChunker()
+    while True:
+        data = await run_in_threadpool(upload.read, STREAM_READ_SIZE)
+        if not data:
+            break
+        chunks = chunker.feed(data)
+        if chunks:
+            yield chunks
+    chunks = chunker.flush()
+    if chunks:
+        yield chunks
+
+
+async def spool_upload(file: UploadFile) -> tempfile.SpooledTemporaryFile:
+    """
+    Copy an upload into a spooled temporary file owned by the caller. Uploads
+    are closed once the handler returns, before a streaming response body is
+    produced, so streamed responses read from the copy and close it when done.
+    """
+    upload = tempfile.SpooledTemporaryFile(max_size=STREAM_READ_SIZE)
+    await file.seek(0)
+    await run_in_threadpool(shutil.copyfileobj, file.file, upload, STREAM_READ_SIZE)
+    upload.seek(0)
+    return upload
+
+
+async def read_upload(request: Request, file: Optional[UploadFile], key: str):
+    """
+    Store a new upload and remember its ID in the session, or fall back to
+    the last upload of this kind.
+    Returns (content, filename, content hash), or (None, None, None).
+    """
+    if file:
+        content = await file.read()
+        artifact_id = artifacts.put(content, file.content_type or "application/octet-stream")
+        request.session[f"{key}_id"] = artifact_id
+        request.session[f"{key}_filename"] = file.filename
+        return content, file.filename, artifact_id
+
+    artifact_id = request.session.get(f"{key}_id", "")
+    artifact = artifacts.get(artifact_id)
+    if artifact is None:
+        return None, None, None
+    return artifact.data, request.session.get(f"{key}_filename", ""), artifact_id
+
+
+def route_label(request: Request) -> str:
+    """Path template of the matched route, so metrics don't get one series per artifact ID"""
+    for route in app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", request.url.path)
+    return "unmatched"
+
+
+if metrics.ENABLED:
+    @app.middleware("http")
+    async def record_metrics(request: Request, call_next):
+        traces = metrics.begin_request()
+        start = time.perf_counter()
+        response = await call_next(request)
+        elapsed = time.perf_counter() - start
+
+        route = route_label(request)
+        metrics.REQUEST_SECONDS.observe(elapsed, route, str(response.status_code))
+        if request.headers.get("content-length"):
+            metrics.REQUEST_BYTES.observe(int(request.headers["content-length"]), route)
+        if response.headers.get("content-length"):
+            metrics.RESPONSE_BYTES.observe(int(response.headers["content-length"]), route)
+        if metrics.SERVER_TIMING:
+            entries = [entry for trace in traces for entry in trace.server_timing()]
+            entries.append(f"total;dur={elapsed * 1000:.1f}")
+            response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+
+@app.on_event("startup")
+async def warmup_resources():
+    registry.warmup()
+
+
+def parse_range(header: Optional[str], size: int):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to send the
+    whole body (no header, several ranges, other units), or "invalid" when
+    the range can't be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].strip().partition("-")
+    try:
+        if start:
+            first = int(start)
+            last = int(end) if end else size - 1
+        else:
+            # Suffix range: the last N bytes
+            first = max(size - int(end), 0)
+            last = size - 1
+    except ValueError:
+        return None
+    if first >= size or first > last:
+        return "invalid"
+    return first, min(last, size - 1)
+
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    if not is_artifact_id(artifact_id):
+        return JSONResponse({"error": "Artifact not found or expired"}, status_code=404)
+    artifact = artifacts.get(artifact_id)
+    if artifact is None:
+        return JSONResponse({"error": "Artifact not found or expired"}, status_code=404)
+    headers = {"Cache-Control": "private, max-age=3600"}
+    if artifact.encoding:
+        headers["Content-Encoding"] = artifact.encoding
+        return Response(artifact.data, media_type=artifact.media_type, headers=headers)
+
+    # Byte ranges let media elements start playing and seek without the whole file
+    size = len(artifact.data)
+    headers["Accept-Ranges"] = "bytes"
+    byte_range = parse_range(request.headers.get("range"), size)
+    if byte_range == "invalid":
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return Response(artifact.data, media_type=artifact.media_type, headers=headers)
+    first, last = byte_range
+    headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    return Response(artifact.data[first:last + 1], status_code=206, media_type=artifact.media_type,
+                    headers=headers)
+
+
+@app.get("/steps")
+async def list_steps():
+    """Steps available to pipeline specs, with their parameters and defaults"""
+    return JSONResponse(steps.describe())
+
+
+@app.post("/plan")
+async def plan_pipeline(spec: str = Form(...)):
+    """Validate a pipeline spec and show the plan it compiles to"""
+    try:
+        spec = load_spec(None, spec)
+        return JSONResponse(plan_spec(spec).describe())
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid pipeline spec: {str(e)}"}, status_code=400)
+
+
+@app.get("/artifacts")
+async def artifact_stats():
+    return JSONResponse(artifacts.stats())
+
+
+def worker_state_unavailable(what: str) -> Optional[JSONResponse]:
+    """
+    With EXECUTOR_KIND=process every worker process has its own result cache
+    and resources, which the web process can neither see nor reach, so the
+    endpoints for them are disabled rather than reporting the web process's
+    unused copies.
+    """
+    if executor.kind != "process":
+        return None
+    return JSONResponse({
+        "error": f"The {what} lives in the worker processes and is not available with EXECUTOR_KIND=process"
+    }, status_code=501)
+
+
+@app.get("/cache")
+async def cache_stats():
+    error = worker_state_unavailable("result cache")
+    if error is not None:
+        return error
+    return JSONResponse(results.stats())
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text format: request, queue, step and phase histograms plus cache and executor gauges"""
+    pending = executor.stats()["pending"]
+    gauges = [metrics.render_gauge("executor_pending", "Requests running or queued per modality", ["modality"],
+                                   {(modality,): n for modality, n in pending.items()})]
+    # The result cache is per worker process with EXECUTOR_KIND=process
+    if executor.kind != "process":
+        cache = results.stats()
+        gauges += [
+            metrics.render_gauge("result_cache_bytes", "Bytes held by the result cache", [], {(): cache["bytes"]}),
+            metrics.render_gauge("result_cache_hits", "Result cache hits since start", [], {(): cache["hits"]}),
+            metrics.render_gauge("result_cache_misses", "Result cache misses since start", [], {(): cache["misses"]})
+        ]
+    body = metrics.metrics.render(*gauges)
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/executor")
+async def executor_stats():
+    return JSONResponse(executor.stats())
+
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    executor.shutdown()
+
+
+@app.get("/resources")
+async def resource_stats():
+    error = worker_state_unavailable("resource registry")
+    if error is not None:
+        return error
+    return JSONResponse(registry.stats())
+
+
+@app.post("/resources/reload")
+async def reload_resources(name: Optional[str] = Form(default=None)):
+    error = worker_state_unavailable("resource registry")
+    if error is not None:
+        return error
+    try:
+        # Loading models and vocabularies takes seconds; keep it off the event loop
+        await run_in_threadpool(registry.reload, name)
+    except KeyError as e:
+        return JSONResponse({"error": str(e)})
+    return JSONResponse(registry.stats())
+
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
@@ -56,38 +341,25 @@ async def process_text(
         request: Request,
         preprocessing: List[str] = Form(default=[]),
         augmentation: Optional[str] = Form(default=None),
+        spec: Optional[str] = Form(default=None),
+        seed: Optional[int] = Form(default=None),
         file: Optional[UploadFile] = File(default=None)
 ):
-    if file:
-        content = await file.read()
-        text = content.decode()
-    else:
-        text = request.session.get("original_text", "")
-        if not text:
-            return JSONResponse({
-                "error": "Please upload a file first!"
-            })
-
-    processor = TextPreprocessor()
-    processed_text = text
-
-    for step in preprocessing:
-        if step == "lowercase":
-            processed_text = processor.to_lowercase(processed_text)
-        elif step == "punctuation":
-            processed_text = processor.remove_punctuation(processed_text)
-        elif step == "lemmatize":
-            processed_text = processor.lemmatize_text(processed_text)
+    content, _, input_id = await read_upload(request, file, "text")
+    if not content:
+        return JSONResponse({
+            "error": "Please upload a file first!"
+        })
+    text = content.decode()
 
-    if augmentation and augmentation != "none":
-        augmenter = TextAugmenter()
-        if augmentation == "word_swap":
-            processed_text = augmenter.word_swap(processed_text)
-        elif augmentation == "synonym":
-            processed_text = augmenter.synonym_replacement(processed_text)
+    spec, error = request_spec("text", spec, preprocessing, augmentation)
+    if error is not None:
+        return error
+    processed_text, error = await run_pipeline("text", run_text_pipeline, text, input_id, spec, seed)
+    if error is not None:
+        return error
 
-    request.session["original_text"] = text
-    request.session["processed_text"] = processed_text
+    request.session["processed_text_id"] = artifacts.put(processed_text.encode(), "text/plain; charset=utf-8")
 
     return JSONResponse({
         "original_text": text,
@@ -95,64 +367,93 @@ async def process_text(
     })
 
 
+@app.post("/process_text/stream")
+async def process_text_stream(
+        preprocessing: List[str] = Form(default=[]),
+        augmentation: Optional[str] = Form(default=None),
+        spec: Optional[str] = Form(default=None),
+        file: UploadFile = File(...)
+):
+    """Process a large upload chunk by chunk and stream the result back"""
+    spec, error = request_spec("text", spec, preprocessing, augmentation)
+    if error is not None:
+        return error
+    upload = await spool_upload(file)
+    batches = read_chunk_batches(upload)
+
+    # Process the first batch before the response starts, so a full queue or
+    # a timeout still gets its 503/504; the plan covers augmentation too
+    first = []
+    try:
+        async for chunks in batches:
+            first, error = await run_pipeline("text", run_text_chunks, chunks, spec)
+            if error is not None:
+                upload.close()
+                return error
+            break
+    except BaseException:
+        upload.close()
+        raise
+
+    async def generate():
+        try:
+            for processed in first:
+                yield processed
+            async for chunks in batches:
+                processed_chunks, error = await run_pipeline("text", run_text_chunks, chunks, spec)
+                if error is not None:
+                    # The status line is already sent; cut the stream short
+                    raise RuntimeError(f"Text stream aborted with status {error.status_code}")
+                for processed in processed_chunks:
+                    yield processed
+        finally:
+            upload.close()
+
+    return StreamingResponse(generate(), media_type="text/plain; charset=utf-8")
+
+
 @app.post("/process_image")
 async def process_image(
         request: Request,
         preprocessing: List[str] = Form(default=[]),
         augmentation: Optional[str] = Form(default=None),
+        spec: Optional[str] = Form(default=None),
+        seed: Optional[int] = Form(default=None),
+        transport: str = Form(default="json"),
+        image_format: str = Form(default="png"),
+        quality: int = Form(default=85),
+        compress_level: int = Form(default=6),
         file: Optional[UploadFile] = File(default=None)
 ):
     try:
-        if file:
-            content = await file.read()
-            image = Image.open(BytesIO(content))
-            if image.mode != "RGB":
-                image = image.convert("RGB")
-        else:
+        content, _, input_id = await read_upload(request, file, "image")
+        if not content:
             return JSONResponse({
                 "error": "Please upload an image first!"
             })
 
-        processor = ImagePreprocessor()
-        processed_image = image.copy()
-
-        for step in preprocessing:
-            if step == "normalize":
-                processed_image = processor.normalize_standard(processed_image)
-            elif step == "resize":
-                processed_image = processor.resize_224(processed_image)
-            elif step == "grayscale":
-                processed_image = processor.grayscale(processed_image)
-
-        if augmentation and augmentation != "none":
-            augmenter = ImageAugmenter()
-            if augmentation == "flip":
-                processed_image = augmenter.horizontal_flip(processed_image)
-            elif augmentation == "rotate":
-                processed_image = augmenter.rotate(processed_image)
-            elif augmentation == "color":
-                processed_image = augmenter.color_jitter(processed_image)
-
-        # Resize images before base64 encoding to reduce size
-        if image.size[0] > 800 or image.size[1] > 800:
-            aspect_ratio = image.size[1] / image.size[0]
-            new_width = 800
-            new_height = int(new_width * aspect_ratio)
-            image = image.resize((new_width, new_height), Image.LANCZOS)
-
-        if processed_image.size[0] > 800 or processed_image.size[1] > 800:
-            aspect_ratio = processed_image.size[1] / processed_image.size[0]
-            new_width = 800
-            new_height = int(new_width * aspect_ratio)
-            processed_image = processed_image.resize((new_width, new_height), Image.LANCZOS)
-
-        original_image_b64 = processor.to_base64(image)
-        processed_image_b64 = processor.to_base64(processed_image)
+        if image_format not in IMAGE_FORMATS:
+            return JSONResponse({
+                "error": f"Unsupported image format: {image_format}, expected one of {', '.join(IMAGE_FORMATS)}"
+            })
+        if not 1 <= quality <= 100 or not 0 <= compress_level <= 9:
+            return JSONResponse({
+                "error": "quality must be between 1 and 100 and compress_level between 0 and 9"
+            })
+
+        spec, error = request_spec("image", spec, preprocessing, augmentation)
+        if error is not None:
+            return error
+        result, error = await run_pipeline("image", run_image_pipeline, content, input_id, spec, seed, transport, image_format, quality, compress_level)
+        if error is not None:
+            return error
 
-        return JSONResponse({
-            "original_image": original_image_b64,
-            "processed_image": processed_image_b64
-        })
+        if transport == "binary" and "error" not in result:
+            # Serve the encoded images from URLs; the JSON only carries metadata
+            for key in ("original_image", "processed_image"):
+                artifact_id = artifacts.put(result.pop(key), result["media_type"])
+                result[f"{key}_url"] = f"/artifacts/{artifact_id}"
+        return JSONResponse(result)
 
     except Exception as e:
         return JSONResponse({
@@ -165,71 +466,47 @@ async def process_audio(
         request: Request,
         preprocessing: List[str] = Form(default=[]),
         augmentation: Optional[str] = Form(default=None),
+        spec: Optional[str] = Form(default=None),
+        seed: Optional[int] = Form(default=None),
+        transport: str = Form(default="json"),
+        audio_format: str = Form(default="wav"),
         file: Optional[UploadFile] = File(default=None)
 ):
     try:
-        if not file:
+        content, filename, input_id = await read_upload(request, file, "audio")
+        if not content:
             return JSONResponse({
                 "error": "Please upload an audio file first!"
             })
 
         # Check file extension
-        if not file.filename.lower().endswith(('.mp3', '.wav')):
+        if not filename.lower().endswith(('.mp3', '.wav')):
             return JSONResponse({
                 "error": "Only .mp3 and .wav files are supported!"
             })
 
-        content = await file.read()
-        processor = AudioPreprocessor()
-
-        try:
-            waveform, sample_rate = processor.load_audio(content)
-        except Exception as e:
+        if transport == "binary" and audio_format not in AUDIO_FORMATS:
             return JSONResponse({
-                "error": f"Failed to load audio file: {str(e)}"
+                "error": f"Unsupported audio format: {audio_format}, expected one of {', '.join(AUDIO_FORMATS)}"
             })
 
-        processed_waveform = waveform.clone()
-
-        # Apply preprocessing
-        for step in preprocessing:
-            try:
-                if step == "noise":
-                    processed_waveform = processor.add_noise(processed_waveform)
-                elif step == "lowpass":
-                    processed_waveform = processor.apply_low_pass_filter(processed_waveform)
-                elif step == "speed":
-                    processed_waveform = processor.change_speed(processed_waveform)
-            except Exception as e:
-                print(f"Warning: Failed to apply {step}: {str(e)}")
-
-        # Apply augmentation
-        if augmentation and augmentation != "none":
-            try:
-                augmenter = AudioAugmenter()
-                if augmentation == "timeshift":
-                    processed_waveform = augmenter.time_shift(processed_waveform)
-                elif augmentation == "pitch":
-                    processed_waveform = augmenter.pitch_shift(processed_waveform)
-            except Exception as e:
-                print(f"Warning: Failed to apply augmentation: {str(e)}")
-
-        # Convert to base64 for web playback
-        try:
-            original_audio_b64 = processor.to_base64(waveform, sample_rate)
-            processed_audio_b64 = processor.to_base64(processed_waveform, sample_rate)
-        except Exception as e:
-            return JSONResponse({
-                "error": f"Failed to convert audio for playback: {str(e)}"
-            })
+        spec, error = request_spec("audio", spec, preprocessing, augmentation)
+        if error is not None:
+            return error
+        result, error = await run_pipeline("audio", run_audio_pipeline, content, input_id, spec, seed, transport, audio_format)
+        if error is not None:
+            return error
 
-        return JSONResponse({
-            "original_audio": original_audio_b64,
-            "processed_audio": processed_audio_b64
-        })
+        if "media_type" in result:
+            # Serve the encoded files from URLs; the JSON only carries metadata
+            for key in ("original_audio", "processed_audio"):
+                artifact_id = artifacts.put(result.pop(key), result["media_type"])
+                result[f"{key}_url"] = f"/artifacts/{artifact_id}"
+        return JSONResponse(result)
 
     except Exception as e:
-        print(f"Error processing audio: {str(e)}")
+        metrics.ERRORS.inc(1, "audio")
+        logger.warning("Error processing audio: %s", e)
         return JSONResponse({
             "error": f"Failed to process audio: {str(e)}"
         })
@@ -240,81 +517,152 @@ async def process_model(
         request: Request,
         preprocessing: List[str] = Form(default=[]),
         augmentation: Optional[str] = Form(default=None),
+        spec: Optional[str] = Form(default=None),
+        seed: Optional[int] = Form(default=None),
+        transport: str = Form(default="json"),
+        quantize: bool = Form(default=False),
+        compression: Optional[str] = Form(default=None),
+        lod: bool = Form(default=False),
+        download: bool = Form(default=False),
         file: Optional[UploadFile] = File(default=None)
 ):
     try:
-        if not file:
+        content, filename, input_id = await read_upload(request, file, "model")
+        if not content:
             return JSONResponse({
                 "error": "Please upload a model file!"
             })
 
-        if not file.filename.lower().endswith('.obj'):
+        if not filename.lower().endswith('.obj'):
             return JSONResponse({
                 "error": "Only .obj files are supported!"
             })
 
-        content = await file.read()
-        processor = ModelPreprocessor()
-
-        try:
-            mesh = processor.load_obj(content)
-            print(f"Loaded mesh with {len(mesh.vertices)} vertices and {len(mesh.faces)} faces")
-        except Exception as e:
-            print(f"Failed to load mesh: {str(e)}")
-            return JSONResponse({
-                "error": f"Failed to load mesh: {str(e)}"
-            })
-
-        # Make a copy for processing
-        processed_mesh = mesh.copy()
-
-        # Apply preprocessing
-        for step in preprocessing:
+        encoding = None
+        if transport == "binary":
             try:
-                if step == "normalize":
-                    processed_mesh = processor.normalize(processed_mesh)
-                    print(f"Applied normalization")
-                elif step == "center":
-                    processed_mesh = processor.center_model(processed_mesh)
-                    print(f"Applied smoothing")
-            except Exception as e:
-                print(f"Warning: Failed to apply {step}: {str(e)}")
-
-        # Apply augmentation
-        if augmentation and augmentation != "none":
-            try:
-                augmenter = ModelAugmenter()
-                if augmentation == "rotate":
-                    processed_mesh = augmenter.rotate(processed_mesh)
-                    print("Applied rotation")
-                elif augmentation == "scale":
-                    processed_mesh = augmenter.scale_random(processed_mesh)
-                    print("Applied scaling")
-            except Exception as e:
-                print(f"Warning: Failed to apply augmentation: {str(e)}")
-
-        # Convert to JSON format for three.js
-        try:
-            original_model = processor.to_json(mesh)
-            processed_model = processor.to_json(processed_mesh)
-            print("Successfully converted models to JSON")
-        except Exception as e:
-            print(f"Failed to convert model for display: {str(e)}")
-            return JSONResponse({
-                "error": f"Failed to convert model for display: {str(e)}"
-            })
-
-        return JSONResponse({
-            "original_model": original_model,
-            "processed_model": processed_model
-        })
+                encoding = negotiate_encoding(request.headers.get("accept-encoding"), compression)
+            except ValueError as e:
+                return JSONResponse({"error": str(e)})
+
+        spec, error = request_spec("model", spec, preprocessing, augmentation)
+        if error is not None:
+            return error
+        result, error = await run_pipeline("model", run_model_pipeline, content, input_id, spec, seed, transport, quantize, encoding,
+                                           lod, download)
+        if error is not None:
+            return error
+
+        if result.get("format") == "binary":
+            # Serve the buffers as raw bytes; the JSON only carries URLs
+            for key in ("original_model", "processed_model"):
+                artifact_id = artifacts.put(result.pop(key), "application/octet-stream", result["encoding"])
+                result[f"{key}_url"] = f"/artifacts/{artifact_id}"
+            # Preview levels, coarse to fine; the full meshes above stay available for download
+            for key, url_key in (("original_lods", "original_lod_urls"), ("processed_lods", "processed_lod_urls")):
+                if key in result:
+                    result[url_key] = [
+                        f"/artifacts/{artifacts.put(level, 'application/octet-stream', result['encoding'])}"
+                        for level in result.pop(key)
+                    ]
+            if "processed_obj" in result:
+                artifact_id = artifacts.put(result.pop("processed_obj"), "model/obj", result["encoding"])
+                result["processed_model_obj_url"] = f"/artifacts/{artifact_id}"
+        return JSONResponse(result)
 
     except Exception as e:
-        print(f"Error processing model: {str(e)}")
+        metrics.ERRORS.inc(1, "model")
+        logger.warning("Error processing model: %s", e)
         return JSONResponse({
             "error": f"Failed to process model: {str(e)}"
         })
 
 
+def read_spooled(name: str, upload) -> Iterator[Tuple[str, bytes]]:
+    upload.seek(0)
+    yield name, upload.read()
+
+
+@app.post("/process_batch/{modality}")
+async def process_batch(
+        modality: str,
+        preprocessing: List[str] = Form(default=[]),
+        augmentation: Optional[str] = Form(default=None),
+        spec: Optional[str] = Form(default=None),
+        seed: Optional[int] = Form(default=None),
+        max_parallel: int = Form(default=4),
+        files: List[UploadFile] = File(...)
+):
+    """
+    Process many files (or zip/tar archives of files) in one request and
+    stream back a zip of the results with a manifest.json
+    """
+    if modality not in EXTENSIONS:
+        return JSONResponse({
+            "error": f"Unknown modality '{modality}', expected one of {', '.join(EXTENSIONS)}"
+        }, status_code=400)
+    spec, error = request_spec(modality, spec, preprocessing, augmentation)
+    if error is not None:
+        return error
+
+    # Sizes are checked up front (archive members from their headers); the
+    # contents are read one item at a time while the response streams
+    uploads = []
+    sources = []
+    remaining = BATCH_MAX_TOTAL_BYTES
+    for file in files:
+        upload = await spool_upload(file)
+        uploads.append(upload)
+        error = None
+        try:
+            if is_archive(file.filename):
+                size, members = await run_in_threadpool(
+                    open_archive, upload, file.filename, BATCH_MAX_FILE_BYTES, remaining)
+            else:
+                size = upload.seek(0, os.SEEK_END)
+                if size > BATCH_MAX_FILE_BYTES:
+                    raise LimitExceeded(f"{file.filename} is {size} bytes, the limit is {BATCH_MAX_FILE_BYTES}")
+                if size > remaining:
+                    raise LimitExceeded(f"The batch is over the limit of {BATCH_MAX_TOTAL_BYTES} bytes")
+                members = read_spooled(file.filename, upload)
+        except LimitExceeded as e:
+            error = JSONResponse({"error": str(e)}, status_code=413)
+        except Exception as e:
+            error = JSONResponse({
+                "error": f"Failed to read archive {file.filename}: {str(e)}"
+            }, status_code=400)
+        if error is not None:
+            for upload in uploads:
+                upload.close()
+            return error
+        remaining -= size
+        sources.append(members)
+
+    def items():
+        try:
+            for members in sources:
+                yield from members
+        finally:
+            for upload in uploads:
+                upload.close()
+
+    # Items go through the shared executor, so they count against the
+    # modality's concurrency limit like single-file requests
+    loop = asyncio.get_running_loop()
+
+    def submit(fn, *args):
+        return asyncio.run_coroutine_threadsafe(executor.run(modality, fn, *args), loop)
+
+    results_iter = run_batch(modality, items(), spec, seed,
+                             max_parallel=min(max_parallel, BATCH_MAX_PARALLEL), group_size=BATCH_GROUP_SIZE,
+                             submit=submit)
+    # A sync iterator is consumed in Starlette's threadpool, off the event loop
+    return StreamingResponse(
+        stream_zip(results_iter),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{modality}_batch.zip"'}
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
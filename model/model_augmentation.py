@@ -1,19 +1,115 @@
+from typing import List, Optional, Sequence, Union
+
 import numpy as np
-from scipy.spatial.transform import Rotation
+import trimesh
+
+_AXES = {"x": (1, 2), "y": (2, 0), "z": (0, 1)}
+
+
+def axis_rotations(angles: np.ndarray, axis: str = "y") -> np.ndarray:
+    """(n, 3, 3) right-handed rotations by ``angles`` (radians) around one axis"""
+    i, j = _AXES[axis]
+    cos, sin = np.cos(angles), np.sin(angles)
+    matrices = np.zeros((len(angles), 3, 3))
+    matrices[:, "xyz".index(axis), "xyz".index(axis)] = 1.0
+    matrices[:, i, i] = cos
+    matrices[:, j, j] = cos
+    matrices[:, i, j] = -sin
+    matrices[:, j, i] = sin
+    return matrices
+
+
+def uniform_rotations(u: np.ndarray) -> np.ndarray:
+    """
+    (n, 3, 3) rotations uniform over SO(3), from an (n, 3) array of uniform
+    [0, 1) samples (Shoemake's quaternion construction)
+    """
+    u1, u2, u3 = u.T
+    a, b = np.sqrt(1 - u1), np.sqrt(u1)
+    w, x = a * np.sin(2 * np.pi * u2), a * np.cos(2 * np.pi * u2)
+    y, z = b * np.sin(2 * np.pi * u3), b * np.cos(2 * np.pi * u3)
+    n = len(u)
+    return np.stack([
+        1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w),
+        2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w),
+        2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)
+    ], axis=1).reshape(n, 3, 3)
 
 
 class ModelAugmenter:
+    def rotation_matrix(self, angle=45.0):
+        """3x3 rotation around the Y axis"""
+        return axis_rotations(np.array([np.radians(angle)]), "y")[0]
+
+    def scale_factors(self, min_scale=0.8, max_scale=1.2, rng: Optional[np.random.Generator] = None):
+        """Random per-axis scale factors, from ``rng`` (NumPy's global RNG when None)"""
+        return (rng or np.random).uniform(min_scale, max_scale, size=3)
+
     def rotate(self, mesh, angle=45.0):
         """Rotate model around Y axis"""
-        # Create rotation matrix around Y axis
-        rotation = Rotation.from_euler('y', angle, degrees=True)
-        # Apply rotation to vertices
-        mesh.vertices = rotation.apply(mesh.vertices)
+        mesh.vertices = mesh.vertices @ self.rotation_matrix(angle).T
         return mesh
 
     def scale_random(self, mesh, min_scale=0.8, max_scale=1.2):
         """Random non-uniform scaling"""
-        scale_factors = np.random.uniform(min_scale, max_scale, size=3)
-        mesh.vertices *= scale_factors
+        mesh.vertices *= self.scale_factors(min_scale, max_scale)
         return mesh
 
+    def sample_transforms(self, n, seed=None, rotate=True, scale=True, axis: Optional[str] = "y",
+                          min_scale=0.8, max_scale=1.2):
+        """
+        Draw n random linear transforms as one (n, 3, 3) array: a rotation
+        (uniform angle around ``axis``, or uniform over SO(3) when axis is
+        None) followed by per-axis scaling. The same seed gives the same
+        transforms regardless of how many meshes they are applied to.
+        """
+        # One draw of six values per transform (three for the rotation, three
+        # for the scale), so transform k only depends on the seed and k
+        values = np.random.default_rng(seed).uniform(size=(n, 6))
+        matrices = np.broadcast_to(np.eye(3), (n, 3, 3)).copy()
+        if rotate:
+            if axis is None:
+                matrices = uniform_rotations(values[:, :3])
+            else:
+                matrices = axis_rotations(2 * np.pi * values[:, 0], axis)
+        if scale:
+            # diag(s) @ R scales the rows of R
+            matrices *= (min_scale + (max_scale - min_scale) * values[:, 3:])[:, :, None]
+        return matrices
+
+    def transform_batch(self, vertices: Union[np.ndarray, Sequence[np.ndarray]], matrices: np.ndarray):
+        """
+        Apply matrices[k] to the k-th vertex buffer. ``vertices`` is either
+        one (v, 3) array, transformed by every matrix into an (n, v, 3) array
+        with one einsum, or a list of n arrays of any length, returned as a
+        list of views into one output buffer.
+        """
+        if isinstance(vertices, np.ndarray):
+            # optimize=True lets einsum hand the contraction to BLAS
+            return np.einsum("nij,vj->nvi", matrices, vertices, optimize=True)
+
+        if not len(vertices):
+            return []
+        counts = np.array([len(v) for v in vertices])
+        ends = np.cumsum(counts)
+        transformed = np.empty((int(ends[-1]), 3), dtype=np.result_type(matrices, *vertices))
+        # One matmul per mesh into its slice of the output
+        for block, matrix, end, count in zip(vertices, matrices, ends, counts):
+            np.matmul(block, matrix.T, out=transformed[end - count:end])
+        return np.split(transformed, ends[:-1])
+
+    def augment_batch(self, meshes: Union[trimesh.Trimesh, List[trimesh.Trimesh]], copies: int = 1,
+                      seed=None, **options) -> List[trimesh.Trimesh]:
+        """
+        Random rotation + scale for many meshes at once. Pass one mesh and
+        ``copies`` to get that many variants (all sharing its face array), or a
+        list of meshes to augment each once. Options go to sample_transforms.
+        """
+        if isinstance(meshes, trimesh.Trimesh):
+            matrices = self.sample_transforms(copies, seed, **options)
+            variants = self.transform_batch(np.asarray(meshes.vertices), matrices)
+            return [trimesh.Trimesh(vertices=v, faces=meshes.faces, process=False) for v in variants]
+
+        matrices = self.sample_transforms(len(meshes), seed, **options)
+        variants = self.transform_batch([np.asarray(m.vertices) for m in meshes], matrices)
+        return [trimesh.Trimesh(vertices=v, faces=m.faces, process=False) for v, m in zip(variants, meshes)]
@@ -0,0 +1,171 @@
+import logging
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import trimesh
+
+# Steps that are affine maps of the vertex positions and can be composed into
+# a single 4x4 transform
+AFFINE_STEPS = ("center", "normalize", "augment:rotate", "augment:scale")
+
+# normalize() scales the model to this radius around its vertex mean
+NORMALIZED_RADIUS = 50.0
+
+logger = logging.getLogger(__name__)
+
+
+def translation(offset) -> np.ndarray:
+    matrix = np.eye(4)
+    matrix[:3, 3] = offset
+    return matrix
+
+
+def linear(matrix3: np.ndarray) -> np.ndarray:
+    matrix = np.eye(4)
+    matrix[:3, :3] = matrix3
+    return matrix
+
+
+def surface_centroid(vertices: np.ndarray, faces: np.ndarray, block: int = 16384) -> np.ndarray:
+    """
+    Area-weighted centroid of the surface, as Trimesh.centroid computes it.
+    Faces are processed in blocks to bound the size of the temporaries.
+    """
+    weighted = np.zeros(3)
+    total = 0.0
+    for start in range(0, len(faces), block):
+        corners = faces[start:start + block]
+        v0, v1, v2 = vertices[corners[:, 0]], vertices[corners[:, 1]], vertices[corners[:, 2]]
+        areas = np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1)
+        weighted += areas @ (v0 + v1 + v2)
+        total += areas.sum()
+    if total < 1e-12:
+        return vertices.mean(axis=0)
+    return weighted / (3.0 * total)
+
+
+class _VertexState:
+    """
+    Source vertices plus a pending 4x4 transform. Statistics (centroid,
+    radius) are derived from the source and the pending translation; the
+    transform is only materialized early when a step needs statistics after
+    a rotation or scale.
+    """
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray):
+        self.vertices = vertices
+        self.faces = faces
+        self.owned = False
+        self.matrix = np.eye(4)
+        self._centroid = None
+        self._mean_radius = None
+
+    def compose(self, matrix: np.ndarray):
+        self.matrix = matrix @ self.matrix
+
+    def _settle(self):
+        """Apply the pending transform if it is more than a translation"""
+        if not np.array_equal(self.matrix[:3, :3], np.eye(3)):
+            self.vertices = self.result()
+            self.owned = True
+            self.matrix = np.eye(4)
+            self._centroid = None
+            self._mean_radius = None
+
+    def centroid(self) -> np.ndarray:
+        self._settle()
+        if self._centroid is None:
+            self._centroid = surface_centroid(self.vertices, self.faces)
+        return self._centroid + self.matrix[:3, 3]
+
+    def mean_radius(self) -> Tuple[np.ndarray, float]:
+        self._settle()
+        if self._mean_radius is None:
+            mean = self.vertices.mean(axis=0)
+            self._mean_radius = mean, float(np.sqrt(((self.vertices - mean) ** 2).sum(axis=1).max()))
+        mean, radius = self._mean_radius
+        return mean + self.matrix[:3, 3], radius
+
+    def result(self) -> np.ndarray:
+        """Apply the pending transform, writing into a buffer we own when possible"""
+        if self.owned and np.array_equal(self.matrix, np.eye(4)):
+            return self.vertices
+        out = self.vertices @ self.matrix[:3, :3].T
+        out += self.matrix[:3, 3]
+        return out
+
+
+class MeshPipeline:
+    """
+    Compile an ordered list of mesh steps into as few vertex passes as
+    possible. Consecutive affine steps become one stage (named like
+    "center+normalize") that allocates a single new vertex buffer and shares
+    the face array with its input. Steps are names or (name, params) pairs.
+    Random steps draw from ``rng`` (a np.random.Generator) when given.
+    """
+
+    def __init__(self, steps: Sequence[Union[str, Tuple[str, Dict]]], augmenter=None, debug: bool = False,
+                 rng: Optional[np.random.Generator] = None):
+        self.steps = [(step, {}) if isinstance(step, str) else tuple(step) for step in steps]
+        self.augmenter = augmenter
+        self.debug = debug
+        self.rng = rng
+        self.named_stages: List[Tuple[str, Callable]] = []
+
+        # Every known mesh step is affine, so the whole chain fuses into one stage
+        run = [(name, params) for name, params in self.steps if name in AFFINE_STEPS]
+        if run:
+            self.named_stages.append(("+".join(name for name, _ in run), self._affine_stage(run)))
+
+    @property
+    def stage_names(self) -> List[str]:
+        return [name for name, _ in self.named_stages]
+
+    def __call__(self, mesh: trimesh.Trimesh) -> trimesh.Trimesh:
+        for _, stage in self.named_stages:
+            mesh = stage(mesh)
+        return mesh
+
+    def _affine_stage(self, steps: List[Tuple[str, Dict]]) -> Callable:
+        def stage(mesh):
+            return self.transform(mesh, steps)
+        return stage
+
+    def step_matrix(self, step: str, state: _VertexState, params: Optional[Dict] = None) -> Optional[np.ndarray]:
+        params = params or {}
+        if step == "center":
+            centroid = state.centroid()
+            if self.debug:
+                print(f"Original centroid: {centroid}")
+            return translation(-centroid)
+        if step == "normalize":
+            mean, radius = state.mean_radius()
+            if radius == 0:
+                logger.warning("Cannot normalize a mesh with zero radius")
+                return None
+            scale = params.get("radius", NORMALIZED_RADIUS) / radius
+            if self.debug:
+                print(f"Max radius from center: {radius}, scale factor applied: {scale}")
+            return translation(mean) @ linear(np.eye(3) * scale) @ translation(-mean)
+        if step == "augment:rotate":
+            return linear(self.augmenter.rotation_matrix(**params))
+        if step == "augment:scale":
+            return linear(np.diag(self.augmenter.scale_factors(**params, rng=self.rng)))
+        return None
+
+    def transform(self, mesh: trimesh.Trimesh, steps: Sequence[Union[str, Tuple[str, Dict]]]) -> trimesh.Trimesh:
+        """Apply affine steps as one composed transform; the input mesh is not modified"""
+        faces = mesh.faces
+        state = _VertexState(np.asarray(mesh.vertices), np.asarray(faces))
+        for step in steps:
+            step, params = (step, {}) if isinstance(step, str) else step
+            matrix = self.step_matrix(step, state, params)
+            if matrix is not None:
+                state.compose(matrix)
+            if self.debug:
+                print(f"Applied {step}")
+
+        processed = trimesh.Trimesh(vertices=state.result(), faces=faces, process=False)
+        if self.debug:
+            print(f"New dimensions: {processed.bounds[1] - processed.bounds[0]}")
+        return processed
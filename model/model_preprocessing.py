@@ -3,11 +3,37 @@ import numpy as np
 import io
 import base64
 import json
+import logging
+import struct
+
+from model.model_pipeline import MeshPipeline
+from model.obj_loader import load_obj_fast
+
+# Binary mesh transport: 40-byte little-endian header followed by the vertex
+# buffer (float32, or uint16 when quantized) and a uint32 index buffer.
+# Header: magic, flags, vertex count, index count, min xyz, scale xyz
+MESH_MAGIC = b"MSH1"
+MESH_HEADER = struct.Struct("<4sIII3f3f")
+MESH_FLAG_QUANTIZED = 1
+
+logger = logging.getLogger(__name__)
 
 
 class ModelPreprocessor:
-    def load_obj(self, obj_data):
+    def __init__(self, debug=False):
+        # Print per-step diagnostics (radius, centroid, dimensions)
+        self.debug = debug
+
+    def load_obj(self, obj_data, fast=True):
         """Load OBJ file from bytes"""
+        if fast:
+            try:
+                mesh = load_obj_fast(obj_data)
+                if len(mesh.faces):
+                    return mesh
+            except Exception as e:
+                logger.info("Fast OBJ loader failed, falling back to trimesh: %s", e)
+
         try:
             obj_file = io.BytesIO(obj_data)
             mesh = trimesh.load(
@@ -21,59 +47,61 @@ class ModelPreprocessor:
                 if not meshes:
                     raise ValueError("No valid meshes found in scene")
                 mesh = meshes[0]
-
-            print(f"Loaded mesh with {len(mesh.vertices)} vertices and {len(mesh.faces)} faces")
             return mesh
 
         except Exception as e:
-            print(f"Load error: {str(e)}")
             raise ValueError(f"Failed to load mesh: {str(e)}")
 
     def normalize(self, mesh):
         """Normalize vertices to fit in a unit sphere"""
         try:
-            normalized = mesh.copy()
-
-            # Get current size info
-            vertices = normalized.vertices
-            centroid = vertices.mean(axis=0)
-            distances = np.linalg.norm(vertices - centroid, axis=1)
-            current_max_radius = np.max(distances)
-
-            print(f"Before normalization:")
-            print(f"Max radius from center: {current_max_radius}")
-            print(f"Model dimensions: {mesh.bounds[1] - mesh.bounds[0]}")
-
-            # Scale vertices to fit in unit sphere
-            scale_factor = 50.0 / current_max_radius
-            normalized.vertices = centroid + (vertices - centroid) * scale_factor
-
-            print(f"After normalization:")
-            print(f"Scale factor applied: {scale_factor}")
-            print(f"New max radius: {np.max(np.linalg.norm(normalized.vertices - centroid, axis=1))}")
-            print(f"New dimensions: {normalized.bounds[1] - normalized.bounds[0]}")
-
-            return normalized
-
+            return MeshPipeline(["normalize"], debug=self.debug)(mesh)
         except Exception as e:
-            print(f"Normalization error: {str(e)}")
+            logger.warning("Normalization error: %s", e)
             return mesh.copy()
 
     def center_model(self, mesh):
         """Center the model at origin"""
         try:
-            centered = mesh.copy()
-            centroid = mesh.centroid
-            centered.vertices -= centroid
-
-            print(f"Original centroid: {centroid}")
-            print(f"After centering centroid: {centered.centroid}")
-            return centered
-
+            return MeshPipeline(["center"], debug=self.debug)(mesh)
         except Exception as e:
-            print(f"Centering error: {str(e)}")
+            logger.warning("Centering error: %s", e)
             return mesh.copy()
 
+    def decimate(self, mesh, target_faces):
+        """
+        Vertex-clustering decimation: snap vertices to a uniform grid, merge
+        each cell into its mean position and drop collapsed triangles. The
+        grid is refined until the result is as close to target_faces as a
+        few passes allow without exceeding it.
+        """
+        vertices = np.asarray(mesh.vertices)
+        faces = np.asarray(mesh.faces)
+        if len(faces) <= target_faces:
+            return mesh
+
+        cells = max(2, int(np.sqrt(target_faces / 2)))
+        best = None
+        for _ in range(8):
+            candidate = _cluster_vertices(vertices, faces, cells)
+            count = len(candidate[1])
+            if count <= target_faces and (best is None or count > len(best[1])):
+                best = candidate
+                if count >= 0.8 * target_faces:
+                    break
+            # Surface face count grows roughly with the square of the grid size
+            scaled = int(cells * np.sqrt(target_faces / max(count, 1)) * 0.97)
+            if scaled == cells:
+                scaled = cells - 1 if count > target_faces else cells + 1
+            cells = max(1, scaled)
+        if best is None:
+            best = candidate
+
+        decimated = trimesh.Trimesh(vertices=best[0], faces=best[1], process=False)
+        if self.debug:
+            print(f"Decimated {len(faces)} faces to {len(best[1])} (target {target_faces})")
+        return decimated
+
     def to_json(self, mesh):
         """Convert mesh to JSON format for three.js"""
         try:
@@ -88,5 +116,58 @@ class ModelPreprocessor:
             return base64.b64encode(json.dumps(data).encode()).decode()
 
         except Exception as e:
-            print(f"JSON conversion error: {str(e)}")
             raise ValueError(f"Failed to convert mesh to JSON: {str(e)}")
+
+    def to_binary(self, mesh, quantize=False):
+        """Pack mesh into little-endian typed-array buffers for three.js"""
+        vertices = np.asarray(mesh.vertices)
+        faces = np.asarray(mesh.faces)
+        flags = 0
+        lower = np.zeros(3)
+        scale = np.ones(3)
+
+        if quantize and len(vertices):
+            # 16-bit positions relative to the bounding box
+            flags |= MESH_FLAG_QUANTIZED
+            lower = vertices.min(axis=0)
+            extent = vertices.max(axis=0) - lower
+            scale = np.where(extent > 0, extent / 65535.0, 1.0)
+            positions = np.round((vertices - lower) / scale).astype('<u2').tobytes()
+            # Keep the index buffer 4-byte aligned for Uint32Array
+            positions += b"\0" * (-len(positions) % 4)
+        else:
+            positions = vertices.astype('<f4').tobytes()
+
+        header = MESH_HEADER.pack(MESH_MAGIC, flags, len(vertices), faces.size, *lower, *scale)
+        return header + positions + faces.astype('<u4').tobytes()
+
+
+
+def _cluster_vertices(vertices, faces, cells):
+    """Merge vertices that fall into the same cell of a cells^3 grid over the bounding box"""
+    lower = vertices.min(axis=0)
+    size = (vertices.max(axis=0) - lower).max() / cells
+    if size <= 0:
+        size = 1.0
+    keys = np.minimum(((vertices - lower) / size).astype(np.int64), cells - 1)
+    flat = (keys[:, 0] * cells + keys[:, 1]) * cells + keys[:, 2]
+    _, inverse = np.unique(flat, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    counts = np.bincount(inverse)
+    positions = np.stack([np.bincount(inverse, weights=vertices[:, axis]) for axis in range(3)], axis=1)
+    positions /= counts[:, None]
+
+    clustered = inverse[faces]
+    keep = ((clustered[:, 0] != clustered[:, 1]) & (clustered[:, 1] != clustered[:, 2])
+            & (clustered[:, 0] != clustered[:, 2]))
+    clustered = clustered[keep]
+    # Several source triangles often collapse onto the same cluster triangle
+    _, first = np.unique(np.sort(clustered, axis=1), axis=0, return_index=True)
+    clustered = clustered[np.sort(first)]
+
+    # Drop clusters no remaining face refers to
+    used = np.zeros(len(positions), dtype=bool)
+    used[clustered] = True
+    remap = np.cumsum(used) - 1
+    return positions[used], remap[clustered]
@@ -0,0 +1,193 @@
+import re
+import warnings
+from typing import BinaryIO, Iterator, List, Union
+
+import numpy as np
+import trimesh
+
+# Texture/normal references in face records ("7/1/3" -> "7")
+_FACE_REFS = re.compile(rb"/\S*")
+_VERTEX_RECORD = re.compile(rb"^v[ \t]+([^\r\n#]*)", re.MULTILINE)
+_FACE_RECORD = re.compile(rb"^f[ \t]+([^\r\n#]*)", re.MULTILINE)
+
+
+class _GrowableArray:
+    """Preallocated 2D array that doubles its capacity when full"""
+
+    def __init__(self, columns: int, dtype, capacity: int = 1024):
+        self.data = np.empty((max(capacity, 16), columns), dtype=dtype)
+        self.size = 0
+
+    def extend(self, block: np.ndarray):
+        if not len(block):
+            return
+        needed = self.size + len(block)
+        if needed > len(self.data):
+            grown = np.empty((max(needed, 2 * len(self.data)), self.data.shape[1]), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = block
+        self.size = needed
+
+    def result(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+def _iter_blocks(source: Union[bytes, bytearray, memoryview, BinaryIO], chunk_size: int) -> Iterator[bytes]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start:start + chunk_size])
+    else:
+        while True:
+            block = source.read(chunk_size)
+            if not block:
+                break
+            yield block
+
+
+def _iter_chunks(source: Union[bytes, bytearray, memoryview, BinaryIO], chunk_size: int) -> Iterator[bytes]:
+    """Yield chunks of whole lines from bytes or a binary file object"""
+    remainder = b""
+    for block in _iter_blocks(source, chunk_size):
+        block = remainder + block
+        cut = block.rfind(b"\n")
+        if cut == -1:
+            remainder = block
+            continue
+        remainder = block[cut + 1:]
+        yield block[:cut + 1]
+    if remainder:
+        yield remainder
+
+
+def _parse_numbers(data: bytes, dtype) -> np.ndarray:
+    """Parse whitespace-separated numbers in C; stops early on malformed data"""
+    with warnings.catch_warnings():
+        # Unparseable tokens only warn; callers detect them from the count
+        warnings.simplefilter("ignore", DeprecationWarning)
+        return np.fromstring(data, dtype=dtype, sep=" ")
+
+
+def _token_counts(joined: bytes, lines: int) -> np.ndarray:
+    """Number of whitespace-separated tokens on each of the lines of joined"""
+    data = np.frombuffer(joined, dtype=np.uint8)
+    counts = np.zeros(lines, dtype=np.intp)
+    if not len(data):
+        return counts
+    # Whitespace and control bytes are all <= 32
+    token = data > 32
+    starts = token.copy()
+    starts[1:] &= ~token[:-1]
+    line_starts = np.concatenate(([0], np.flatnonzero(data == ord("\n")) + 1))
+    # Every line but an empty last one contains at least its newline byte
+    line_starts = line_starts[line_starts < len(data)]
+    counts[:len(line_starts)] = np.add.reduceat(starts, line_starts, dtype=np.intp)
+    return counts
+
+
+def _parse_vertices(records: List[bytes]) -> np.ndarray:
+    joined = b"\n".join(records)
+    if (_token_counts(joined, len(records)) == 3).all():
+        # Fast path: every record is "v x y z"
+        flat = _parse_numbers(joined, np.float64)
+        if flat.size == 3 * len(records):
+            return flat.reshape(-1, 3)
+    # Mixed records (w component, vertex colours): take x y z per line
+    return np.array([record.split()[:3] for record in records]).astype(np.float64)
+
+
+def _triangulate(polygons: np.ndarray) -> np.ndarray:
+    """Fan-triangulate an (n, k) array of polygons into (n * (k - 2), 3) triangles"""
+    k = polygons.shape[1]
+    if k == 3:
+        return polygons
+    fans = [np.stack([polygons[:, 0], polygons[:, i], polygons[:, i + 1]], axis=1) for i in range(1, k - 1)]
+    return np.stack(fans, axis=1).reshape(-1, 3)
+
+
+def _parse_faces(records: List[bytes], vertex_counts) -> np.ndarray:
+    """
+    Parse face records into 0-based triangles. ``vertex_counts()`` returns the
+    number of vertices defined before each face line; it is only called when
+    negative (relative) indices are present.
+    """
+    joined = b"\n".join(records)
+    if b"/" in joined:
+        joined = _FACE_REFS.sub(b"", joined)
+
+    # The total number count alone can't tell polygon sizes apart (a quad and
+    # a triangle plus a line of five look the same), so check every line
+    sizes = _token_counts(joined, len(records))
+    k = sizes[0] if len(sizes) else 0
+    if k >= 3 and (sizes == k).all():
+        flat = _parse_numbers(joined, np.int64)
+        if flat.size == k * len(records):
+            polygons = flat.reshape(-1, k)
+            if (polygons < 0).any():
+                polygons = _resolve(polygons, vertex_counts())
+            else:
+                polygons = polygons - 1
+            return _triangulate(polygons)
+
+    # Mixed polygon sizes: group by vertex count and triangulate each group
+    rows = [line.split() for line in joined.split(b"\n")]
+    counts = vertex_counts()
+    triangles, owners = [], []
+    for k in np.unique(sizes):
+        if k < 3:
+            continue
+        members = np.nonzero(sizes == k)[0]
+        polygons = np.array([rows[i] for i in members]).astype(np.int64)
+        triangles.append(_triangulate(_resolve(polygons, counts[members])))
+        owners.append(np.repeat(members, k - 2))
+    if not triangles:
+        return np.empty((0, 3), dtype=np.int64)
+    # Restore file order of the faces
+    order = np.argsort(np.concatenate(owners), kind="stable")
+    return np.concatenate(triangles)[order]
+
+
+def _resolve(polygons: np.ndarray, vertex_counts: np.ndarray) -> np.ndarray:
+    """Convert 1-based and negative (relative) OBJ indices to 0-based"""
+    negative = polygons < 0
+    if negative.any():
+        return np.where(negative, polygons + vertex_counts[:, None], polygons - 1)
+    return polygons - 1
+
+
+def load_obj_fast(source: Union[bytes, bytearray, memoryview, BinaryIO], chunk_size: int = 8 * 1024 * 1024,
+                  size_hint: int = 0) -> trimesh.Trimesh:
+    """
+    Parse the v/f records of an OBJ file chunk by chunk into preallocated
+    arrays and build a Trimesh with processing disabled. Normals, texture
+    coordinates, groups and materials are ignored.
+    """
+    if not size_hint and isinstance(source, (bytes, bytearray, memoryview)):
+        size_hint = len(source)
+    # Rough guess: ~30 bytes per vertex record and twice as many faces
+    vertices = _GrowableArray(3, np.float64, size_hint // 90)
+    faces = _GrowableArray(3, np.int64, size_hint // 45)
+
+    for chunk in _iter_chunks(source, chunk_size):
+        # findall() runs in C and yields just the payload of each record
+        vertex_records = _VERTEX_RECORD.findall(chunk)
+        face_records = _FACE_RECORD.findall(chunk)
+        base = vertices.size
+
+        def vertex_counts():
+            # Vertices defined before each face line, for negative indices
+            vertex_starts = [m.start() for m in _VERTEX_RECORD.finditer(chunk)]
+            face_starts = [m.start() for m in _FACE_RECORD.finditer(chunk)]
+            return base + np.searchsorted(vertex_starts, face_starts)
+
+        if vertex_records:
+            vertices.extend(_parse_vertices(vertex_records))
+        if face_records:
+            faces.extend(_parse_faces(face_records, vertex_counts))
+
+    faces_array = faces.result()
+    if len(faces_array) and (faces_array.min() < 0 or faces_array.max() >= vertices.size):
+        raise ValueError("Face references a vertex that does not exist")
+
+    return trimesh.Trimesh(vertices=vertices.result(), faces=faces_array, process=False)
@@ -42,31 +42,95 @@ class ModelViewer {
         this.animate();
     }
 
-    loadModel(jsonData) {
+    async fetchModel(url) {
+        // Binary mesh buffers served by /process_model?transport=binary
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`Failed to fetch model: ${response.status}`);
+        }
+        this.loadModel(await response.arrayBuffer());
+    }
+
+    async fetchProgressive(urls) {
+        // Show the coarsest level as soon as it arrives, then refine level by level
+        const token = this.loadToken = (this.loadToken || 0) + 1;
+        for (const url of urls) {
+            const response = await fetch(url);
+            if (!response.ok) {
+                throw new Error(`Failed to fetch model: ${response.status}`);
+            }
+            const buffer = await response.arrayBuffer();
+            if (token !== this.loadToken) {
+                return;  // A newer model was requested meanwhile
+            }
+            this.loadModel(buffer);
+        }
+    }
+
+    static parseBinary(buffer) {
+        // Layout matches ModelPreprocessor.to_binary (little-endian, 40-byte header)
+        const header = new DataView(buffer, 0, 40);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'MSH1') {
+            throw new Error('Not a binary mesh buffer');
+        }
+        const flags = header.getUint32(4, true);
+        const vertexCount = header.getUint32(8, true);
+        const indexCount = header.getUint32(12, true);
+        let offset = 40;
+
+        let vertices;
+        if (flags & 1) {
+            // Quantized uint16 positions: value = min + q * scale
+            const quantized = new Uint16Array(buffer, offset, vertexCount * 3);
+            const min = [0, 1, 2].map(i => header.getFloat32(16 + 4 * i, true));
+            const scale = [0, 1, 2].map(i => header.getFloat32(28 + 4 * i, true));
+            vertices = new Float32Array(quantized.length);
+            for (let i = 0; i < quantized.length; i++) {
+                const axis = i % 3;
+                vertices[i] = min[axis] + quantized[i] * scale[axis];
+            }
+            offset += (quantized.byteLength + 3) & ~3;
+        } else {
+            // Wrap the buffer directly, no copy
+            vertices = new Float32Array(buffer, offset, vertexCount * 3);
+            offset += vertices.byteLength;
+        }
+        const indices = new Uint32Array(buffer, offset, indexCount);
+        return { vertices, indices };
+    }
+
+    loadModel(data) {
         // Remove existing model
         if (this.mesh) {
             this.scene.remove(this.mesh);
+            this.mesh.geometry.dispose();
+            this.mesh.material.dispose();
         }
 
         try {
-            // Parse the base64 encoded JSON data
-            const modelData = JSON.parse(atob(jsonData));
+            let vertices;
+            let indices;
+            if (data instanceof ArrayBuffer) {
+                ({ vertices, indices } = ModelViewer.parseBinary(data));
+            } else {
+                // Parse the base64 encoded JSON data
+                const modelData = JSON.parse(atob(data));
+                vertices = new Float32Array(modelData.vertices.flat());
+                indices = new Uint32Array(modelData.faces.flat());
+            }
             console.log('Model data:', {
-                bounds: modelData.bounds,
-                centroid: modelData.centroid,
-                vertices: modelData.vertices.length,
-                faces: modelData.faces.length
+                vertices: vertices.length / 3,
+                faces: indices.length / 3
             });
 
             // Create geometry
             const geometry = new THREE.BufferGeometry();
 
             // Set vertices directly without modification
-            const vertices = new Float32Array(modelData.vertices.flat());
             geometry.setAttribute('position', new THREE.BufferAttribute(vertices, 3));
 
             // Set faces
-            const indices = new Uint32Array(modelData.faces.flat());
             geometry.setIndex(new THREE.BufferAttribute(indices, 1));
 
             // Compute normals
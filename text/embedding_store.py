@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import zlib
+from typing import List, Optional, Sequence
+
+import numpy as np
+import torch
+
+
+DTYPES = ("float32", "float16", "int8")
+
+
+def _hash(word_bytes: bytes) -> int:
+    return zlib.crc32(word_bytes)
+
+
+class _Vocabulary:
+    """Read-only itos/stoi view backed by the memory-mapped word blob"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, table: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+        self._table = table
+        self._mask = len(table) - 1
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _word_bytes(self, row: int) -> bytes:
+        return self._blob[self._offsets[row]:self._offsets[row + 1]].tobytes()
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        return self._word_bytes(item).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def get(self, word: str, default=None) -> Optional[int]:
+        """Row of ``word`` via the open-addressing hash table"""
+        key = word.encode("utf-8")
+        slot = _hash(key) & self._mask
+        while True:
+            row = int(self._table[slot])
+            if row < 0:
+                return default
+            if self._word_bytes(row) == key:
+                return row
+            slot = (slot + 1) & self._mask
+
+    def __contains__(self, word: str) -> bool:
+        return self.get(word) is not None
+
+
+class EmbeddingStore:
+    """Memory-mapped word embeddings with a hash index from word to row.
+
+    The files are mapped copy-on-write, so every worker process that opens the
+    same store shares the page cache instead of holding its own copy. Stores
+    are written with unit-length rows by default ("normalized" in meta.json),
+    ready for cosine similarity without a normalized copy.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.dtype = self.meta["dtype"]
+        self.dim = self.meta["dim"]
+        # Stores written before normalization was added hold raw vectors
+        self.normalized = self.meta.get("normalized", False)
+
+        self._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="c")
+        self._scales = None
+        if self.dtype == "int8":
+            self._scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="c")
+
+        self.vocab = _Vocabulary(
+            np.load(os.path.join(path, "words.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "offsets.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "hash_table.npy"), mmap_mode="r")
+        )
+
+    @property
+    def itos(self):
+        return self.vocab
+
+    @property
+    def stoi(self):
+        return self.vocab
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> torch.Tensor:
+        """Dequantized float32 tensor for a contiguous block of rows"""
+        block = np.asarray(self._vectors[start:stop], dtype=np.float32)
+        if self._scales is not None:
+            block = block * self._scales[start:stop, None]
+        return torch.from_numpy(block)
+
+    def matrix(self, n: Optional[int] = None) -> torch.Tensor:
+        """The first n stored rows (float32, float16 or int8) as a view of the map, not a copy"""
+        return torch.from_numpy(self._vectors[:n])
+
+    def scales(self, n: Optional[int] = None) -> Optional[torch.Tensor]:
+        """Per-row int8 dequantization scales as a view of the map, or None"""
+        return None if self._scales is None else torch.from_numpy(self._scales[:n])
+
+    def vector(self, word: str) -> Optional[torch.Tensor]:
+        row = self.vocab.get(word)
+        if row is None:
+            return None
+        return self.rows(row, row + 1)[0]
+
+    def __getitem__(self, word: str) -> torch.Tensor:
+        vector = self.vector(word)
+        return vector if vector is not None else torch.zeros(self.dim)
+
+    @staticmethod
+    def build(vectors: torch.Tensor, itos: Sequence[str], path: str,
+              dtype: str = "float32", max_vocab: Optional[int] = None, normalize: bool = True):
+        """Write ``vectors``/``itos`` to ``path`` in the store format, scaled to unit length unless ``normalize`` is False"""
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}")
+        os.makedirs(path, exist_ok=True)
+
+        n = len(itos) if max_vocab is None else min(max_vocab, len(itos))
+        matrix = vectors[:n].detach().cpu().numpy().astype(np.float32)
+        if normalize:
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-8)
+
+        if dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+            np.save(os.path.join(path, "scales.npy"), scales.astype(np.float32))
+            np.save(os.path.join(path, "vectors.npy"), quantized)
+        else:
+            np.save(os.path.join(path, "vectors.npy"), matrix.astype(dtype))
+
+        encoded: List[bytes] = [w.encode("utf-8") for w in itos[:n]]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(w) for w in encoded])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        # Open addressing with linear probing, load factor <= 0.5
+        table_size = 1 << max(1, (2 * n - 1).bit_length())
+        mask = table_size - 1
+        table = np.full(table_size, -1, dtype=np.int32)
+        for row, key in enumerate(encoded):
+            slot = _hash(key) & mask
+            while table[slot] >= 0:
+                slot = (slot + 1) & mask
+            table[slot] = row
+
+        np.save(os.path.join(path, "words.npy"), blob)
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+        np.save(os.path.join(path, "hash_table.npy"), table)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dtype": dtype, "dim": int(matrix.shape[1]), "size": n, "normalized": normalize}, f)
+
+        return EmbeddingStore(path)
+
+    @staticmethod
+    def from_torchtext(path: str, name: str = "6B", dim: int = 100,
+                       dtype: str = "float32", max_vocab: Optional[int] = None, normalize: bool = True):
+        """One-time conversion from the torchtext GloVe cache"""
+        from torchtext.vocab import GloVe
+        glove = GloVe(name=name, dim=dim)
+        return EmbeddingStore.build(glove.vectors, glove.itos, path, dtype=dtype, max_vocab=max_vocab,
+                                    normalize=normalize)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert torchtext GloVe vectors to a memory-mapped store")
+    parser.add_argument("path", help="Output directory")
+    parser.add_argument("--name", default="6B")
+    parser.add_argument("--dim", type=int, default=100)
+    parser.add_argument("--dtype", choices=DTYPES, default="float32")
+    parser.add_argument("--max-vocab", type=int, default=None)
+    parser.add_argument("--no-normalize", action="store_true", help="keep the raw vector lengths")
+    args = parser.parse_args()
+
+    store = EmbeddingStore.from_torchtext(args.path, args.name, args.dim, args.dtype, args.max_vocab,
+                                          normalize=not args.no_normalize)
+    print(f"Wrote {len(store)} vectors ({store.dtype}) to {args.path}")
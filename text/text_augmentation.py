@@ -1,48 +1,46 @@
-import torch
 import random
 from torchtext.vocab import GloVe
-from typing import List
+from typing import List, Optional
+
+from text.embedding_store import EmbeddingStore
+from text.text_similarity import SimilarityIndex
 
 
 class TextAugmenter:
-    def __init__(self):
-        # Load GloVe embeddings
-        self.glove = GloVe(name='6B', dim=100)
+    def __init__(self, full_vocab: bool = False, store_path: Optional[str] = None):
+        max_vocab = None if full_vocab else 50000
+        if store_path:
+            # Memory-mapped store built by text/embedding_store.py
+            self.glove = EmbeddingStore(store_path)
+            self.index = SimilarityIndex.from_store(self.glove, max_vocab=max_vocab)
+        else:
+            # Load GloVe embeddings
+            self.glove = GloVe(name='6B', dim=100)
+            # Nearest-neighbour index over the (optionally truncated) vocabulary
+            self.index = SimilarityIndex.from_vectors(
+                self.glove.vectors,
+                self.glove.itos,
+                stoi=self.glove.stoi,
+                max_vocab=max_vocab
+            )
         # Cache for similar words to avoid repeated calculations
         self.similar_words_cache = {}
 
     def find_similar_words(self, word: str, n: int = 5) -> List[str]:
         """Find similar words using GloVe embeddings"""
-        # Check cache first
-        if word in self.similar_words_cache:
-            return self.similar_words_cache[word]
-
-        # Get word vector
-        word_vector = self.glove[word]
-        if word_vector is None:
-            return []
-
-        # Calculate cosine similarity with all words
-        cos = torch.nn.CosineSimilarity(dim=0)
-        distances = []
-
-        # Only compare with first 50000 words for efficiency
-        for similar_word in self.glove.itos[:50000]:
-            if similar_word == word:
-                continue
-            similarity = cos(word_vector, self.glove[similar_word])
-            distances.append((similar_word, similarity))
-
-        # Sort by similarity and get top n
-        similar_words = sorted(distances, key=lambda x: x[1], reverse=True)[:n]
-        result = [word for word, _ in similar_words]
-
-        # Cache the result
-        self.similar_words_cache[word] = result
-        return result
-
-    def word_swap(self, text: str, swap_percent: float = 0.1) -> str:
-        """Randomly swap adjacent words"""
+        return self.find_similar_words_batch([word], n)[0]
+
+    def find_similar_words_batch(self, words: List[str], n: int = 5) -> List[List[str]]:
+        """Find similar words for several words with a single index query"""
+        missing = list({w for w in words if w not in self.similar_words_cache})
+        if missing:
+            for word, result in zip(missing, self.index.most_similar_batch(missing, n)):
+                self.similar_words_cache[word] = result
+        return [self.similar_words_cache[w] for w in words]
+
+    def word_swap(self, text: str, swap_percent: float = 0.1, rng: Optional[random.Random] = None) -> str:
+        """Randomly swap adjacent words; ``rng`` defaults to the global random module"""
+        rng = rng or random
         # Split text into sentences
         sentences = text.split('.')
         sentences = [s.strip() for s in sentences if s.strip()]
@@ -59,7 +57,7 @@ class TextAugmenter:
 
                 for _ in range(n_swaps):
                     # Pick a random position (excluding last word)
-                    idx = random.randint(0, len(words) - 2)
+                    idx = rng.randint(0, len(words) - 2)
                     # Swap with next word
                     words[idx], words[idx + 1] = words[idx + 1], words[idx]
 
@@ -67,8 +65,10 @@ class TextAugmenter:
 
         return '. '.join(result_sentences) + ('.' if text.endswith('.') else '')
 
-    def synonym_replacement(self, text: str, replace_percent: float = 0.1) -> str:
+    def synonym_replacement(self, text: str, replace_percent: float = 0.1,
+                            rng: Optional[random.Random] = None) -> str:
         """Replace random words with their similar words from GloVe embeddings"""
+        rng = rng or random
         # Split text into sentences
         sentences = text.split('.')
         sentences = [s.strip() for s in sentences if s.strip()]
@@ -84,16 +84,15 @@ class TextAugmenter:
                 n_replacements = max(1, int(len(words) * replace_percent))
 
                 # Choose random words to replace
-                replace_indices = random.sample(range(len(words)), min(n_replacements, len(words)))
+                replace_indices = rng.sample(range(len(words)), min(n_replacements, len(words)))
 
-                for idx in replace_indices:
-                    word = words[idx].lower()
-                    # Get similar words
-                    similar_words = self.find_similar_words(word)
+                # Look up all selected words in one batch
+                candidates = self.find_similar_words_batch([words[idx].lower() for idx in replace_indices])
 
+                for idx, similar_words in zip(replace_indices, candidates):
                     # Replace word with random similar word if available
                     if similar_words:
-                        words[idx] = random.choice(similar_words)
+                        words[idx] = rng.choice(similar_words)
 
             result_sentences.append(' '.join(words))
 
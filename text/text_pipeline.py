@@ -0,0 +1,37 @@
+import re
+import string
+from typing import Callable, Sequence
+
+_ASCII_LOWER = {ord(c): ord(c.lower()) for c in string.ascii_uppercase}
+_PUNCTUATION = {ord(c): None for c in string.punctuation}
+# str.translate with a dict falls back to a slow path on non-ASCII input
+_PUNCTUATION_RE = re.compile('[%s]+' % re.escape(string.punctuation))
+
+
+def strip_punctuation(text: str) -> str:
+    """Remove string.punctuation characters in one C-level pass"""
+    if text.isascii():
+        return text.translate(_PUNCTUATION)
+    return _PUNCTUATION_RE.sub('', text)
+
+
+def fuse_character_steps(steps: Sequence[str]) -> Callable[[str], str]:
+    """
+    Build one transform for consecutive lowercase/punctuation steps.
+    string.punctuation is ASCII-only, so lowercasing and punctuation removal
+    commute and their order inside a run does not matter.
+    """
+    lowercase = "lowercase" in steps
+    punctuation = "punctuation" in steps
+    ascii_table = {**(_ASCII_LOWER if lowercase else {}), **(_PUNCTUATION if punctuation else {})}
+
+    def transform(text: str) -> str:
+        if text.isascii():
+            return text.translate(ascii_table)
+        # Non-ASCII text needs str.lower() for full Unicode case folding
+        if lowercase:
+            text = text.lower()
+        return strip_punctuation(text) if punctuation else text
+
+    return transform
+
@@ -1,7 +1,12 @@
 import torch
 from torchtext.data.utils import get_tokenizer
-import string
 import spacy
+from typing import Iterable, Iterator, List
+
+from text.text_pipeline import strip_punctuation
+
+# Components the rule-based lemmatizer depends on; everything else is disabled
+LEMMA_PIPES = ("tok2vec", "tagger", "attribute_ruler", "lemmatizer")
 
 
 class TextPreprocessor:
@@ -16,12 +21,74 @@ class TextPreprocessor:
 
     @staticmethod
     def remove_punctuation(text):
-        return ''.join(char for char in text if char not in string.punctuation)
+        return strip_punctuation(text)
 
-    def lemmatize_text(self, text):
+    def lemmatize_text(self, text, batch_size=64, n_process=1):
         """
         Reduce words to their base/dictionary form
         Example: 'running' -> 'run', 'better' -> 'good', 'was' -> 'be'
         """
-        doc = self.nlp(text)
-        return ' '.join([token.lemma_ for token in doc])
+        return self.lemmatize_batch([text], batch_size=batch_size, n_process=n_process)[0]
+
+    def lemmatize_batch(self, texts: Iterable[str], batch_size: int = 64, n_process: int = 1,
+                        chunk_size: int = 100000) -> List[str]:
+        """
+        Lemmatize several documents with nlp.pipe.
+        Large documents are split into chunks on line/sentence boundaries and
+        only the components needed for lemmatization are run.
+        """
+        texts = list(texts)
+        owners = []
+        chunks = []
+        for doc_id, text in enumerate(texts):
+            for chunk in self.split_chunks(text, chunk_size):
+                owners.append(doc_id)
+                chunks.append(chunk)
+
+        lemmas = [[] for _ in texts]
+        disabled = [name for name in self.nlp.pipe_names if name not in LEMMA_PIPES]
+        with self.nlp.select_pipes(disable=disabled):
+            docs = self.nlp.pipe(chunks, batch_size=batch_size, n_process=n_process)
+            for doc_id, doc in zip(owners, docs):
+                lemmas[doc_id].extend(token.lemma_ for token in doc)
+
+        return [' '.join(doc_lemmas) for doc_lemmas in lemmas]
+
+    @staticmethod
+    def split_chunks(text: str, chunk_size: int = 100000) -> Iterator[str]:
+        """Split text into pieces of at most ~chunk_size characters on line or sentence boundaries"""
+        if len(text) <= chunk_size:
+            yield text
+            return
+
+        buffer = []
+        size = 0
+        for line in text.splitlines(keepends=True):
+            # A single very long line is split on sentence ends, then on spaces
+            pieces = [line]
+            if len(line) > chunk_size:
+                pieces = TextPreprocessor._split_long(line, chunk_size)
+            for piece in pieces:
+                if size + len(piece) > chunk_size and buffer:
+                    yield ''.join(buffer)
+                    buffer = []
+                    size = 0
+                buffer.append(piece)
+                size += len(piece)
+        if buffer:
+            yield ''.join(buffer)
+
+    @staticmethod
+    def _split_long(line: str, chunk_size: int) -> List[str]:
+        pieces = []
+        start = 0
+        while len(line) - start > chunk_size:
+            end = start + chunk_size
+            cut = line.rfind('. ', start, end)
+            if cut == -1:
+                cut = line.rfind(' ', start, end)
+            cut = end if cut == -1 else cut + 1
+            pieces.append(line[start:cut])
+            start = cut
+        pieces.append(line[start:])
+        return pieces
@@ -0,0 +1,114 @@
+import torch
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+class SimilarityIndex:
+    """Top-k cosine nearest-neighbour index over a word embedding matrix.
+
+    ``candidates`` holds unit-length rows, so a query is a matrix product
+    followed by ``topk``. Rows that are not float32 (a float16 or int8
+    memory map) are converted a block at a time while scoring, and
+    ``scales`` multiplies each row's score (int8 scales, or inverse norms
+    when the rows are not normalized). The matrix is never copied, so a
+    memory-mapped store stays shared between worker processes.
+    """
+
+    # Rows converted to float32 at a time when the matrix isn't float32
+    BLOCK_ROWS = 32768
+
+    def __init__(self, candidates: torch.Tensor, itos: Sequence[str],
+                 lookup: Callable[[str], Optional[torch.Tensor]], scales: Optional[torch.Tensor] = None):
+        self.itos = itos
+        self.matrix = candidates
+        self.scales = scales
+        # Raw query vectors come from the full vocabulary so words outside
+        # the candidate slice can still be looked up
+        self.lookup = lookup
+
+    @classmethod
+    def from_vectors(cls, vectors: torch.Tensor, itos: Sequence[str],
+                     stoi: Optional[Dict[str, int]] = None, max_vocab: Optional[int] = 50000):
+        """Build from an in-memory matrix such as ``GloVe.vectors`` (normalized once into a new matrix)"""
+        stoi = stoi if stoi is not None else {w: i for i, w in enumerate(itos)}
+        n = len(itos) if max_vocab is None else min(max_vocab, len(itos))
+
+        def lookup(word):
+            idx = stoi.get(word)
+            return None if idx is None else vectors[idx]
+
+        candidates = vectors[:n].float()
+        candidates = candidates / candidates.norm(dim=1, keepdim=True).clamp_min(1e-8)
+        return cls(candidates, list(itos[:n]), lookup)
+
+    @classmethod
+    def from_store(cls, store, max_vocab: Optional[int] = 50000):
+        """
+        Build on a memory-mapped ``EmbeddingStore`` without copying it: rows
+        are scored straight from the map and words are decoded from it on
+        demand. Stores written without normalization get per-row inverse
+        norms (n floats) computed once.
+        """
+        n = len(store) if max_vocab is None else min(max_vocab, len(store))
+        matrix = store.matrix(n)
+        scales = store.scales(n)
+        if not store.normalized:
+            norms = torch.cat([block.norm(dim=1) for block in cls._blocks(matrix, scales)])
+            inverse = 1.0 / norms.clamp_min(1e-8)
+            scales = inverse if scales is None else scales * inverse
+        return cls(matrix, store.itos, store.vector, scales)
+
+    @classmethod
+    def _blocks(cls, matrix: torch.Tensor, scales: Optional[torch.Tensor] = None):
+        """float32 blocks of rows, with ``scales`` applied"""
+        for start in range(0, len(matrix), cls.BLOCK_ROWS):
+            block = matrix[start:start + cls.BLOCK_ROWS].float()
+            if scales is not None:
+                block = block * scales[start:start + cls.BLOCK_ROWS, None]
+            yield block
+
+    def scores(self, queries: torch.Tensor) -> torch.Tensor:
+        """(q, n) cosine similarities of unit-length queries to every candidate"""
+        if self.matrix.dtype == torch.float32:
+            # A view of the map (or the in-memory matrix); matmul reads it in place
+            scores = queries @ self.matrix.T
+        else:
+            scores = torch.cat([queries @ block.T for block in self._blocks(self.matrix)], dim=1)
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def vector(self, word: str) -> Optional[torch.Tensor]:
+        """Return the normalized query vector for a word, or None if unknown"""
+        vector = self.lookup(word)
+        if vector is None:
+            return None
+        vector = vector.float()
+        norm = vector.norm()
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def most_similar(self, word: str, n: int = 5) -> List[str]:
+        """Return the n words closest to ``word`` by cosine similarity"""
+        return self.most_similar_batch([word], n)[0]
+
+    def most_similar_batch(self, words: Sequence[str], n: int = 5) -> List[List[str]]:
+        """Resolve several words with one matrix product"""
+        results: List[List[str]] = [[] for _ in words]
+        known = [(i, w, self.vector(w)) for i, w in enumerate(words)]
+        known = [(i, w, v) for i, w, v in known if v is not None]
+        if not known or n <= 0:
+            return results
+
+        queries = torch.stack([v for _, _, v in known])
+        scores = self.scores(queries)
+        # Ask for one extra so the query word itself can be dropped
+        k = min(n + 1, scores.shape[1])
+        top = torch.topk(scores, k, dim=1).indices.tolist()
+
+        for (i, word, _), row in zip(known, top):
+            results[i] = [self.itos[j] for j in row if self.itos[j] != word][:n]
+        return results
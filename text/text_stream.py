@@ -0,0 +1,53 @@
+import codecs
+from typing import Iterable, Iterator, List
+
+
+class TextChunker:
+    """
+    Incrementally decode uploaded bytes and cut them into text chunks that end
+    on a line boundary (or a sentence boundary for very long lines).
+    """
+
+    def __init__(self, chunk_chars: int = 64 * 1024, encoding: str = "utf-8"):
+        self.chunk_chars = chunk_chars
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.pending = ""
+
+    def feed(self, data: bytes) -> List[str]:
+        self.pending += self.decoder.decode(data)
+        chunks = []
+        while len(self.pending) >= self.chunk_chars:
+            cut = self._boundary(self.pending)
+            if cut <= 0:
+                break
+            chunks.append(self.pending[:cut])
+            self.pending = self.pending[cut:]
+        return chunks
+
+    def flush(self) -> List[str]:
+        self.pending += self.decoder.decode(b"", final=True)
+        chunks = [self.pending] if self.pending else []
+        self.pending = ""
+        return chunks
+
+    def _boundary(self, text: str) -> int:
+        limit = self.chunk_chars
+        cut = text.rfind("\n", 0, limit)
+        if cut == -1:
+            cut = text.rfind(". ", 0, limit)
+        if cut == -1:
+            cut = text.rfind(" ", 0, limit)
+        if cut == -1:
+            # No boundary at all within the window; cut hard
+            return limit
+        return cut + 1
+
+
+def process_chunks(chunks: Iterable[str], pipeline) -> Iterator[str]:
+    """Apply a compiled text plan (augmentation included) to each chunk"""
+    for chunk in chunks:
+        processed = pipeline(chunk)
+        # Augmenters re-join sentences and drop the trailing newline
+        if chunk.endswith("\n") and not processed.endswith("\n"):
+            processed += "\n"
+        yield processed